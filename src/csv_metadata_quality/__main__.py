@@ -2,11 +2,34 @@
 
 from sys import argv
 
-from csv_metadata_quality import app
-
 
 def main():
-    app.run(argv)
+    # Import the subcommands only when they are used so that the client does
+    # not have to pay for importing Pandas and the checks.
+    if argv[1:2] == ["serve"]:
+        from csv_metadata_quality import server
+
+        server.run(argv[2:])
+    elif argv[1:2] == ["client"]:
+        from csv_metadata_quality import client
+
+        client.run(argv[2:])
+    elif argv[1:2] == ["warm-agrovoc-cache"]:
+        from csv_metadata_quality import warm_cache
+
+        warm_cache.run(argv[2:])
+    elif argv[1:2] == ["shard"]:
+        from csv_metadata_quality import shard
+
+        shard.run_shard(argv[2:])
+    elif argv[1:2] == ["merge"]:
+        from csv_metadata_quality import shard
+
+        shard.run_merge(argv[2:])
+    else:
+        from csv_metadata_quality import app
+
+        app.run(argv)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,173 @@
+# SPDX-License-Identifier: GPL-3.0-only
+
+import os
+import sqlite3
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter, Retry
+
+# Search endpoint of the AGROVOC REST API, unless the AGROVOC_URL environment
+# variable says otherwise
+AGROVOC_URL = "https://agrovoc.fao.org/browse/rest/v1/search"
+
+# How many times to retry a request that failed because of a connection error,
+# a server error, or rate limiting, unless the AGROVOC_RETRIES environment
+# variable says otherwise
+RETRIES = 3
+
+# Responses that mean the request might work if we try again later
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+# How many days to remember whether a term is valid, unless the
+# AGROVOC_CACHE_TTL environment variable says otherwise
+CACHE_TTL_DAYS = 30
+
+
+class TermCache:
+    """Remember whether terms are valid AGROVOC terms in a SQLite database.
+
+    Only the term and whether it is valid are stored, not the whole HTTP
+    response, so the cache stays small. The database uses write-ahead logging
+    so that several processes can read from it while another one writes, and
+    writers wait for each other instead of failing. Each thread gets its own
+    connection because SQLite connections can't be shared between threads.
+
+    Entries older than the TTL (in seconds) are ignored, and removed by
+    prune().
+    """
+
+    def __init__(self, path, ttl):
+        self.path = path
+        self.ttl = ttl
+        self._local = threading.local()
+
+        with self.connection() as connection:
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS terms (term TEXT PRIMARY KEY, valid INTEGER NOT NULL, checked REAL NOT NULL) WITHOUT ROWID"
+            )
+
+    def connection(self):
+        connection = getattr(self._local, "connection", None)
+
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=60)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+
+        return connection
+
+    def get(self, term):
+        """Return whether a term is valid, or None if we don't know (yet)."""
+
+        row = (
+            self.connection()
+            .execute(
+                "SELECT valid FROM terms WHERE term = ? AND checked > ?",
+                (term, time.time() - self.ttl),
+            )
+            .fetchone()
+        )
+
+        return None if row is None else bool(row[0])
+
+    def set(self, term, valid):
+        """Remember whether a term is valid."""
+
+        with self.connection() as connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO terms VALUES (?, ?, ?)",
+                (term, int(valid), time.time()),
+            )
+
+    def prune(self):
+        """Remove entries older than the TTL.
+
+        Return the number of entries that were removed.
+        """
+
+        with self.connection() as connection:
+            cursor = connection.execute(
+                "DELETE FROM terms WHERE checked <= ?", (time.time() - self.ttl,)
+            )
+
+        return cursor.rowcount
+
+
+def url():
+    """Return the URL of the AGROVOC search endpoint, which can be set with the
+    AGROVOC_URL environment variable to use a mirror or a local stand-in."""
+
+    return os.environ.get("AGROVOC_URL", AGROVOC_URL)
+
+
+def session(retries=RETRIES, backoff=0.5):
+    """Create a requests session for the AGROVOC REST API that retries failed
+    requests. We wait backoff seconds, doubling after every attempt, between
+    retries, or as long as the server asks us to in a Retry-After header when
+    we are being rate limited. If the last attempt still fails we get its
+    response instead of an exception, and search() treats it as a failed
+    request.
+
+    Return a requests.Session.
+    """
+
+    retry = Retry(
+        total=retries,
+        backoff_factor=backoff,
+        status_forcelist=RETRY_STATUSES,
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+
+    http = requests.Session()
+    http.mount("http://", HTTPAdapter(max_retries=retry))
+    http.mount("https://", HTTPAdapter(max_retries=retry))
+
+    return http
+
+
+def search(session, term):
+    """Ask the AGROVOC REST API whether a term exists.
+
+    Return a boolean, or None if the request failed.
+    """
+
+    response = session.get(url(), params={"query": term})
+
+    if response.status_code != requests.codes.ok:
+        return None
+
+    return len(response.json()["results"]) > 0
+
+
+def validate(term, cache, session):
+    """Check whether a term is valid AGROVOC, from the cache if we checked it
+    before or else from the AGROVOC REST API.
+
+    Return a boolean, or None if the request to the API failed.
+    """
+
+    valid = cache.get(term)
+
+    if valid is None:
+        valid = search(session, term)
+
+        # Don't remember failed requests so that we try again next time
+        if valid is not None:
+            cache.set(term, valid)
+
+    return valid
+
+
+def cache_path(cache_dir=None):
+    """Return the path of the AGROVOC term cache, in the directory set by the
+    REQUESTS_CACHE_DIR environment variable or the current working directory
+    by default."""
+
+    if cache_dir is None:
+        cache_dir = os.environ.get("REQUESTS_CACHE_DIR", ".")
+
+    return os.path.join(cache_dir, "agrovoc-term-cache.sqlite")
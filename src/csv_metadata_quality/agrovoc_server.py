@@ -0,0 +1,285 @@
+# SPDX-License-Identifier: GPL-3.0-only
+
+import argparse
+import json
+import math
+import random
+import signal
+import sys
+import threading
+import time
+from collections import Counter, deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+# Terms the stand-in knows about when it isn't given a list of terms, which
+# are enough for the AGROVOC terms in data/test.csv
+DEFAULT_TERMS = {
+    "FORESTS",
+    "KENYA",
+    "LIVESTOCK",
+    "MAIZE",
+    "SOIL FERTILITY",
+    "TANZANIA",
+}
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(
+        prog="python -m csv_metadata_quality.agrovoc_server",
+        description="Run a local stand-in for the AGROVOC REST API search endpoint, with configurable latency, errors, and rate limiting. Point csv-metadata-quality at it with AGROVOC_URL=http://HOST:PORT/search.",
+    )
+    parser.add_argument(
+        "--host",
+        help="Address to listen on for HTTP. Default: 127.0.0.1.",
+        default="127.0.0.1",
+    )
+    parser.add_argument(
+        "--port",
+        "-p",
+        help="Port to listen on for HTTP. Default: 8001.",
+        default=8001,
+        type=int,
+    )
+    parser.add_argument(
+        "--terms",
+        "-t",
+        help="Text file with one valid term per line. Default: a handful of terms used in the tests.",
+    )
+    parser.add_argument(
+        "--latency",
+        "-l",
+        help="Seconds to wait before answering each request. Default: 0.",
+        default=0,
+        type=float,
+    )
+    parser.add_argument(
+        "--error-rate",
+        "-e",
+        help="Fraction of requests to answer with 503 Service Unavailable. Default: 0.",
+        default=0,
+        type=float,
+    )
+    parser.add_argument(
+        "--rate-limit",
+        "-r",
+        help="Number of requests per second to answer before answering with 429 Too Many Requests. Default: no limit.",
+        type=int,
+    )
+    parser.add_argument(
+        "--seed",
+        help="Seed for choosing which requests fail, so that runs can be repeated. Default: 0.",
+        default=0,
+        type=int,
+    )
+
+    return parser.parse_args(argv)
+
+
+def search_response(term, terms):
+    """Build a response in the shape of the AGROVOC REST API search endpoint,
+    given a dict of the upper case terms and their concept ids. Terms are
+    matched without regard to case, like AGROVOC does for labels.
+
+    Return a dict.
+    """
+
+    results = []
+    concept = terms.get(term.upper())
+    if concept is not None:
+        results.append(
+            {
+                "uri": f"http://aims.fao.org/aos/agrovoc/c_{concept}",
+                "type": ["skos:Concept"],
+                "prefLabel": term.lower(),
+                "lang": "en",
+                "vocab": "agrovoc",
+            }
+        )
+
+    return {
+        "@context": {
+            "skos": "http://www.w3.org/2004/02/skos/core#",
+            "uri": "@id",
+            "type": "@type",
+            "results": {"@id": "onki:results", "@container": "@list"},
+        },
+        "uri": "",
+        "results": results,
+    }
+
+
+class RequestHandler(BaseHTTPRequestHandler):
+    """Answer GET /search?query=TERM like the AGROVOC REST API does.
+
+    Requests are rate limited first, then fail at random at the configured
+    error rate, and are delayed by the configured latency if they get an
+    answer at all. The server counts the requests for each term and the
+    status codes of the responses, so that tests can check how many requests
+    were made.
+    """
+
+    protocol_version = "HTTP/1.1"
+
+    # Don't let the headers and the body wait for each other in separate TCP
+    # packets, which would add latency we didn't ask for
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        term = parse_qs(url.query).get("query", [""])[-1]
+
+        with self.server.lock:
+            self.server.requests[term] += 1
+
+        if url.path != "/search":
+            return self.send_json(404, {"error": "Not found"})
+
+        retry_after = self.server.rate_limited()
+        if retry_after is not None:
+            return self.send_json(
+                429, {"error": "Too many requests"}, {"Retry-After": retry_after}
+            )
+
+        if self.server.failing():
+            return self.send_json(503, {"error": "Service unavailable"})
+
+        time.sleep(self.server.latency)
+
+        self.send_json(200, search_response(term, self.server.terms))
+
+    def send_json(self, status, body, headers=None):
+        body = json.dumps(body).encode("utf-8")
+
+        with self.server.lock:
+            self.server.statuses[status] += 1
+
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, str(value))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class AGROVOCServer(ThreadingHTTPServer):
+    """HTTP server standing in for the AGROVOC REST API."""
+
+    daemon_threads = True
+
+    def __init__(
+        self,
+        address,
+        terms=None,
+        latency=0,
+        error_rate=0,
+        rate_limit=None,
+        seed=0,
+    ):
+        super().__init__(address, RequestHandler)
+
+        self.terms = {
+            term: concept
+            for concept, term in enumerate(
+                sorted({term.upper() for term in (terms or DEFAULT_TERMS)}), start=1
+            )
+        }
+        self.latency = latency
+        self.error_rate = error_rate
+        self.rate_limit = rate_limit
+
+        self.lock = threading.Lock()
+        self.random = random.Random(seed)
+        self.answered = deque()
+        self.requests = Counter()
+        self.statuses = Counter()
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+
+        return f"http://{host}:{port}/search"
+
+    def rate_limited(self):
+        """Check whether we answered rate_limit requests in the last second.
+
+        Return the number of seconds until the next request can be answered,
+        or None if this one can be answered now.
+        """
+
+        if self.rate_limit is None:
+            return None
+
+        with self.lock:
+            now = time.monotonic()
+
+            while self.answered and self.answered[0] <= now - 1:
+                self.answered.popleft()
+
+            if len(self.answered) >= self.rate_limit:
+                return max(1, math.ceil(self.answered[0] + 1 - now))
+
+            self.answered.append(now)
+
+        return None
+
+    def failing(self):
+        """Decide whether this request fails, at the configured error rate.
+
+        Return a boolean.
+        """
+
+        with self.lock:
+            return self.random.random() < self.error_rate
+
+
+def read_terms(path):
+    """Read valid terms from a text file with one term per line.
+
+    Return a set of terms.
+    """
+
+    with open(path, encoding="utf-8") as f:
+        return {line.strip() for line in f if line.strip()}
+
+
+def signal_handler(signal, frame):
+    sys.exit(0)
+
+
+def run(argv):
+    args = parse_args(argv)
+
+    # Shut down cleanly on SIGTERM so that we print the summary
+    signal.signal(signal.SIGTERM, signal_handler)
+
+    server = AGROVOCServer(
+        (args.host, args.port),
+        terms=read_terms(args.terms) if args.terms else None,
+        latency=args.latency,
+        error_rate=args.error_rate,
+        rate_limit=args.rate_limit,
+        seed=args.seed,
+    )
+
+    print(f"Listening on {server.url}", file=sys.stderr)
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+        print(
+            f"Answered {sum(server.requests.values())} requests: {dict(sorted(server.statuses.items()))}",
+            file=sys.stderr,
+        )
+
+
+if __name__ == "__main__":
+    run(sys.argv[1:])
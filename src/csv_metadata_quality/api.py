@@ -0,0 +1,448 @@
+# SPDX-License-Identifier: GPL-3.0-only
+
+from argparse import Namespace
+
+import pandas as pd
+import pyarrow as pa
+
+import csv_metadata_quality.checkpoint as checkpoint
+import csv_metadata_quality.fileio as fileio
+import csv_metadata_quality.incremental as incremental
+import csv_metadata_quality.pipeline as pipeline
+from csv_metadata_quality.findings import Recorder, recording
+
+# Options that influence the checks and fixes, with the same names and defaults
+# as the command line options.
+DEFAULT_OPTIONS = {
+    "agrovoc_fields": None,
+    "check_only": False,
+    "checkpoint": None,
+    "checks": None,
+    "config": None,
+    "drop_invalid_agrovoc": False,
+    "exclude_fields": None,
+    "experimental_checks": False,
+    "fail_on": None,
+    "incremental": None,
+    "lenient_citations": False,
+    "max_findings": None,
+    "plan": None,
+    "resume": False,
+    "skip_checks": None,
+    "unsafe_fixes": False,
+}
+
+
+def options(**kwargs):
+    """Build the options for process() from keyword arguments, for example:
+
+        options(unsafe_fixes=True, agrovoc_fields="dcterms.subject")
+
+    Return an argparse Namespace.
+    """
+
+    return Namespace(**{**DEFAULT_OPTIONS, **kwargs})
+
+
+def excluded_fields(args):
+    """Return the list of fields that the user requested to skip."""
+
+    # Check if the user requested to skip any fields
+    if args.exclude_fields:
+        # Split the list of excluded fields on ',' into a list. Note that the
+        # user should be careful to no include spaces here.
+        return args.exclude_fields.split(",")
+
+    return []
+
+
+def process(df, options=None, stream=None, changes=None):
+    """Run all checks and fixes on a DataFrame or an Arrow table.
+
+    This is the library equivalent of running csv-metadata-quality on a file.
+    The options can be a dictionary or an argparse Namespace (for example from
+    the command line) and missing options get their defaults. The input is not
+    modified, and nothing global is changed other than what each thread prints
+    being recorded separately, so it is safe to call this from several threads
+    in a long-running service. Data that is expensive to load, like the country
+    table, the SPDX licenses, the langid model, and the AGROVOC session, stays
+    loaded between calls.
+
+    With the check_only option the findings are the same, but no fixed data is
+    built and the input is returned as is. It can't be combined with the
+    incremental option, which needs the fixed data for its state file.
+
+    With the checkpoint option (a directory) progress is saved after every
+    column and batch of rows, and the resume option continues from there. It
+    can't be combined with the check_only or incremental options.
+
+    With the max_findings or fail_on options the run is stopped with
+    findings.BudgetExceeded as soon as there are more findings than they
+    allow. Use gate() to only run the checks that count, cheapest first.
+
+    Which checks and fixes run can be restricted with the checks, skip_checks,
+    and config options, or by passing a plan from pipeline.compile_plan().
+
+    Findings are the (row, line) tuples printed by the checks and fixes, where
+    row is the DataFrame index label (or position in the table) or None if the
+    line is not about a particular row. Lines still contain the colorama color
+    codes. Optionally pass the lines through to a stream, like sys.stdout.
+
+    Optionally pass a dictionary as changes to get a NumPy boolean mask of the
+    rows (by position) that changed for each column that changed.
+
+    Return a tuple of the fixed DataFrame (or table) and the findings.
+    """
+
+    if options is None:
+        options = {}
+    elif isinstance(options, Namespace):
+        options = vars(options)
+
+    args = Namespace(**{**DEFAULT_OPTIONS, **options})
+
+    # Compile the plan of which checks and fixes run on which columns, unless
+    # we were given one that was compiled before.
+    if args.plan is None:
+        args.plan = pipeline.compile_plan(args)
+
+    if args.check_only and args.incremental:
+        raise ValueError("The check_only and incremental options can't be combined")
+
+    if args.checkpoint and (args.check_only or args.incremental):
+        raise ValueError(
+            "The checkpoint option can't be combined with check_only or incremental"
+        )
+
+    exclude = excluded_fields(args)
+
+    # Record the findings printed by checks and fixes so we know which rows
+    # they belong to, and stop if there are more than the budget allows.
+    if args.fail_on is not None or args.max_findings is not None:
+        recorder = budget_recorder(args, stream)
+    else:
+        recorder = Recorder(stream=stream)
+
+    with recording(recorder):
+        if args.check_only:
+            table = df if isinstance(df, pa.Table) else fileio.to_arrow(df)
+            pipeline.check_table(table, args, exclude, recorder)
+        elif isinstance(df, pa.Table):
+            df = pipeline.process_table(df, args, exclude, recorder, changes=changes)
+        elif args.incremental:
+            df = process_incremental(df, args, exclude, recorder, changes=changes)
+        elif args.checkpoint:
+            df = checkpoint.process(df.copy(), args, exclude, recorder, changes=changes)
+        else:
+            df = pipeline.process(df.copy(), args, exclude, recorder, changes=changes)
+
+    return df, recorder.findings
+
+
+def gate(df, options=None):
+    """Check whether a DataFrame or an Arrow table stays within a budget of
+    findings, without printing anything: at most max_findings (0 by default)
+    findings from the checks and fixes in the fail_on option (a comma-
+    separated list of names, or all of them by default). Only those and the
+    fixes they depend on run, cheapest first, see pipeline.gate(), so that a
+    file that is over budget is rejected as early as possible.
+
+    The options are the same as for process().
+
+    Raises findings.BudgetExceeded as soon as the budget is exceeded, with
+    the findings that count against it so far.
+
+    Return a list of (row, line) tuples of the findings that count against
+    the budget.
+    """
+
+    if options is None:
+        options = {}
+    elif isinstance(options, Namespace):
+        options = vars(options)
+
+    args = Namespace(**{**DEFAULT_OPTIONS, **options})
+
+    if args.plan is None:
+        args.plan = pipeline.compile_plan(args)
+
+    names = pipeline.split_names(args.fail_on) if args.fail_on else None
+    recorder = budget_recorder(args, None)
+
+    table = df if isinstance(df, pa.Table) else fileio.to_arrow(df)
+
+    with recording(recorder):
+        pipeline.gate(table, args, excluded_fields(args), recorder, names)
+
+    return recorder.counted_findings()
+
+
+def budget_recorder(args, stream):
+    """Record findings with the budget of the max_findings (0 by default) and
+    fail_on options.
+
+    Return a Recorder.
+    """
+
+    return Recorder(
+        stream=stream,
+        budget=args.max_findings if args.max_findings is not None else 0,
+        counted=pipeline.split_names(args.fail_on) if args.fail_on else None,
+    )
+
+
+def process_batches(batches, options=None, stream=None):
+    """Run all checks and fixes on batches of rows as they are read, for example
+    from fileio.read_csv_batches(), so that each fixed batch can be written as
+    soon as it is done instead of after the whole file has been read.
+
+    The options and stream are the same as for process(). Rows are numbered
+    across batches, and duplicate identifiers and items are found across
+    batches by keeping the keys of the identifiers and items seen so far.
+    Findings that are not about a particular row, like skipped columns, are
+    only reported for the first batch. The findings of each batch are in the
+    same order as in a full run of that batch, so the findings of the whole
+    file are grouped by batch.
+
+    Yield a tuple of the fixed DataFrame and the findings for each batch.
+    """
+
+    if options is None:
+        options = {}
+    elif isinstance(options, Namespace):
+        options = vars(options)
+
+    args = Namespace(**{**DEFAULT_OPTIONS, **options})
+
+    if args.plan is None:
+        args.plan = pipeline.compile_plan(args)
+
+    exclude = excluded_fields(args)
+    check_duplicates = pipeline.selected(pipeline.DUPLICATE_ITEMS_STAGE, None, args)
+
+    offset = 0
+    duplicates_index = incremental.duplicate_index()
+    seen_identifiers = {}
+    general_findings = None
+
+    for batch in batches:
+        df = fileio.to_pandas(pa.Table.from_batches([batch]))
+        df.index = pd.RangeIndex(offset, offset + len(df))
+        offset += len(df)
+
+        recorder = Recorder(stream=None)
+
+        with recording(recorder):
+            df = pipeline.process(df, args, exclude, recorder, duplicates=False)
+
+        findings = []
+        row_findings = None
+        for (row, line), stage, column in zip(
+            recorder.findings, recorder.stages, recorder.columns
+        ):
+            if row is None and line in (general_findings or ()):
+                continue
+
+            # The checks and fixes on rows are the only ones that run without
+            # a column.
+            if row_findings is None and stage is not None and column is None:
+                row_findings = len(findings)
+
+            findings.append((row, line))
+
+        if general_findings is None:
+            general_findings = {line for row, line in findings if row is None}
+
+        recorder = Recorder(stream=None)
+
+        with recording(recorder):
+            pipeline.duplicate_identifiers(
+                pipeline.identifier_entries(df, args, exclude),
+                recorder,
+                df.index,
+                seen_identifiers,
+            )
+
+            if check_duplicates:
+                incremental.duplicate_items(
+                    df, incremental.duplicate_keys(df), duplicates_index
+                )
+
+        # Duplicate identifiers and items come after the checks and fixes on
+        # columns and before those on rows, like in a full run.
+        if row_findings is None:
+            row_findings = len(findings)
+        findings[row_findings:row_findings] = recorder.findings
+
+        if stream is not None:
+            for row, line in findings:
+                print(line, file=stream)
+
+        yield df, findings
+
+
+def process_incremental(df, args, exclude, recorder, changes=None):
+    """Run all checks and fixes on the rows that changed since the last run.
+
+    Rows whose content hash matches the state file reuse the findings and
+    fixes that were stored for them, and only new or changed rows go through
+    the checks and fixes. The checks for duplicate identifiers and duplicate
+    items are updated from the per-row keys in the state file rather than
+    recomputed from scratch. The findings are printed in the same order as in
+    a full run, and attributed to the rows of the original index.
+
+    Return the fixed DataFrame.
+    """
+
+    state = incremental.load_state(
+        args.incremental, incremental.fingerprint(df.columns, args, exclude)
+    )
+
+    keys = incremental.row_keys(df)
+    hashes = incremental.row_hashes(df)
+
+    # Work on a positional index so that we can put the unchanged and changed
+    # rows back together in their original order.
+    original_index = df.index
+    df = df.reset_index(drop=True)
+
+    unchanged = [
+        state["rows"].get(key, {}).get("hash") == row_hash
+        for key, row_hash in zip(keys, hashes)
+    ]
+    changed = [not row_unchanged for row_unchanged in unchanged]
+
+    # Collect the findings as (position, column, stage, line) tuples so that
+    # we can print the findings we replay and the new ones together, in the
+    # same order as a full run.
+    findings = []
+
+    # Replay the findings for unchanged rows and re-apply their fixes. The
+    # DataFrame has object dtype after fixes, so we do the same here in order
+    # to be able to store None in the fixed cells.
+    df_fixed = df.astype(object)
+
+    for position in df.index[unchanged]:
+        row_state = state["rows"][keys[position]]
+
+        for column, stage, line in row_state["findings"]:
+            findings.append((position, column, stage, line))
+
+        for column, value in row_state["fixes"].items():
+            df_fixed.at[position, column] = value
+
+    # Run the checks and fixes on the new and changed rows only. We still run
+    # them if no rows changed so that skipped columns are reported as usual.
+    changed_recorder = Recorder(stream=None)
+    with recording(changed_recorder):
+        df_changed = pipeline.process(
+            df[changed].copy(), args, exclude, changed_recorder, duplicates=False
+        )
+    df_fixed.loc[df_changed.index] = df_changed
+
+    # Collect the findings for each changed row. Findings that are not about a
+    # particular row, like skipped columns, are not stored.
+    row_findings = {}
+    for (row, line), stage, column in zip(
+        changed_recorder.findings, changed_recorder.stages, changed_recorder.columns
+    ):
+        findings.append((row, column, stage, line))
+
+        if row is not None:
+            row_findings.setdefault(row, []).append([column, stage, line])
+
+    # Find the keys of the identifiers of the changed rows and then check for
+    # duplicate identifiers across the whole file.
+    changed_identifiers = incremental.identifier_keys(
+        pipeline.identifier_entries(df_fixed[changed], args, exclude),
+        df.index[changed],
+    )
+    stored_identifiers = [
+        (
+            state["rows"][key].get("identifiers", [])
+            if row_unchanged
+            else changed_identifiers.get(position, [])
+        )
+        for position, (key, row_unchanged) in enumerate(zip(keys, unchanged))
+    ]
+
+    identifiers_recorder = Recorder(stream=None)
+    with recording(identifiers_recorder):
+        pipeline.duplicate_identifiers(
+            incremental.identifier_entries(enumerate(stored_identifiers), df.columns),
+            identifiers_recorder,
+        )
+
+    for (row, line), stage, column in zip(
+        identifiers_recorder.findings,
+        identifiers_recorder.stages,
+        identifiers_recorder.columns,
+    ):
+        findings.append((row, column, stage, line))
+
+    # Update the duplicate key index for the changed rows and then check for
+    # duplicate items across the whole file.
+    duplicate_keys = [
+        state["rows"][key].get("duplicate_key") if row_unchanged else None
+        for key, row_unchanged in zip(keys, unchanged)
+    ]
+    changed_duplicate_keys = incremental.duplicate_keys(df_fixed[changed])
+    if changed_duplicate_keys is not None:
+        for position, duplicate_key in zip(df.index[changed], changed_duplicate_keys):
+            duplicate_keys[position] = duplicate_key
+
+        if pipeline.selected(pipeline.DUPLICATE_ITEMS_STAGE, None, args):
+            duplicates_recorder = Recorder(stream=None)
+            with recording(duplicates_recorder):
+                incremental.duplicate_items(df_fixed, duplicate_keys)
+
+            for row, line in duplicates_recorder.findings:
+                findings.append((row, None, pipeline.DUPLICATE_ITEMS_STAGE.name, line))
+    else:
+        # Without title, type, and date issued columns there are no keys
+        duplicate_keys = [None] * len(df)
+
+    # Print the findings in the same order as a full run, with the rows of
+    # the original index. Python's sort is stable, so the findings of a row
+    # for the same check keep their order.
+    order = incremental.finding_order(df.columns, args)
+    findings.sort(key=lambda finding: order(*finding[:3]))
+
+    for position, column, stage, line in findings:
+        recorder.row = None if position is None else original_index[position]
+        recorder.stage = stage
+        recorder.column = column
+        print(line)
+
+    recorder.row = None
+    recorder.stage = None
+    recorder.column = None
+
+    # Save the state for the next run. Rows that no longer exist in the input
+    # file are dropped.
+    rows = {}
+    for position, key in enumerate(keys):
+        if unchanged[position]:
+            rows[key] = state["rows"][key]
+        else:
+            rows[key] = {
+                "hash": hashes[position],
+                "findings": row_findings.get(position, []),
+                "fixes": incremental.changed_cells(
+                    df.iloc[position], df_fixed.iloc[position]
+                ),
+            }
+        rows[key]["identifiers"] = stored_identifiers[position]
+        rows[key]["duplicate_key"] = duplicate_keys[position]
+
+    state["rows"] = rows
+    incremental.save_state(args.incremental, state)
+
+    for column in df.columns:
+        pipeline.record_changes(
+            changes, column, pipeline.changed_mask(df[column], df_fixed[column])
+        )
+
+    df_fixed.index = original_index
+
+    return df_fixed
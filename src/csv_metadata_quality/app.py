@@ -2,20 +2,24 @@
 
 import argparse
 import os
-import re
 import signal
 import sys
-from datetime import timedelta
 
-import pandas as pd
-import requests_cache
-from colorama import Fore
-
-import csv_metadata_quality.check as check
-import csv_metadata_quality.experimental as experimental
-import csv_metadata_quality.fix as fix
+import csv_metadata_quality.api as api
+import csv_metadata_quality.batch as batch
+import csv_metadata_quality.checkpoint as checkpoint
+import csv_metadata_quality.fileio as fileio
+import csv_metadata_quality.patch as patch
+import csv_metadata_quality.pipeline as pipeline
+import csv_metadata_quality.sample as sample
+import csv_metadata_quality.shard as shard
+from csv_metadata_quality.findings import BudgetExceeded
 from csv_metadata_quality.version import VERSION
 
+# Exit status when a run was stopped early because there were more findings
+# than --max-findings allows, see api.process()
+BUDGET_EXCEEDED_STATUS = 3
+
 
 def parse_args(argv):
     parser = argparse.ArgumentParser(description="Metadata quality checker and fixer.")
@@ -24,6 +28,30 @@ def parse_args(argv):
         "-a",
         help="Comma-separated list of fields to validate against AGROVOC, for example: dcterms.subject,cg.coverage.country",
     )
+    parser.add_argument(
+        "--block-size",
+        help="Number of bytes of CSV to read or write per block. Blocks are parsed and written by multiple threads, and must be larger than the longest line. Default: 1048576.",
+        type=int,
+    )
+    parser.add_argument(
+        "--check-only",
+        help="Only print the findings, without fixing anything or writing an output file. Exits with status 1 if there are any findings, or see --max-findings.",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--checkpoint",
+        help="Path to a directory to save progress to after every column and batch of rows, so that an interrupted run can be continued with --resume.",
+        metavar="DIRECTORY",
+    )
+    parser.add_argument(
+        "--checks",
+        help="Comma-separated list of the only checks and fixes to run, for example: date,issn,isbn. Use --explain to see their names.",
+    )
+    parser.add_argument(
+        "--config",
+        "-c",
+        help="Path to a JSON file with rules for which checks and fixes to run on which columns.",
+    )
     parser.add_argument(
         "--drop-invalid-agrovoc",
         "-d",
@@ -36,19 +64,97 @@ def parse_args(argv):
         help="Enable experimental checks like language detection",
         action="store_true",
     )
+    parser.add_argument(
+        "--explain",
+        help="Print which checks and fixes would run on each column with an estimate of how long they take, then exit.",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--fail-on",
+        help="Comma-separated list of the checks and fixes whose findings count against --max-findings, for example: date,issn. The run stops with status 3 as soon as there are too many findings.",
+        metavar="CHECK[,CHECK]",
+    )
+    parser.add_argument(
+        "--incremental",
+        help="Path to a state file. Reuse findings and fixes from the previous run for rows that have not changed since, and save this run's results for the next.",
+        metavar="STATE_FILE",
+    )
     parser.add_argument(
         "--input-file",
         "-i",
-        help="Path to input file. Must be a UTF-8 CSV.",
+        help="Path to input file, or - for standard input, or a directory or glob pattern to process several files. Must be a UTF-8 CSV, Parquet, Feather (Arrow IPC), or Excel (.xlsx) file. CSV files can be compressed with gzip, bzip2, xz, or Zstandard.",
         required=True,
-        type=argparse.FileType("r", encoding="UTF-8"),
+    )
+    parser.add_argument(
+        "--input-format",
+        help="Format of the input file. Detected from the file extension by default, falling back to CSV.",
+        choices=["csv", "parquet", "feather", "xlsx"],
+    )
+    parser.add_argument(
+        "--lenient-citations",
+        help="Ignore differences in accents, case, and whitespace when checking whether the title and a DOI are present in the citation.",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--max-findings",
+        help="Maximum number of findings allowed from the checks and fixes (or only those in --fail-on). The run stops with status 3 as soon as there are more findings, without writing the output file. Without this option or --fail-on, --check-only exits with status 1 after the run if there are any findings. When processing several files it can only be used with --check-only, and the findings of all files are counted after the run. Default: 0.",
+        type=int,
     )
     parser.add_argument(
         "--output-file",
         "-o",
-        help="Path to output file (always CSV).",
-        required=True,
-        type=argparse.FileType("w", encoding="UTF-8"),
+        help="Path to output file (or directory when processing several files), or - for standard output, in which case findings are printed to standard error, batch by batch for CSV files. Required unless using --explain or --check-only. CSV files are compressed if the name ends with .gz, .bz2, .xz, or .zst.",
+    )
+    parser.add_argument(
+        "--output-mode",
+        help="What to write to the output file: the whole fixed file (full), only the changed cells with their old and new values (changes), or a minimal DSpace CSV with only the changed rows and columns (dspace). Default: full.",
+        choices=["full", "changes", "dspace"],
+        default="full",
+    )
+    parser.add_argument(
+        "--output-format",
+        help="Format of the output file. Detected from the file extension by default, falling back to CSV.",
+        choices=["csv", "parquet", "feather", "xlsx"],
+    )
+    parser.add_argument(
+        "--passthrough",
+        help="Copy columns that no fix can change, like excluded fields, from the input CSV to the output CSV byte for byte instead of parsing and rewriting them.",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--report",
+        help="Path to a CSV file to write the findings of all files to when processing several files.",
+    )
+    parser.add_argument(
+        "--resume",
+        help="Continue an interrupted run from the last checkpoint in the --checkpoint directory.",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--sample",
+        help="Only check a random sample of the rows, drawn while reading the file, and print an estimate of how many rows of the whole file have findings from each check and fix. Either a number of rows, like 1000, or a fraction of the rows, like 0.01.",
+        metavar="N|FRACTION",
+        type=sample.size,
+    )
+    parser.add_argument(
+        "--sample-by",
+        help="Column to stratify the --sample by, for example collection, so that every value of the column is represented in proportion to its number of rows.",
+        metavar="COLUMN",
+    )
+    parser.add_argument(
+        "--seed",
+        help="Seed for drawing the --sample, so that the same file gives the same sample. Default: 0.",
+        default=0,
+        type=int,
+    )
+    parser.add_argument(
+        "--shard-state",
+        help="Path to a state file to write for csv-metadata-quality merge when checking a shard made by csv-metadata-quality shard. Duplicate ISBNs, DOIs, and items are then checked by merge instead, across all shards.",
+        metavar="STATE_FILE",
+    )
+    parser.add_argument(
+        "--skip-checks",
+        help="Comma-separated list of checks and fixes not to run, for example: mojibake,countries_match_regions",
     )
     parser.add_argument(
         "--unsafe-fixes", "-u", help="Perform unsafe fixes.", action="store_true"
@@ -56,12 +162,83 @@ def parse_args(argv):
     parser.add_argument(
         "--version", "-V", action="version", version=f"CSV Metadata Quality v{VERSION}"
     )
+    parser.add_argument(
+        "--workers",
+        "-w",
+        help="Number of files to process at the same time when processing several files. Default: number of CPUs.",
+        default=os.cpu_count(),
+        type=int,
+    )
     parser.add_argument(
         "--exclude-fields",
         "-x",
         help="Comma-separated list of fields to skip, for example: dc.contributor.author,dcterms.bibliographicCitation",
     )
-    args = parser.parse_args()
+    args = parser.parse_args(argv[1:])
+
+    if args.output_file is None and not (
+        args.explain or args.check_only or args.sample
+    ):
+        parser.error("the following arguments are required: --output-file/-o")
+
+    if args.resume and not args.checkpoint:
+        parser.error("--resume needs a --checkpoint directory")
+
+    if args.sample_by and not args.sample:
+        parser.error("--sample-by needs a --sample size")
+
+    if args.check_only and args.incremental:
+        parser.error("--incremental can't be used with --check-only")
+
+    # Check-only and incremental runs don't save a checkpoint
+    if args.checkpoint:
+        for option, used in [
+            ("--check-only", args.check_only),
+            ("--incremental", args.incremental),
+        ]:
+            if used:
+                parser.error(f"--checkpoint can't be used with {option}")
+
+    if args.sample:
+        for option, used in [
+            ("--checkpoint", args.checkpoint),
+            ("--explain", args.explain),
+            ("--fail-on", args.fail_on),
+            ("--incremental", args.incremental),
+            ("--max-findings", args.max_findings is not None),
+            ("--output-file", args.output_file),
+            ("--shard-state", args.shard_state),
+        ]:
+            if used:
+                parser.error(f"{option} can't be used with --sample")
+
+    if batch.is_batch(args.input_file):
+        if args.sample:
+            parser.error("--sample can't be used when processing several files")
+
+        if args.fail_on:
+            parser.error("--fail-on can't be used when processing several files")
+
+        # The findings of all files are only counted at the end, so the budget
+        # can't stop the run, only decide the exit status of --check-only.
+        if args.max_findings is not None and not args.check_only:
+            parser.error(
+                "--max-findings can only be used with --check-only when processing several files"
+            )
+
+        for option, used in [
+            ("--checkpoint", args.checkpoint),
+            ("--explain", args.explain),
+            ("--incremental", args.incremental),
+            ("--output-mode", args.output_mode != "full"),
+            ("--passthrough", args.passthrough),
+            ("--shard-state", args.shard_state),
+        ]:
+            if used:
+                parser.error(f"{option} can't be used when processing several files")
+
+        if args.output_file == "-":
+            parser.error("the output must be a directory when processing several files")
 
     return args
 
@@ -70,192 +247,221 @@ def signal_handler(signal, frame):
     sys.exit(1)
 
 
+def run_streaming(args):
+    """Process a CSV batch by batch, writing each fixed batch as soon as it is
+    done, and exit."""
+
+    reader = fileio.read_csv_batches(args.input_file, args.block_size)
+    results = api.process_batches(reader, args, stream=sys.stderr)
+
+    try:
+        fileio.write_csv_batches(
+            (fileio.to_arrow(df) for df, findings in results),
+            args.output_file,
+            reader.schema.names,
+        )
+    except BrokenPipeError:
+        # The next program in the pipeline stopped reading, like head does.
+        # Point stdout at /dev/null so that Python doesn't complain again when
+        # it flushes stdout on exit.
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+
+        sys.exit(1)
+
+    sys.exit(0)
+
+
 def run(argv):
     args = parse_args(argv)
 
-    # set the signal handler for SIGINT (^C)
+    # set the signal handler for SIGINT (^C). With a checkpoint the checks and
+    # fixes are interrupted with a KeyboardInterrupt instead, see below.
     signal.signal(signal.SIGINT, signal_handler)
 
-    # Read all fields as strings so dates don't get converted from 1998 to 1998.0
-    df = pd.read_csv(args.input_file, dtype_backend="pyarrow", dtype="str")
+    # Compile the plan of which checks and fixes run on which columns once,
+    # before we start reading the file.
+    try:
+        args.plan = pipeline.compile_plan(args)
+    except (OSError, ValueError) as e:
+        sys.exit(f"Error: {e}")
+
+    # Leave duplicate identifiers and items to the merge subcommand, which sees
+    # all shards. We keep the options with the original plan to find the keys
+    # of the identifiers that merge needs.
+    if args.shard_state:
+        check_duplicates = pipeline.selected(pipeline.DUPLICATE_ITEMS_STAGE, None, args)
+        shard_args = argparse.Namespace(**vars(args))
+        args.plan = shard.without_duplicate_items(args.plan)
+
+    if args.sample:
+        try:
+            sample.run(args)
+        except (OSError, ValueError) as e:
+            sys.exit(f"Error: {e}")
+
+        sys.exit(0)
+
+    if batch.is_batch(args.input_file):
+        count = batch.run(args)
+        max_findings = args.max_findings or 0
+
+        if args.check_only and count > max_findings:
+            print(
+                f"Found {count} issues, more than the maximum of {max_findings}",
+                file=sys.stderr,
+            )
+
+            # Like a single file with a budget, see below
+            if args.max_findings is not None:
+                sys.exit(BUDGET_EXCEEDED_STATUS)
+
+            sys.exit(1)
 
-    # Check if the user requested to skip any fields
-    if args.exclude_fields:
-        # Split the list of excluded fields on ',' into a list. Note that the
-        # user should be careful to no include spaces here.
-        exclude = args.exclude_fields.split(",")
+        sys.exit(0)
+
+    input_format = args.input_format or fileio.detect_format(args.input_file)
+    if args.output_file is not None:
+        output_format = args.output_format or fileio.detect_format(args.output_file)
     else:
-        exclude = []
-
-    # enable transparent request cache with thirty days expiry
-    expire_after = timedelta(days=30)
-    # Allow overriding the location of the requests cache, just in case we are
-    # running in an environment where we can't write to the current working di-
-    # rectory (for example from csv-metadata-quality-web).
-    REQUESTS_CACHE_DIR = os.environ.get("REQUESTS_CACHE_DIR", ".")
-    requests_cache.install_cache(
-        f"{REQUESTS_CACHE_DIR}/agrovoc-response-cache", expire_after=expire_after
-    )
-
-    # prune old cache entries
-    requests_cache.delete()
-
-    for column in df.columns:
-        if column in exclude:
-            print(f"{Fore.YELLOW}Skipping {Fore.RESET}{column}")
-
-            continue
-
-        if args.unsafe_fixes:
-            # Skip whitespace and newline fixes on abstracts and descriptions
-            # because there are too many with legitimate multi-line metadata.
-            match = re.match(r"^.*?(abstract|description).*$", column)
-            if match is None:
-                # Fix: whitespace
-                df[column] = df[column].apply(fix.whitespace, field_name=column)
-
-                # Fix: newlines
-                df[column] = df[column].apply(fix.newlines, field_name=column)
-
-        # Fix: missing space after comma. Only run on author and citation
-        # fields for now, as this problem is mostly an issue in names.
-        if args.unsafe_fixes:
-            match = re.match(r"^.*?(author|[Cc]itation).*$", column)
-            if match is not None:
-                df[column] = df[column].apply(fix.comma_space, field_name=column)
-
-        # Fix: perform Unicode normalization (NFC) to convert decomposed
-        # characters into their canonical forms.
-        if args.unsafe_fixes:
-            df[column] = df[column].apply(fix.normalize_unicode, field_name=column)
-
-        # Check: suspicious characters
-        df[column].apply(check.suspicious_characters, field_name=column)
-
-        # Fix: mojibake. If unsafe fixes are not enabled then we only check.
-        if args.unsafe_fixes:
-            df[column] = df[column].apply(fix.mojibake, field_name=column)
-        else:
-            df[column].apply(check.mojibake, field_name=column)
-
-        # Fix: unnecessary Unicode
-        df[column] = df[column].apply(fix.unnecessary_unicode)
-
-        # Fix: normalize DOIs
-        match = re.match(r"^.*?identifier\.doi.*$", column)
-        if match is not None:
-            df[column] = df[column].apply(fix.normalize_dois)
-
-        # Fix: invalid and unnecessary multi-value separators. Skip the title
-        # and abstract fields because "|" is used to indicate something like
-        # a subtitle.
-        match = re.match(r"^.*?(abstract|[Cc]itation|title).*$", column)
-        if match is None:
-            df[column] = df[column].apply(fix.separators, field_name=column)
-            # Run whitespace fix again after fixing invalid separators
-            df[column] = df[column].apply(fix.whitespace, field_name=column)
-
-        # Fix: duplicate metadata values
-        df[column] = df[column].apply(fix.duplicates, field_name=column)
-
-        # Check: invalid AGROVOC subject and optionally drop them
-        if args.agrovoc_fields:
-            # Identify fields the user wants to validate against AGROVOC
-            for field in args.agrovoc_fields.split(","):
-                if column == field:
-                    df[column] = df[column].apply(
-                        check.agrovoc, field_name=column, drop=args.drop_invalid_agrovoc
-                    )
-
-        # Check: invalid language
-        match = re.match(r"^.*?language.*$", column)
-        if match is not None:
-            df[column].apply(check.language)
-
-        # Check: invalid ISSN
-        match = re.match(r"^.*?issn.*$", column)
-        if match is not None:
-            df[column].apply(check.issn)
-
-        # Check: invalid ISBN
-        match = re.match(r"^.*?isbn.*$", column)
-        if match is not None:
-            df[column].apply(check.isbn)
-
-        # Check: invalid date
-        match = re.match(r"^.*?(date|dcterms\.issued).*$", column)
-        if match is not None:
-            df[column].apply(check.date, field_name=column)
-
-        # Check: filename extension
-        if column == "filename":
-            df[column].apply(check.filename_extension)
-
-        # Check: SPDX license identifier
-        match = re.match(r"dcterms\.license.*$", column)
-        if match is not None:
-            df[column].apply(check.spdx_license_identifier)
-
-    ### End individual column checks ###
-
-    # Check: duplicate items
-    # We extract just the title, type, and date issued columns to analyze
-    try:
-        duplicates_df = df.filter(
-            regex=r"dcterms\.title|dc\.title|dcterms\.type|dc\.type|dcterms\.issued|dc\.date\.issued"
+        output_format = None
+
+    # Print the findings to standard error if the data goes to standard output
+    findings_stream = sys.stderr if args.output_file == "-" else sys.stdout
+
+    # Stop processing the file as soon as it has more findings than we allow,
+    # see api.process()
+    budget = args.fail_on is not None or args.max_findings is not None
+
+    # Memory map Arrow IPC (Feather) files instead of reading them, unless we
+    # need a DataFrame for incremental mode.
+    memory_map = (
+        input_format == "feather"
+        and args.input_file != "-"
+        and (args.check_only or not (args.incremental or args.checkpoint))
+    )
+
+    # Only copy columns byte for byte when we write the whole fixed CSV
+    passthrough = (
+        args.passthrough
+        and input_format == "csv"
+        and output_format == "csv"
+        and args.input_file != "-"
+        and args.output_mode == "full"
+        and not (args.check_only or args.explain or args.incremental)
+    )
+    spans = None
+
+    # Process and write a CSV batch by batch when writing to standard output,
+    # so that the next program in a pipeline gets the first rows early.
+    streaming = (
+        args.output_file == "-"
+        and input_format == "csv"
+        and output_format == "csv"
+        and args.output_mode == "full"
+        and not (args.check_only or args.explain or args.incremental)
+        and not (args.shard_state or args.checkpoint or budget)
+    )
+
+    if streaming:
+        run_streaming(args)
+
+    if memory_map:
+        df = fileio.read_table(args.input_file)
+    elif passthrough:
+        copy_columns, unread_columns = pipeline.passthrough_columns(
+            fileio.csv_header(args.input_file), args, api.excluded_fields(args)
         )
-        check.duplicate_items(duplicates_df)
-
-        # Delete the temporary duplicates DataFrame
-        del duplicates_df
-    except IndexError:
-        pass
-
-    ##
-    # Perform some checks on rows so we can consider items as a whole rather
-    # than simple on a field-by-field basis. This allows us to check whether
-    # the language used in the title and abstract matches the language indi-
-    # cated in the language field, for example.
-    #
-    # This is slower and apparently frowned upon in the Pandas community be-
-    # cause it requires iterating over rows rather than using apply over a
-    # column. For now it will have to do.
-    ##
-
-    # Transpose the DataFrame so we can consider each row as a column
-    df_transposed = df.T
-
-    # Remember, here a "column" is an item (previously row). Perhaps I
-    # should rename column in this for loop...
-    for column in df_transposed.columns:
-        # Check: citation DOI
-        check.citation_doi(df_transposed[column], exclude)
-
-        # Check: title in citation
-        check.title_in_citation(df_transposed[column], exclude)
-
-        if args.unsafe_fixes:
-            # Fix: countries match regions
-            df_transposed[column] = fix.countries_match_regions(
-                df_transposed[column], exclude
+        df, spans = fileio.read_passthrough(
+            args.input_file, copy_columns, unread_columns, args.block_size
+        )
+    elif args.check_only:
+        # We only need the values, not a DataFrame
+        df = fileio.read_arrow(
+            args.input_file,
+            input_format,
+            block_size=args.block_size,
+            dictionary=True,
+        )
+    else:
+        # Read all fields as strings so dates don't get converted from 1998 to
+        # 1998.0
+        df = fileio.read(args.input_file, input_format, block_size=args.block_size)
+
+    if args.explain:
+        pipeline.explain(df, args, api.excluded_fields(args))
+
+        sys.exit(0)
+
+    # Keep track of the rows that changed in each column if we only write the
+    # changes.
+    changes = {} if args.output_mode != "full" else None
+
+    # Run all checks and fixes, printing the findings as we go
+    original_df = df
+    if args.checkpoint:
+        signal.signal(signal.SIGINT, signal.default_int_handler)
+
+    try:
+        df, findings = api.process(df, args, stream=findings_stream, changes=changes)
+    except KeyboardInterrupt:
+        # Only possible with --checkpoint, see above. The checkpoint is saved
+        # after every column and batch of rows, so it is consistent as it is,
+        # but there is only something to continue from once one was saved.
+        if checkpoint.saved(args.checkpoint):
+            print(
+                f"Interrupted, continue from the checkpoint in {args.checkpoint} with --resume",
+                file=sys.stderr,
             )
         else:
-            # Check: countries match regions
-            check.countries_match_regions(df_transposed[column], exclude)
+            print("Interrupted before anything was saved", file=sys.stderr)
+
+        sys.exit(1)
+    except BudgetExceeded as e:
+        # The findings up to the one that was too many were printed already,
+        # and nothing is written.
+        print(e, file=sys.stderr)
+
+        sys.exit(BUDGET_EXCEEDED_STATUS)
+    finally:
+        signal.signal(signal.SIGINT, signal_handler)
+
+    if args.shard_state:
+        shard.save_state(
+            args.shard_state,
+            df,
+            findings,
+            check_duplicates,
+            pipeline.identifier_entries(df, shard_args, api.excluded_fields(args)),
+        )
+
+    # With a budget api.process() stopped already if there were too many
+    if args.check_only and not budget:
+        count = pipeline.count_findings(findings)
+
+        if count > 0:
+            print(
+                f"Found {count} issues, more than the maximum of 0",
+                file=sys.stderr,
+            )
+
+            sys.exit(1)
 
-        if args.experimental_checks:
-            experimental.correct_language(df_transposed[column], exclude)
+    if args.check_only:
+        sys.exit(0)
 
-    # Transpose the DataFrame back before writing. This is probably wasteful to
-    # do every time since we technically only need to do it if we've done the
-    # countries/regions fix above, but I can't think of another way for now.
-    df_transposed_back = df_transposed.T
+    if args.output_mode == "changes":
+        df = patch.changed_cells(original_df, df, changes)
+    elif args.output_mode == "dspace":
+        try:
+            df = patch.dspace_csv(df, changes)
+        except ValueError as e:
+            sys.exit(f"Error: {e}")
 
     # Write
-    df_transposed_back.to_csv(args.output_file, index=False)
+    fileio.write(df, args.output_file, args.output_format, args.block_size, spans)
 
-    # Close the input and output files before exiting
-    args.input_file.close()
-    args.output_file.close()
+    # The run is complete, so there is nothing to resume anymore
+    if args.checkpoint:
+        checkpoint.clear(args.checkpoint)
 
     sys.exit(0)
@@ -0,0 +1,231 @@
+# SPDX-License-Identifier: GPL-3.0-only
+
+import csv
+import glob
+import os
+import re
+import sys
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+from colorama import Fore
+
+import csv_metadata_quality.api as api
+import csv_metadata_quality.fileio as fileio
+import csv_metadata_quality.incremental as incremental
+import csv_metadata_quality.pipeline as pipeline
+import csv_metadata_quality.util as util
+from csv_metadata_quality.check import duplicate_item_columns
+
+# Colorama's color codes, which we don't want in the report file
+COLOR_CODES = re.compile(r"\x1b\[[0-9;]*m")
+
+
+def is_batch(path):
+    """Check whether the input file is actually a directory or a glob pattern
+    matching several files.
+
+    Return a boolean.
+    """
+
+    if path == "-":
+        return False
+
+    return os.path.isdir(path) or any(character in path for character in "*?[")
+
+
+def input_paths(path):
+    """Find the files to process in a directory or matching a glob pattern. In
+    a directory we only look at files with extensions of formats we can read,
+    optionally compressed.
+
+    Return a sorted list of paths.
+    """
+
+    if not os.path.isdir(path):
+        return sorted(path for path in glob.glob(path) if os.path.isfile(path))
+
+    extensions = tuple(fileio.FORMATS) + tuple(
+        f"{extension}{compression}"
+        for extension in fileio.FORMATS
+        for compression in fileio.COMPRESSIONS
+    )
+
+    return sorted(
+        os.path.join(path, name)
+        for name in os.listdir(path)
+        if name.lower().endswith(extensions)
+        and os.path.isfile(os.path.join(path, name))
+    )
+
+
+def duplicate_names(paths):
+    """Find the file names that several of the input files have, for example
+    when a glob pattern matches files in different directories. Their fixed
+    files would overwrite each other in the output directory.
+
+    Return a sorted list of file names.
+    """
+
+    counts = Counter(os.path.basename(path) for path in paths)
+
+    return sorted(name for name, count in counts.items() if count > 1)
+
+
+def duplicate_entries(df):
+    """Compute the duplicate keys of the items in a DataFrame or an Arrow table
+    so that we can find duplicate items across files.
+
+    Return a tuple of the title column name and a list of (duplicate key,
+    title key, title) tuples, see incremental.duplicate_keys(), or None if
+    there are no title, type, and date issued columns.
+    """
+
+    if not isinstance(df, pd.DataFrame):
+        columns = [
+            column
+            for column in df.column_names
+            if re.search(pipeline.DUPLICATE_ITEM_COLUMNS, column)
+        ]
+        df = fileio.to_pandas(df.select(columns))
+
+    keys = incremental.duplicate_keys(df)
+    if keys is None:
+        return None
+
+    title_column_name = duplicate_item_columns(df)[0]
+
+    return title_column_name, [
+        (item_key, title_key, None if pd.isna(title) else title)
+        for (item_key, title_key), title in zip(keys, df[title_column_name])
+    ]
+
+
+def process_file(path, args, output_directory=None):
+    """Run all checks and fixes on one file and write the fixed file to the
+    output directory, with the same name.
+
+    Return a tuple of the findings and the duplicate entries.
+    """
+
+    input_format = args.input_format or fileio.detect_format(path)
+
+    if input_format == "feather" and fileio.detect_compression(path) is None:
+        df = fileio.read_table(path)
+    else:
+        df = fileio.read(path, input_format, block_size=args.block_size)
+
+    df, findings = api.process(df, args)
+
+    if output_directory is not None:
+        fileio.write(
+            df,
+            os.path.join(output_directory, os.path.basename(path)),
+            args.output_format,
+            args.block_size,
+        )
+
+    return findings, duplicate_entries(df)
+
+
+def write_report(path, results):
+    """Write the findings of all files to a CSV report with the file, the row
+    (starting at 0, or empty if the finding is not about a row), and the
+    finding without color codes."""
+
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["file", "row", "finding"])
+
+        for input_path, findings in results:
+            for row, line in findings:
+                writer.writerow(
+                    [input_path, "" if row is None else row, COLOR_CODES.sub("", line)]
+                )
+
+
+def run(args):
+    """Process all files in a directory or matching a glob pattern with a pool
+    of workers, print the findings of each file, and check for duplicate items
+    across files.
+
+    All files are processed in the same process, so the country table, the
+    SPDX licenses, the langid model, and the AGROVOC session are only loaded
+    once.
+
+    Return the total number of findings.
+    """
+
+    paths = input_paths(args.input_file)
+    if not paths:
+        sys.exit(f"Error: no files found in {args.input_file}")
+
+    output_directory = None if args.check_only else args.output_file
+    if output_directory is not None:
+        names = duplicate_names(paths)
+        if names:
+            sys.exit(
+                f"Error: several input files are called {', '.join(names)}, so their fixed files would overwrite each other in {output_directory}"
+            )
+
+        os.makedirs(output_directory, exist_ok=True)
+
+    # Compile the plan and load everything that is expensive to set up once,
+    # before the workers start.
+    if getattr(args, "plan", None) is None:
+        args.plan = pipeline.compile_plan(args)
+
+    util.spdx_licenses()
+    util.country_converter()
+
+    results = []
+    duplicates_index = incremental.duplicate_index()
+    count = 0
+
+    with ThreadPoolExecutor(max_workers=args.workers) as executor:
+        futures = [
+            executor.submit(process_file, path, args, output_directory)
+            for path in paths
+        ]
+
+        # Print the findings of each file in order, as soon as it's done
+        for path, future in zip(paths, futures):
+            findings, entries = future.result()
+
+            print(f"{Fore.CYAN}{path}{Fore.RESET}")
+
+            # Duplicate items in the same file were already reported for that
+            # file, so we only look for items that were first seen in another.
+            if entries is not None and pipeline.selected(
+                pipeline.DUPLICATE_ITEMS_STAGE, None, args
+            ):
+                title_column_name, file_entries = entries
+
+                for (item_path, title), (first_path, _) in incremental.find_duplicates(
+                    (
+                        (item_key, title_key, (path, title))
+                        for item_key, title_key, title in file_entries
+                    ),
+                    duplicates_index,
+                ):
+                    if first_path != item_path:
+                        findings.append(
+                            (
+                                None,
+                                f"{Fore.YELLOW}Possible duplicate ({title_column_name}) of an item in {first_path}: {Fore.RESET}{title}",
+                            )
+                        )
+
+            for row, line in findings:
+                print(line)
+
+            results.append((path, findings))
+            count += pipeline.count_findings(findings)
+
+    if args.report:
+        write_report(args.report, results)
+
+    print(f"Checked {len(paths)} files with {count} issues")
+
+    return count
@@ -4,15 +4,24 @@ import logging
 import re
 from datetime import datetime
 
-import country_converter as coco
+import numpy as np
 import pandas as pd
-import requests
 from colorama import Fore
 from pycountry import languages
 from stdnum import isbn as stdnum_isbn
 from stdnum import issn as stdnum_issn
 
-from csv_metadata_quality.util import is_mojibake, load_spdx_licenses
+import csv_metadata_quality.identifiers as identifiers
+from csv_metadata_quality.agrovoc import validate as validate_agrovoc
+from csv_metadata_quality.findings import row_outputs
+from csv_metadata_quality.util import (
+    agrovoc_cache,
+    agrovoc_session,
+    comparison_form,
+    country_converter,
+    is_mojibake,
+    spdx_licenses,
+)
 
 
 def issn(field):
@@ -59,6 +68,67 @@ def isbn(field):
     return
 
 
+def issn_column(series):
+    """Check if the ISSNs in a column are valid, like issn() but for all values
+    at once. The multi-value fields are split once and the checksums of the
+    distinct values are computed with NumPy.
+
+    Return a tuple of None (nothing is fixed) and a list of what issn() would
+    have printed for each value.
+    """
+
+    values, rows = identifiers.explode(series)
+    invalid = ~identifiers.issn_valid(values)
+
+    lines = [
+        f"{Fore.RED}Invalid ISSN: {Fore.RESET}{value}" for value in values[invalid]
+    ]
+
+    return None, row_outputs(len(series), rows[invalid], lines)
+
+
+def isbn_column(series):
+    """Check if the ISBNs in a column are valid, like isbn() but for all values
+    at once. The multi-value fields are split once and the checksums of the
+    distinct values are computed with NumPy.
+
+    Return a tuple of None (nothing is fixed) and a list of what isbn() would
+    have printed for each value.
+    """
+
+    values, rows = identifiers.explode(series)
+    invalid = ~identifiers.isbn_valid(values)[0]
+
+    lines = [
+        f"{Fore.RED}Invalid ISBN: {Fore.RESET}{value}" for value in values[invalid]
+    ]
+
+    return None, row_outputs(len(series), rows[invalid], lines)
+
+
+def duplicate_isbn(value):
+    """Report an ISBN that is used by more than one item. The same ISBN can be
+    written with or without hyphens, or as an ISBN-10 or ISBN-13, so ISBNs are
+    compared by their keys from identifiers.isbn_keys(), see pipeline.
+    duplicate_identifiers().
+
+    We don't check for duplicate ISSNs because all articles in a journal have
+    the same ISSN.
+    """
+
+    print(f"{Fore.YELLOW}Possible duplicate ISBN: {Fore.RESET}{value}")
+
+
+def duplicate_doi(value):
+    """Report a DOI that is used by more than one item. DOIs are compared by
+    their normalized form from identifiers.normalize_dois(), so they are found
+    even if they were written in different ways, see pipeline.duplicate_
+    identifiers().
+    """
+
+    print(f"{Fore.YELLOW}Possible duplicate DOI: {Fore.RESET}{value}")
+
+
 def date(field, field_name):
     """Check if a date is valid.
 
@@ -206,30 +276,25 @@ def agrovoc(field, field_name, drop):
 
     # Try to split multi-value field on "||" separator
     for value in field.split("||"):
-        request_url = "https://agrovoc.fao.org/browse/rest/v1/search"
-        request_params = {"query": value}
-
-        request = requests.get(request_url, params=request_params)
-
-        if request.status_code == requests.codes.ok:
-            data = request.json()
+        valid = validate_agrovoc(value, agrovoc_cache(), agrovoc_session())
 
-            # check if there are any results
-            if len(data["results"]) == 0:
-                if drop:
-                    print(
-                        f"{Fore.GREEN}Dropping invalid AGROVOC ({field_name}): {Fore.RESET}{value}"
-                    )
-                else:
-                    print(
-                        f"{Fore.RED}Invalid AGROVOC ({field_name}): {Fore.RESET}{value}"
-                    )
+        # Values that we couldn't check because the request failed are left out
+        if valid is None:
+            continue
 
-                    # value is invalid AGROVOC, but we are not dropping
-                    values.append(value)
+        if not valid:
+            if drop:
+                print(
+                    f"{Fore.GREEN}Dropping invalid AGROVOC ({field_name}): {Fore.RESET}{value}"
+                )
             else:
-                # value is valid AGROVOC so save it
+                print(f"{Fore.RED}Invalid AGROVOC ({field_name}): {Fore.RESET}{value}")
+
+                # value is invalid AGROVOC, but we are not dropping
                 values.append(value)
+        else:
+            # value is valid AGROVOC so save it
+            values.append(value)
 
     # Create a new field consisting of all values joined with "||"
     new_field = "||".join(values)
@@ -314,25 +379,21 @@ def spdx_license_identifier(field):
     if pd.isna(field) or field in ignore_licenses:
         return
 
-    spdx_licenses = load_spdx_licenses()
-
     # Try to split multi-value field on "||" separator
     for value in field.split("||"):
-        if value not in spdx_licenses:
+        if value not in spdx_licenses():
             print(f"{Fore.YELLOW}Non-SPDX license identifier: {Fore.RESET}{value}")
 
     return
 
 
-def duplicate_items(df):
-    """Attempt to identify duplicate items.
+def duplicate_item_columns(df):
+    """Find the title, type, and date issued columns used to identify duplicate
+    items.
 
-    First we check the total number of titles and compare it with the number of
-    unique titles. If there are less unique titles than total titles we expand
-    the search by creating a key (of sorts) for each item that includes their
-    title, type, and date issued, and compare it with all the others. If there
-    are multiple occurrences of the same title, type, date string then it's a
-    very good indicator that the items are duplicates.
+    Raises an IndexError if any of the columns are missing.
+
+    Return a tuple of column names.
     """
 
     # Extract the names of the title, type, and date issued columns so we can
@@ -353,6 +414,22 @@ def duplicate_items(df):
         regex=r"^(dcterms\.issued|dc\.date\.accessioned).*$"
     ).columns[0]
 
+    return title_column_name, type_column_name, date_column_name
+
+
+def duplicate_items(df):
+    """Attempt to identify duplicate items.
+
+    First we check the total number of titles and compare it with the number of
+    unique titles. If there are less unique titles than total titles we expand
+    the search by creating a key (of sorts) for each item that includes their
+    title, type, and date issued, and compare it with all the others. If there
+    are multiple occurrences of the same title, type, date string then it's a
+    very good indicator that the items are duplicates.
+    """
+
+    title_column_name, type_column_name, date_column_name = duplicate_item_columns(df)
+
     items_count_total = df[title_column_name].count()
     items_count_unique = df[title_column_name].nunique()
 
@@ -361,11 +438,22 @@ def duplicate_items(df):
         items = []
 
         for index, row in df.iterrows():
-            item_title_type_date = f"{row[title_column_name]}{row[type_column_name]}{row[date_column_name]}"
+            # Missing values are None after fixes but NA or NaN otherwise, so
+            # we write them all as None, like pipeline.duplicate_items_table()
+            # and incremental.duplicate_key().
+            item_title, item_type, item_date = (
+                None if pd.isna(value) else value
+                for value in (
+                    row[title_column_name],
+                    row[type_column_name],
+                    row[date_column_name],
+                )
+            )
+            item_title_type_date = f"{item_title}{item_type}{item_date}"
 
             if item_title_type_date in items:
                 print(
-                    f"{Fore.YELLOW}Possible duplicate ({title_column_name}): {Fore.RESET}{row[title_column_name]}"
+                    f"{Fore.YELLOW}Possible duplicate ({title_column_name}): {Fore.RESET}{item_title}"
                 )
             else:
                 items.append(item_title_type_date)
@@ -477,6 +565,113 @@ def title_in_citation(row, exclude):
     return
 
 
+def row_values(df, pattern, exclude):
+    """Find the value of the last column matching a regex that isn't missing
+    in each row, like citation_doi() and title_in_citation() do when they go
+    over the labels of a row. Excluded columns are skipped.
+
+    Return a NumPy array of strings, with "" for rows without a value.
+    """
+
+    values = np.full(len(df), "", dtype=object)
+
+    for position, label in enumerate(df.columns):
+        if label in exclude or re.match(pattern, label) is None:
+            continue
+
+        column = df.iloc[:, position].to_numpy(dtype=object)
+        present = pd.notna(column)
+        values[present] = column[present]
+
+    return values
+
+
+def comparison_forms(values):
+    """Bring many strings into the form of comparison_form(), computing it once
+    for each distinct string.
+
+    Return a NumPy array of strings.
+    """
+
+    codes, distinct_values = pd.factorize(np.asarray(values, dtype=object))
+    forms = np.array(
+        [comparison_form(value) for value in distinct_values], dtype=object
+    )
+
+    return forms[codes]
+
+
+def citation_doi_rows(df, exclude, lenient=False):
+    """Check for DOIs in the citations of items without a DOI field, like
+    citation_doi() but for all rows at once: the citation of each row is
+    resolved from the columns first, and then all citations are matched with
+    one regex. With lenient, differences in case and whitespace don't matter,
+    for example "DOI:\n10.1186/..." is a DOI too.
+
+    Return a tuple of None (nothing is fixed) and a list of what citation_doi()
+    would have printed for each row.
+    """
+
+    if any(re.match(r"^.*?doi.*$", field) is not None for field in exclude):
+        return None, [""] * len(df)
+
+    # Rows with a value in any DOI field don't need to be checked
+    has_doi = np.zeros(len(df), dtype=bool)
+    for position, label in enumerate(df.columns):
+        if re.match(r"^.*?doi.*$", label) is not None:
+            has_doi |= pd.notna(df.iloc[:, position].to_numpy(dtype=object))
+
+    citations = row_values(df, r"^.*?[cC]itation.*$", exclude)
+    rows = np.flatnonzero(~has_doi & (citations != ""))
+
+    # Same as matching "doi: 10.1186/1743-422X-9-218" and DOI URLs (doi.org,
+    # dx.doi.org, etc) one after the other in citation_doi().
+    candidates = comparison_forms(citations[rows]) if lenient else citations[rows]
+    matches = (
+        pd.Series(candidates, dtype=object)
+        .str.match(r"^.*?doi:\s.*$|^.*?doi\.org.*$")
+        .to_numpy(dtype=bool)
+    )
+
+    lines = [
+        f"{Fore.YELLOW}DOI in citation, but missing a DOI field: {Fore.RESET}{citation}"
+        for citation in citations[rows[matches]]
+    ]
+
+    return None, row_outputs(len(df), rows[matches], lines)
+
+
+def title_in_citation_rows(df, exclude, lenient=False):
+    """Check whether the titles of items are present in their citations, like
+    title_in_citation() but for all rows at once: the title and citation of
+    each row are resolved from the columns first, and then compared pairwise.
+    With lenient, titles that are only written with different accents, case,
+    or whitespace in the citation are considered present.
+
+    Return a tuple of None (nothing is fixed) and a list of what
+    title_in_citation() would have printed for each row.
+    """
+
+    titles = row_values(df, r"^(dc|dcterms)\.title.*$", exclude)
+    citations = row_values(df, r"^.*?[cC]itation.*$", exclude)
+
+    rows = np.flatnonzero(citations != "")
+
+    if lenient:
+        pairs = zip(comparison_forms(titles[rows]), comparison_forms(citations[rows]))
+    else:
+        pairs = zip(titles[rows], citations[rows])
+
+    missing = np.array([title not in citation for title, citation in pairs], dtype=bool)
+
+    lines = [
+        f"{Fore.YELLOW}Title is not present in citation: {Fore.RESET}{title}"
+        for title in titles[rows[missing]]
+    ]
+
+    return None, row_outputs(len(df), rows[missing], lines)
+
+
 def countries_match_regions(row, exclude):
     """Check for the scenario where an item has country coverage metadata, but
     does not have the corresponding region metadata. For example, an item that
@@ -493,10 +688,10 @@ def countries_match_regions(row, exclude):
     region_column_name = ""
     title_column_name = ""
 
-    # Instantiate a CountryConverter() object here. According to the docs it is
-    # more performant to do that as opposed to calling coco.convert() directly
-    # because we don't need to re-load the country data with each iteration.
-    cc = coco.CountryConverter()
+    # Use a shared CountryConverter() object. According to the docs it is more
+    # performant to do that as opposed to calling coco.convert() directly be-
+    # cause we don't need to re-load the country data with each iteration.
+    cc = country_converter()
 
     # Set logging to ERROR so country_converter's convert() doesn't print the
     # "not found in regex" warning message to the screen.
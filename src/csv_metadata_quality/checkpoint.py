@@ -0,0 +1,238 @@
+# SPDX-License-Identifier: GPL-3.0-only
+
+import hashlib
+import json
+import os
+import re
+
+import pandas as pd
+
+import csv_metadata_quality.check as check
+import csv_metadata_quality.fileio as fileio
+import csv_metadata_quality.incremental as incremental
+import csv_metadata_quality.pipeline as pipeline
+
+# Number of rows to run the checks and fixes on rows on between checkpoints
+CHECKPOINT_ROWS = 10000
+
+
+def fingerprint(df, args, exclude):
+    """Summarize the options and the data of a run, so that we only resume from
+    a checkpoint of the same run.
+
+    Return a hex digest.
+    """
+
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(incremental.fingerprint(df.columns, args, exclude).encode("utf-8"))
+    digest.update(pd.util.hash_pandas_object(df, index=False).values.tobytes())
+
+    return digest.hexdigest()
+
+
+def load_state(directory, fingerprint, resume):
+    """Load the list of completed columns and row batches from a checkpoint.
+
+    Returns an empty state unless we are resuming from a checkpoint of the
+    same run.
+
+    Return a dict.
+    """
+
+    state = {"fingerprint": fingerprint, "columns": [], "row_batches": 0}
+
+    if not resume:
+        return state
+
+    try:
+        with open(os.path.join(directory, "checkpoint.json"), encoding="UTF-8") as f:
+            previous_state = json.load(f)
+    except FileNotFoundError:
+        return state
+
+    if previous_state.get("fingerprint") != fingerprint:
+        return state
+
+    return previous_state
+
+
+def save_state(directory, state):
+    """Save the list of completed columns and row batches. The data of each one
+    is saved before it is added to the list, so the checkpoint is consistent
+    no matter when the run is interrupted."""
+
+    incremental.save_state(os.path.join(directory, "checkpoint.json"), state)
+
+
+def saved(directory):
+    """Check whether a checkpoint has any completed columns or batches of rows
+    that a run with --resume could continue from.
+
+    Return boolean.
+    """
+
+    try:
+        with open(os.path.join(directory, "checkpoint.json"), encoding="UTF-8") as f:
+            state = json.load(f)
+    except FileNotFoundError:
+        return False
+
+    return bool(state["columns"] or state["row_batches"])
+
+
+def save_unit(directory, name, df, findings):
+    """Save the fixed values and the findings of a completed column or batch of
+    rows."""
+
+    fileio.write_table(
+        fileio.to_arrow(df), os.path.join(directory, f"{name}.arrow"), "feather"
+    )
+    incremental.save_state(
+        os.path.join(directory, f"{name}.json"),
+        [[None if row is None else int(row), line] for row, line in findings],
+    )
+
+
+def load_unit(directory, name):
+    """Load the fixed values and the findings of a completed column or batch of
+    rows.
+
+    Return a tuple of a DataFrame and a list of findings.
+    """
+
+    df = fileio.to_pandas(fileio.read_table(os.path.join(directory, f"{name}.arrow")))
+
+    with open(os.path.join(directory, f"{name}.json"), encoding="UTF-8") as f:
+        findings = json.load(f)
+
+    return df, findings
+
+
+def replay(findings, recorder):
+    """Print the findings of a completed column or batch of rows again, for the
+    rows they were about."""
+
+    for row, line in findings:
+        recorder.row = row
+        print(line)
+
+    recorder.row = None
+
+
+def clear(directory):
+    """Remove the checkpoint of a run that completed."""
+
+    if not os.path.isdir(directory):
+        return
+
+    for name in os.listdir(directory):
+        if name == "checkpoint.json" or re.match(
+            r"^(column|rows)-\d+\.(arrow|json)$", name
+        ):
+            os.remove(os.path.join(directory, name))
+
+
+def process(df, args, exclude, recorder, changes=None):
+    """Run all checks and fixes on a DataFrame like pipeline.process(), saving
+    a checkpoint to the args.checkpoint directory after every column and every
+    batch of CHECKPOINT_ROWS rows.
+
+    With args.resume, columns and batches of rows that were completed in a
+    previous run of the same file with the same options are loaded from the
+    checkpoint and their findings are printed again instead of running the
+    checks and fixes. AGROVOC lookups that were completed are already stored
+    in the AGROVOC cache, so they are not repeated either.
+
+    Return the fixed DataFrame.
+    """
+
+    directory = args.checkpoint
+    os.makedirs(directory, exist_ok=True)
+
+    state = load_state(directory, fingerprint(df, args, exclude), args.resume)
+    save_state(directory, state)
+
+    for position, column in enumerate(df.columns):
+        if column in exclude:
+            print(f"{pipeline.SKIPPING}{column}")
+
+            continue
+
+        name = f"column-{position}"
+
+        if name in state["columns"]:
+            fixed_df, findings = load_unit(directory, name)
+            series = (
+                fixed_df[column].astype(object).where(fixed_df[column].notna(), None)
+            )
+            series.index = df.index
+            replay(findings, recorder)
+        else:
+            start = len(recorder.findings)
+            series = pipeline.run_column(df[column], args, recorder)
+            save_unit(
+                directory,
+                name,
+                pd.DataFrame({column: series}),
+                recorder.findings[start:],
+            )
+            state["columns"].append(name)
+            save_state(directory, state)
+
+        mask = pipeline.changed_mask(df[column], series)
+        if mask.any():
+            df[column] = series
+            pipeline.record_changes(changes, column, mask)
+
+    # Check: duplicate identifiers, which are quick enough to check again
+    pipeline.duplicate_identifiers(
+        pipeline.identifier_entries(df, args, exclude), recorder, df.index
+    )
+
+    # Check: duplicate items
+    if pipeline.selected(pipeline.DUPLICATE_ITEMS_STAGE, None, args):
+        recorder.stage = pipeline.DUPLICATE_ITEMS_STAGE.name
+
+        try:
+            check.duplicate_items(df.filter(regex=pipeline.DUPLICATE_ITEM_COLUMNS))
+        except IndexError:
+            pass
+
+        recorder.stage = None
+
+    row_columns = [
+        column for column in df.columns if re.search(pipeline.ROW_COLUMNS, column)
+    ]
+    if not pipeline.row_stages(args):
+        return df
+
+    batches = []
+    for number, start in enumerate(range(0, len(df), CHECKPOINT_ROWS)):
+        name = f"rows-{number}"
+
+        if number < state["row_batches"]:
+            batch, findings = load_unit(directory, name)
+            batch = batch.astype(object).where(batch.notna(), None)
+            batch.index = df.index[start : start + CHECKPOINT_ROWS]
+            replay(findings, recorder)
+        else:
+            first = len(recorder.findings)
+            batch = pipeline.process_rows(
+                df.iloc[start : start + CHECKPOINT_ROWS], args, exclude, recorder
+            )
+            save_unit(directory, name, batch[row_columns], recorder.findings[first:])
+            state["row_batches"] = number + 1
+            save_state(directory, state)
+
+        batches.append(batch[row_columns])
+
+    if batches:
+        fixed = pd.concat(batches)
+
+        for column in row_columns:
+            mask = pipeline.changed_mask(df[column], fixed[column])
+            if mask.any():
+                df[column] = fixed[column]
+                pipeline.record_changes(changes, column, mask)
+
+    return df
@@ -0,0 +1,179 @@
+# SPDX-License-Identifier: GPL-3.0-only
+
+# Only use the standard library here so that the client starts quickly, which
+# is the whole point of sending files to a warm server.
+import argparse
+import base64
+import http.client
+import json
+import os
+import socket
+import sys
+from urllib.parse import urlencode, urlsplit
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(
+        prog="csv-metadata-quality client",
+        description="Check a file using a running csv-metadata-quality server.",
+    )
+    parser.add_argument(
+        "--agrovoc-fields",
+        "-a",
+        help="Comma-separated list of fields to validate against AGROVOC, for example: dcterms.subject,cg.coverage.country",
+    )
+    parser.add_argument(
+        "--checks",
+        help="Comma-separated list of the only checks and fixes to run, for example: date,issn,isbn.",
+    )
+    parser.add_argument(
+        "--drop-invalid-agrovoc",
+        "-d",
+        help="After validating metadata values against AGROVOC, drop invalid values.",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--experimental-checks",
+        "-e",
+        help="Enable experimental checks like language detection",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--input-file",
+        "-i",
+        help="Path to input file. Must be a UTF-8 CSV, Parquet, Feather (Arrow IPC), or Excel (.xlsx) file.",
+        required=True,
+    )
+    parser.add_argument(
+        "--lenient-citations",
+        help="Ignore differences in accents, case, and whitespace when checking whether the title and a DOI are present in the citation.",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--output-file",
+        "-o",
+        help="Path to output file, in the same format as the input file.",
+        required=True,
+    )
+    parser.add_argument(
+        "--skip-checks",
+        help="Comma-separated list of checks and fixes not to run, for example: mojibake,countries_match_regions",
+    )
+    parser.add_argument(
+        "--socket",
+        "-s",
+        help="Path to the Unix socket of the server.",
+    )
+    parser.add_argument(
+        "--unsafe-fixes", "-u", help="Perform unsafe fixes.", action="store_true"
+    )
+    parser.add_argument(
+        "--url",
+        help="URL of the server. Default: http://127.0.0.1:8000.",
+        default="http://127.0.0.1:8000",
+    )
+    parser.add_argument(
+        "--exclude-fields",
+        "-x",
+        help="Comma-separated list of fields to skip, for example: dc.contributor.author,dcterms.bibliographicCitation",
+    )
+
+    return parser.parse_args(argv)
+
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    """HTTP connection over a Unix socket."""
+
+    def __init__(self, path):
+        super().__init__("localhost")
+        self.path = path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.connect(self.path)
+
+
+def connect(url=None, socket_path=None):
+    """Open a connection to the server, over a Unix socket if a path is given.
+
+    Return an HTTPConnection.
+    """
+
+    if socket_path:
+        return UnixHTTPConnection(socket_path)
+
+    url = urlsplit(url)
+
+    return http.client.HTTPConnection(url.hostname, url.port or 80)
+
+
+def request(connection, payload, filename, options):
+    """Send the contents of a file to the server to be checked.
+
+    Return a tuple of the fixed file's contents and the findings.
+    """
+
+    # Only send options that are set, the server uses the defaults otherwise
+    query = {"filename": os.path.basename(filename)}
+    for option, value in options.items():
+        if value is True:
+            query[option] = "1"
+        elif value:
+            query[option] = value
+
+    connection.request("POST", f"/process?{urlencode(query)}", body=payload)
+    response = connection.getresponse()
+    body = json.loads(response.read())
+
+    if response.status != 200:
+        raise RuntimeError(body["error"])
+
+    if body["encoding"] == "base64":
+        data = base64.b64decode(body["data"])
+    else:
+        data = body["data"].encode("utf-8")
+
+    return data, body["findings"]
+
+
+def run(argv):
+    args = parse_args(argv)
+
+    options = {
+        "agrovoc_fields": args.agrovoc_fields,
+        "checks": args.checks,
+        "drop_invalid_agrovoc": args.drop_invalid_agrovoc,
+        "exclude_fields": args.exclude_fields,
+        "experimental_checks": args.experimental_checks,
+        "lenient_citations": args.lenient_citations,
+        "skip_checks": args.skip_checks,
+        "unsafe_fixes": args.unsafe_fixes,
+    }
+
+    with open(args.input_file, "rb") as f:
+        payload = f.read()
+
+    connection = connect(args.url, args.socket)
+
+    try:
+        data, findings = request(connection, payload, args.input_file, options)
+    except (ConnectionError, FileNotFoundError) as e:
+        print(
+            f"Could not connect to the server, is csv-metadata-quality serve running? ({e})",
+            file=sys.stderr,
+        )
+        sys.exit(1)
+    except RuntimeError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+    finally:
+        connection.close()
+
+    # Print the findings just like the command line does
+    for row, line in findings:
+        print(line)
+
+    with open(args.output_file, "wb") as f:
+        f.write(data)
+
+    sys.exit(0)
@@ -3,10 +3,11 @@
 import re
 
 import pandas as pd
-import py3langid as langid
 from colorama import Fore
 from pycountry import languages
 
+from csv_metadata_quality.util import language_identifier
+
 
 def correct_language(row, exclude):
     """Analyze the text used in the title, abstract, and citation fields to pre-
@@ -77,11 +78,9 @@ def correct_language(row, exclude):
     # Concatenate all sample strings into one string
     sample_text = " ".join(sample_strings)
 
-    # Restrict the langid detection space to reduce false positives
-    langid.set_languages(
-        ["ar", "de", "en", "es", "fr", "hi", "it", "ja", "ko", "pt", "ru", "vi", "zh"]
-    )
-    langid_classification = langid.classify(sample_text)
+    # Use the shared langid identifier, which has its detection space restricted
+    # to reduce false positives.
+    langid_classification = language_identifier().classify(sample_text)
 
     # langid returns an ISO 639-1 (alpha 2) representation of the detected language, but the current item's language field might be ISO 639-3 (alpha 3) so we should use a pycountry Language object to compare both represenations and give appropriate error messages that match the format used by in the input file.
     detected_language = languages.get(alpha_2=langid_classification[0])
@@ -0,0 +1,1082 @@
+# SPDX-License-Identifier: GPL-3.0-only
+
+import csv
+import io
+import lzma
+import os
+import sys
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from datetime import datetime, time
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pacsv
+import pyarrow.feather as feather
+import pyarrow.parquet as pq
+
+# Map filename extensions to the file formats we can read and write. Arrow IPC
+# files are the same thing as Feather (version 2) files.
+FORMATS = {
+    ".csv": "csv",
+    ".parquet": "parquet",
+    ".pq": "parquet",
+    ".feather": "feather",
+    ".arrow": "feather",
+    ".ipc": "feather",
+    ".xlsx": "xlsx",
+}
+
+# Map filename extensions to the compression of CSV files. pyarrow has codecs
+# for all of them except xz, which we handle with Python's lzma module.
+COMPRESSIONS = {
+    ".gz": "gzip",
+    ".bz2": "bz2",
+    ".xz": "xz",
+    ".zst": "zstd",
+}
+
+# The first bytes of compressed files, so that we can detect the compression of
+# an input file that doesn't have the usual extension.
+COMPRESSION_MAGIC_BYTES = {
+    b"\x1f\x8b": "gzip",
+    b"BZh": "bz2",
+    b"\xfd7zXZ\x00": "xz",
+    b"\x28\xb5\x2f\xfd": "zstd",
+}
+
+# Number of rows to read from an Excel sheet before we convert them to Arrow
+XLSX_BATCH_SIZE = 10000
+
+# Number of bytes of CSV to parse or write in one go, which is also the unit of
+# work for the threads that do it. This is the pyarrow default.
+CSV_BLOCK_SIZE = 1 << 20
+
+# Columns with at most this many distinct values per value, like dcterms.type
+# or dcterms.language, are dictionary-encoded when they are read, see
+# dictionary_encode().
+DICTIONARY_MAX_RATIO = 0.2
+
+# Where the fields of some columns of a CSV file are, so that we can copy them
+# to the output without parsing them:
+#
+#   - data: the memory mapped bytes of the file
+#   - columns: dictionary of column names and a tuple of NumPy arrays with the
+#     start and end offsets of the column's field in each row
+CsvSpans = namedtuple("CsvSpans", ["data", "columns"])
+
+# Values that Pandas reads as missing by default. We use the same list with the
+# pyarrow CSV reader so that the same values end up missing as before.
+#
+# See: https://pandas.pydata.org/docs/reference/api/pandas.read_csv.html
+CSV_NA_VALUES = [
+    "",
+    "#N/A",
+    "#N/A N/A",
+    "#NA",
+    "-1.#IND",
+    "-1.#QNAN",
+    "-NaN",
+    "-nan",
+    "1.#IND",
+    "1.#QNAN",
+    "<NA>",
+    "N/A",
+    "NA",
+    "NULL",
+    "NaN",
+    "None",
+    "n/a",
+    "nan",
+    "null",
+]
+
+
+def detect_format(path):
+    """Detect the format of a file from its extension, falling back to CSV for
+    unknown extensions.
+
+    Return the name of the format.
+    """
+
+    root, extension = os.path.splitext(path)
+
+    # Look at the extension before the compression, as in export.csv.gz
+    if extension.lower() in COMPRESSIONS:
+        extension = os.path.splitext(root)[1]
+
+    return FORMATS.get(extension.lower(), "csv")
+
+
+def detect_compression(path, sniff=True):
+    """Detect the compression of a file from its extension or, if the file
+    exists and sniff is True, from its first bytes.
+
+    Return the name of the compression, or None if the file isn't compressed.
+    """
+
+    extension = os.path.splitext(path)[1].lower()
+    if extension in COMPRESSIONS:
+        return COMPRESSIONS[extension]
+
+    # Standard input can't be read twice, see open_stdin()
+    if not sniff or path == "-":
+        return None
+
+    try:
+        with open(path, "rb") as f:
+            start = f.read(6)
+    except OSError:
+        return None
+
+    for magic_bytes, compression in COMPRESSION_MAGIC_BYTES.items():
+        if start.startswith(magic_bytes):
+            return compression
+
+    return None
+
+
+def open_input(path):
+    """Open a file for reading, decompressing it on the fly if it's compressed.
+    The path "-" means standard input.
+
+    Return a binary file object.
+    """
+
+    if path == "-":
+        return open_stdin()
+
+    compression = detect_compression(path)
+
+    if compression == "xz":
+        return lzma.open(path, "rb")
+
+    return pa.input_stream(path, compression=compression)
+
+
+def open_stdin():
+    """Open standard input for reading, decompressing it on the fly if its first
+    bytes say that it's compressed.
+
+    Return a binary file object that supports readline().
+    """
+
+    stdin = sys.stdin.buffer
+
+    # Look at the first bytes without consuming them
+    start = stdin.peek(6)[:6]
+
+    for magic_bytes, compression in COMPRESSION_MAGIC_BYTES.items():
+        if start.startswith(magic_bytes):
+            if compression == "xz":
+                return lzma.open(stdin, "rb")
+
+            return io.BufferedReader(
+                pa.CompressedInputStream(pa.PythonFile(stdin, mode="r"), compression)
+            )
+
+    return stdin
+
+
+def open_output(path):
+    """Open a file for writing, compressing it on the fly if its extension says
+    it should be compressed. The path "-" means standard output, which is left
+    open when we are done with it.
+
+    Return a binary file object.
+    """
+
+    if path == "-":
+        return nullcontext(sys.stdout.buffer)
+
+    compression = detect_compression(path, sniff=False)
+
+    if compression == "xz":
+        return lzma.open(path, "wb")
+    elif compression is not None:
+        return pa.output_stream(path, compression=compression)
+
+    return open(path, "wb")
+
+
+def read(path, file_format=None, columns=None, block_size=None):
+    """Read a CSV, Parquet, or Feather file into a DataFrame.
+
+    All fields are read as strings so that dates don't get converted from 1998
+    to 1998.0. Columns in Parquet and Feather files are cast to strings for the
+    same reason and stay backed by pyarrow, which means we don't have to go
+    through Python objects until a check or fix actually looks at a value.
+    Columns with few distinct values become categoricals, see
+    dictionary_encode().
+
+    Optionally read only the given list of columns. For the columnar formats
+    the other columns are never even read from disk.
+
+    Return a DataFrame.
+    """
+
+    return to_pandas(
+        read_arrow(path, file_format, columns, block_size, dictionary=True)
+    )
+
+
+def read_arrow(path, file_format=None, columns=None, block_size=None, dictionary=False):
+    """Read a CSV, Parquet, Feather, or Excel file into an Arrow table, without
+    converting it to a DataFrame.
+
+    Optionally dictionary-encode the columns with few distinct values, see
+    dictionary_encode().
+
+    Return an Arrow table.
+    """
+
+    if file_format is None:
+        file_format = detect_format(path)
+
+    if file_format != "csv" and detect_compression(path) is not None:
+        raise ValueError("Only CSV files can be compressed")
+
+    # The readers of the other formats need to seek, so we read them from
+    # standard input into memory first.
+    if path == "-" and file_format != "csv":
+        source = io.BytesIO(sys.stdin.buffer.read())
+    else:
+        source = path
+
+    if file_format == "csv":
+        table = read_csv(path, columns=columns, block_size=block_size)
+    elif file_format == "parquet":
+        table = pq.read_table(source, columns=columns)
+    elif file_format == "feather":
+        table = feather.read_table(source, columns=columns)
+    elif file_format == "xlsx":
+        table = read_xlsx(source, columns=columns)
+    else:
+        raise ValueError(f"Unsupported file format: {file_format}")
+
+    if dictionary:
+        table = dictionary_encode(table)
+
+    return table
+
+
+def column_names(path, file_format=None):
+    """Read the column names of a file without reading its rows: the header of
+    a CSV file, the schema of a Parquet or Feather file, or the first row of
+    the first sheet of an Excel workbook.
+
+    Return a list of column names.
+    """
+
+    if file_format is None:
+        file_format = detect_format(path)
+
+    if file_format == "csv":
+        return csv_header(path)
+
+    if detect_compression(path) is not None:
+        raise ValueError("Only CSV files can be compressed")
+
+    if file_format == "parquet":
+        return pq.read_schema(path).names
+    elif file_format == "feather":
+        with pa.memory_map(path) as source:
+            return pa.ipc.open_file(source).schema.names
+    elif file_format == "xlsx":
+        workbook = load_openpyxl().load_workbook(path, read_only=True, data_only=True)
+
+        try:
+            rows = workbook.worksheets[0].iter_rows(values_only=True)
+
+            return xlsx_header(next(rows, ()))
+        finally:
+            workbook.close()
+
+    raise ValueError(f"Unsupported file format: {file_format}")
+
+
+def dictionary_encode(table, max_ratio=DICTIONARY_MAX_RATIO):
+    """Dictionary-encode the string columns of an Arrow table that have few
+    distinct values compared to the number of values, for example a type or
+    language column with a few hundred distinct values in hundreds of thousands
+    of rows. Each distinct value is stored once and the rows only store its
+    index, which saves memory, and the checks and fixes run once for each
+    distinct value instead of once for each row. Fixes only rewrite the
+    dictionary and the indices.
+
+    Return an Arrow table.
+    """
+
+    for index, field in enumerate(table.schema):
+        if not (pa.types.is_string(field.type) or pa.types.is_large_string(field.type)):
+            continue
+
+        column = table.column(index)
+
+        count = len(column) - column.null_count
+        if count == 0 or pc.count_distinct(column).as_py() > count * max_ratio:
+            continue
+
+        table = table.set_column(index, field.name, pc.dictionary_encode(column))
+
+    return table
+
+
+def is_dictionary(data_type):
+    """Check whether a column is a dictionary-encoded string column, given its
+    Arrow or Pandas type.
+
+    Return boolean.
+    """
+
+    if not isinstance(data_type, pa.DataType):
+        return isinstance(data_type, pd.CategoricalDtype)
+
+    return pa.types.is_dictionary(data_type) and pa.types.is_string(
+        data_type.value_type
+    )
+
+
+def load_openpyxl():
+    """Import openpyxl, which is an optional dependency.
+
+    Return the openpyxl module.
+    """
+
+    try:
+        import openpyxl
+    except ImportError:
+        raise ImportError(
+            "Reading and writing Excel files requires openpyxl, install it with: pip install csv-metadata-quality[excel]"
+        ) from None
+
+    return openpyxl
+
+
+def xlsx_cell_to_string(value):
+    """Convert the value of an Excel cell to a string.
+
+    Excel stores all numbers as floats, so whole numbers like the year 1998 are
+    converted without the trailing ".0". Dates and times are converted to ISO
+    8601 strings, dropping the time from dates that don't have one.
+
+    Return a string, or None for empty cells.
+    """
+
+    if value is None:
+        return None
+
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+
+    if isinstance(value, datetime):
+        if value.time() == time(0, 0):
+            return value.date().isoformat()
+
+        return value.isoformat()
+
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+
+    return str(value)
+
+
+def read_xlsx(path, columns=None):
+    """Read the first sheet of an Excel (.xlsx) workbook.
+
+    We use openpyxl's read-only mode, which streams the rows from the sheet
+    instead of loading the whole workbook into memory. The rows are converted
+    to Arrow in batches, so we never hold more than one batch of rows as
+    Python objects.
+
+    Return an Arrow table with string columns.
+    """
+
+    openpyxl = load_openpyxl()
+
+    workbook = openpyxl.load_workbook(path, read_only=True, data_only=True)
+
+    try:
+        rows = workbook.worksheets[0].iter_rows(values_only=True)
+
+        header = xlsx_header(next(rows, ()))
+
+        schema = pa.schema([(name, pa.string()) for name in header])
+
+        batches = []
+        batch = []
+
+        for row in rows:
+            # Skip empty rows
+            if all(value is None for value in row):
+                continue
+
+            # Rows can be shorter or longer than the header
+            row = list(row[: len(header)])
+            row += [None] * (len(header) - len(row))
+
+            batch.append([xlsx_cell_to_string(value) for value in row])
+
+            if len(batch) == XLSX_BATCH_SIZE:
+                batches.append(xlsx_batch(batch, schema))
+                batch = []
+
+        if batch:
+            batches.append(xlsx_batch(batch, schema))
+    finally:
+        workbook.close()
+
+    table = pa.Table.from_batches(batches, schema=schema)
+
+    if columns is not None:
+        table = table.select(columns)
+
+    return table
+
+
+def xlsx_header(row):
+    """Get the column names from the first row of a sheet, without the empty
+    columns at the end. Duplicate names are renamed, see unique_column_names().
+
+    Return a list of column names.
+    """
+
+    header = [xlsx_cell_to_string(value) for value in row]
+
+    # Drop empty columns at the end of the header
+    while header and header[-1] is None:
+        header.pop()
+
+    return unique_column_names(header)
+
+
+def xlsx_batch(rows, schema):
+    """Convert a list of rows to an Arrow record batch.
+
+    Return a record batch.
+    """
+
+    return pa.record_batch(
+        [pa.array(values, pa.string()) for values in zip(*rows)], schema=schema
+    )
+
+
+def unique_column_names(header):
+    """Rename duplicate column names the same way as Pandas' read_csv() used to:
+    the second "dc.title" becomes "dc.title.1", the third "dc.title.2", and so
+    on, skipping names that are already in the header.
+
+    Return a list of column names.
+    """
+
+    names = list(header)
+    counts = {}
+
+    for index, name in enumerate(names):
+        count = counts.get(name, 0)
+
+        unique_name = name
+        while count > 0:
+            counts[name] = count + 1
+            unique_name = f"{name}.{count}"
+
+            if unique_name in names:
+                count += 1
+            else:
+                count = counts.get(unique_name, 0)
+
+        names[index] = unique_name
+        counts[unique_name] = count + 1
+
+    return names
+
+
+def csv_header(path):
+    """Read the column names from the first line of a CSV file. Duplicate names
+    are renamed, see unique_column_names().
+
+    Return a list of column names.
+    """
+
+    # Use utf-8-sig to skip the byte order mark that Excel likes to add
+    with io.TextIOWrapper(open_input(path), encoding="utf-8-sig", newline="") as f:
+        return unique_column_names(next(csv.reader(f), []))
+
+
+def read_csv_header(stream):
+    """Read the column names from the start of a binary stream that we can only
+    read once, like standard input, leaving the stream at the first row.
+    Duplicate names are renamed, see unique_column_names().
+
+    Return a list of column names.
+    """
+
+    # A quoted column name can contain a line break, in which case the header
+    # goes on until the number of double quotes is even.
+    text = stream.readline().decode("utf-8-sig")
+    while text.count('"') % 2 == 1:
+        line = stream.readline()
+        if not line:
+            break
+        text += line.decode("utf-8")
+
+    return unique_column_names(next(csv.reader(io.StringIO(text, newline="")), []))
+
+
+def csv_options(header, columns=None, block_size=None):
+    """Set the options of pyarrow's CSV reader so that we get the same values
+    as Pandas' read_csv() used to give us: all columns are strings, the same
+    values are missing, and quoted values can span multiple lines.
+
+    Return a tuple of ReadOptions, ParseOptions, and ConvertOptions.
+    """
+
+    read_options = pacsv.ReadOptions(
+        use_threads=True, block_size=block_size or CSV_BLOCK_SIZE
+    )
+    parse_options = pacsv.ParseOptions(newlines_in_values=True)
+    convert_options = pacsv.ConvertOptions(
+        column_types={column: pa.string() for column in header},
+        null_values=CSV_NA_VALUES,
+        strings_can_be_null=True,
+        include_columns=columns,
+    )
+
+    return read_options, parse_options, convert_options
+
+
+def open_csv_stream(path):
+    """Open a CSV file, or standard input if the path is "-", and read its
+    header.
+
+    Return a tuple of the binary stream positioned at the first row and the
+    column names.
+    """
+
+    stream = open_input(path)
+
+    # pyarrow's readers can't read lines, so we wrap them in a buffer
+    if isinstance(stream, pa.NativeFile):
+        stream = io.BufferedReader(stream)
+
+    return stream, read_csv_header(stream)
+
+
+def read_csv_batches(path, block_size=None):
+    """Read a CSV file, or standard input if the path is "-", as a stream of
+    record batches of about one block each, so that the first rows can be
+    processed before the rest of the file has been read.
+
+    Return a pyarrow CSVStreamingReader.
+    """
+
+    stream, header = open_csv_stream(path)
+
+    # pyarrow's reader doesn't accept a file with only a header
+    if not stream.peek(1):
+        return pa.RecordBatchReader.from_batches(empty_table(header).schema, [])
+
+    read_options, parse_options, convert_options = csv_options(
+        header, block_size=block_size
+    )
+    read_options.column_names = header
+
+    return pacsv.open_csv(
+        stream,
+        read_options=read_options,
+        parse_options=parse_options,
+        convert_options=convert_options,
+    )
+
+
+def read_batches(path, file_format=None, block_size=None):
+    """Read a file as a stream of record batches, so that we can look at each
+    batch and let go of it before we read the next. CSV files are parsed one
+    block at a time, Parquet files one row group at a time, and Feather files
+    are memory mapped. Excel files and files in other formats than CSV on
+    standard input have to be read completely first.
+
+    Return an iterable of record batches.
+    """
+
+    if file_format is None:
+        file_format = detect_format(path)
+
+    if file_format == "csv":
+        return read_csv_batches(path, block_size)
+
+    if path != "-" and file_format == "parquet":
+        if detect_compression(path) is not None:
+            raise ValueError("Only CSV files can be compressed")
+
+        return pq.ParquetFile(path).iter_batches()
+
+    if path != "-" and file_format == "feather":
+        return read_table(path).to_batches()
+
+    return read_arrow(path, file_format).to_batches()
+
+
+def read_csv(path, columns=None, block_size=None):
+    """Read a CSV file with pyarrow's multi-threaded CSV reader.
+
+    The file is split into blocks that are parsed in parallel and decoded
+    straight into Arrow strings without going through Python objects. The
+    options are chosen so that we get the same values as Pandas' read_csv()
+    used to give us: all columns are strings, the same values are missing,
+    and quoted values can span multiple lines.
+
+    Compressed files are decompressed as a stream. The reader reads ahead in a
+    background thread, so the next block is decompressed while the previous
+    ones are parsed.
+
+    Return an Arrow table.
+    """
+
+    # We read the header ourselves and give the reader the rest, because
+    # standard input can only be read once and pyarrow's reader would keep
+    # duplicate column names.
+    source, header = open_csv_stream(path)
+
+    # pyarrow's reader doesn't accept a file with only a header
+    if not source.peek(1):
+        return empty_table(header if columns is None else columns)
+
+    read_options, parse_options, convert_options = csv_options(
+        header, columns, block_size
+    )
+    read_options.column_names = header
+
+    return pacsv.read_csv(
+        source,
+        read_options=read_options,
+        parse_options=parse_options,
+        convert_options=convert_options,
+    )
+
+
+def empty_table(columns):
+    """Return an Arrow table without rows with string columns."""
+
+    return pa.table([pa.array([], pa.string()) for column in columns], names=columns)
+
+
+def read_passthrough(path, copy_columns, unread_columns, block_size=None):
+    """Read a CSV file for processing, but without parsing the columns whose
+    values nothing looks at, and find the fields of the columns that nothing
+    can change so that they can be copied to the output byte for byte.
+
+    Columns that are not parsed are still in the DataFrame, in their original
+    position, but with all values missing.
+
+    Return a tuple of the DataFrame and CsvSpans (or None if the layout of the
+    file is not regular enough, in which case the whole file is parsed).
+    """
+
+    spans = csv_field_spans(path, copy_columns, block_size)
+    if spans is None:
+        return read(path, "csv", block_size=block_size), None
+
+    header = csv_header(path)
+    columns = [column for column in header if column not in unread_columns]
+
+    rows = len(next(iter(spans.columns.values()))[0]) if spans.columns else None
+
+    table = read_csv(path, columns=columns, block_size=block_size)
+    if rows is not None and columns and table.num_rows != rows:
+        return read(path, "csv", block_size=block_size), None
+
+    for index, column in enumerate(header):
+        if column in unread_columns:
+            table = table.add_column(index, column, pa.nulls(rows, pa.string()))
+
+    return to_pandas(table), spans
+
+
+def csv_fields(array, single_column=False):
+    """Render the values of a string array as CSV fields.
+
+    Values are quoted the same way as Pandas' to_csv() (actually Python's csv
+    module with QUOTE_MINIMAL) quotes them: only if they contain a comma, a
+    double quote, or a line break. Missing values are empty.
+
+    Python's csv module quotes empty fields if they are the only field in the
+    row, so we do that too for files with a single column.
+
+    Return a string array.
+    """
+
+    array = array.cast(pa.string())
+
+    needs_quotes = pc.match_substring_regex(array, r'[,"\r\n]')
+    quoted = pc.binary_join_element_wise(
+        '"', pc.replace_substring(array, '"', '""'), '"', ""
+    )
+    fields = pc.fill_null(pc.if_else(needs_quotes, quoted, array), "")
+
+    if single_column:
+        fields = pc.if_else(pc.equal(fields, ""), '""', fields)
+
+    return fields
+
+
+def csv_lines(arrays, raw_fields=None):
+    """Render rows of string arrays as CSV lines, with all the work happening
+    in Arrow compute functions instead of in Python.
+
+    Optionally pass a dictionary of column positions and arrays of fields that
+    are already in CSV form, which are used as they are instead.
+
+    Return the bytes of the lines.
+    """
+
+    single_column = len(arrays) == 1
+    raw_fields = raw_fields or {}
+
+    fields = [
+        raw_fields[index] if index in raw_fields else csv_fields(array, single_column)
+        for index, array in enumerate(arrays)
+    ]
+
+    # Join the fields with commas and add a line feed to the end of each line
+    lines = pc.binary_join_element_wise(*fields, ",")
+    lines = pc.binary_join_element_wise(lines, "", "\n")
+
+    # The lines are stored back to back in the array's data buffer, starting
+    # and ending at the first and last offsets.
+    offsets = np.frombuffer(lines.buffers()[1], dtype=np.int32)
+    start = offsets[lines.offset]
+    end = offsets[lines.offset + len(lines)]
+
+    return lines.buffers()[2][start:end].to_pybytes()
+
+
+def csv_header_line(column_names):
+    """Return the bytes of the header line of a CSV file."""
+
+    return csv_lines([pa.array([column], pa.string()) for column in column_names])
+
+
+def write_csv_batches(tables, path, column_names):
+    """Write Arrow tables to a CSV file, or standard output if the path is "-",
+    one after the other as they arrive. The output is flushed after every table
+    so that the next program in a pipeline can start on the first rows while we
+    work on the next ones.
+    """
+
+    with open_output(path) as f:
+        f.write(csv_header_line(column_names))
+        f.flush()
+
+        for table in tables:
+            for batch in table.to_batches():
+                f.write(csv_lines(batch.columns))
+
+            f.flush()
+
+
+def write_csv(table, path, block_size=None, spans=None):
+    """Write an Arrow table to a CSV file.
+
+    pyarrow's own CSV writer quotes every string, which would change every line
+    of a file compared to what Pandas used to write. Instead, we render blocks
+    of rows in parallel with Arrow compute functions (which release the GIL)
+    and write them in order.
+
+    Optionally pass the CsvSpans of the input file to copy the fields of some
+    columns byte for byte from the input instead of rendering their values.
+    """
+
+    block_size = block_size or CSV_BLOCK_SIZE
+
+    # Estimate how many rows fit in a block
+    if table.num_rows > 0 and table.nbytes > 0:
+        rows_per_block = max(1, block_size * table.num_rows // table.nbytes)
+    else:
+        rows_per_block = table.num_rows or 1
+
+    with open_output(path) as f, ThreadPoolExecutor() as executor:
+        f.write(csv_header_line(table.column_names))
+
+        batches = table.to_batches(max_chunksize=rows_per_block)
+
+        # Remember the position of the first row of each batch
+        batch_offsets = np.cumsum([0] + [batch.num_rows for batch in batches])
+
+        def render(batch, offset):
+            raw_fields = {}
+
+            if spans is not None:
+                for column, (starts, ends) in spans.columns.items():
+                    end = offset + batch.num_rows
+                    raw_fields[table.column_names.index(column)] = gather_bytes(
+                        spans.data, starts[offset:end], ends[offset:end]
+                    )
+
+            return csv_lines(batch.columns, raw_fields)
+
+        for lines in executor.map(render, batches, batch_offsets):
+            f.write(lines)
+
+
+def csv_field_spans(path, columns, block_size=None):
+    """Find where the fields of some columns of a CSV file start and end, so
+    that they can be copied to the output byte for byte.
+
+    The file is memory mapped and scanned with NumPy in blocks: a comma or a
+    line feed ends a field unless it is inside double quotes, which we know by
+    counting the double quotes before it (escaped quotes come in pairs, so
+    they don't change the count). This only works if every line has the same
+    number of fields, so we give up on files with blank lines or ragged rows.
+
+    Return CsvSpans, or None if the file doesn't have a regular layout (or is
+    compressed, so it can't be memory mapped).
+    """
+
+    block_size = block_size or CSV_BLOCK_SIZE
+
+    if detect_compression(path) is not None:
+        return None
+
+    header = csv_header(path)
+
+    if os.path.getsize(path) == 0:
+        return None
+
+    data = np.memmap(path, dtype=np.uint8, mode="r")
+
+    ends = []
+    inside_quotes = np.uint8(0)
+    for start in range(0, len(data), block_size):
+        block = data[start : start + block_size]
+
+        # Count double quotes modulo 256, which is enough to know if they are
+        # balanced and uses less memory.
+        quotes = np.cumsum(block == ord('"'), dtype=np.uint8) + inside_quotes
+        delimiters = ((block == ord(",")) | (block == ord("\n"))) & (quotes % 2 == 0)
+
+        ends.append(np.flatnonzero(delimiters) + start)
+        inside_quotes = quotes[-1] % 2
+
+    ends = np.concatenate(ends)
+
+    # The last line might not end with a line feed
+    if len(ends) == 0 or ends[-1] != len(data) - 1:
+        ends = np.append(ends, len(data))
+
+    line_ends = np.zeros(len(ends), dtype=bool)
+    line_ends[-1] = True
+    line_ends[:-1] = data[ends[:-1]] == ord("\n")
+
+    if len(ends) % len(header) != 0:
+        return None
+
+    line_ends = line_ends.reshape(-1, len(header))
+    if not line_ends[:, -1].all() or line_ends[:, :-1].any():
+        return None
+
+    starts = np.concatenate([[0], ends[:-1] + 1]).reshape(-1, len(header))
+    ends = ends.reshape(-1, len(header))
+
+    # Don't copy the carriage return of Windows line endings
+    last_ends = ends[:, -1]
+    carriage_returns = last_ends > starts[:, -1]
+    carriage_returns[carriage_returns] = data[last_ends[carriage_returns] - 1] == ord(
+        "\r"
+    )
+    ends[:, -1] -= carriage_returns
+
+    # Skip the header
+    return CsvSpans(
+        data,
+        {
+            column: (starts[1:, header.index(column)], ends[1:, header.index(column)])
+            for column in columns
+        },
+    )
+
+
+def gather_bytes(data, starts, ends):
+    """Copy slices of a byte array into an Arrow string array.
+
+    Return an Arrow string array.
+    """
+
+    lengths = ends - starts
+
+    offsets = np.zeros(len(lengths) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=offsets[1:])
+
+    # Position in data of every byte that we want to copy
+    positions = np.repeat(starts - offsets[:-1], lengths) + np.arange(offsets[-1])
+
+    return pa.StringArray.from_buffers(
+        len(lengths),
+        pa.py_buffer(offsets.astype(np.int32)),
+        pa.py_buffer(np.ascontiguousarray(data[positions])),
+    )
+
+
+def read_table(path):
+    """Memory map an Arrow IPC (Feather) file.
+
+    If the file is not compressed then the Arrow table refers directly to the
+    pages of the mapped file, so reading it costs (almost) no memory at all and
+    the operating system only loads the parts that we actually look at.
+
+    Columns that are not strings are cast to strings, which copies them, except
+    for dictionary-encoded string columns, which are kept as they are.
+
+    Return an Arrow table.
+    """
+
+    if detect_compression(path) is not None:
+        raise ValueError("Only CSV files can be compressed")
+
+    table = feather.read_table(path, memory_map=True)
+
+    for index, field in enumerate(table.schema):
+        if is_dictionary(field.type):
+            continue
+
+        if not (pa.types.is_string(field.type) or pa.types.is_large_string(field.type)):
+            table = table.set_column(
+                index, field.name, table.column(index).cast(pa.string())
+            )
+
+    return table
+
+
+def to_pandas(table):
+    """Convert an Arrow table to a DataFrame with pyarrow-backed string columns.
+    Dictionary-encoded string columns become categoricals.
+
+    Return a DataFrame.
+    """
+
+    schema = pa.schema(
+        [
+            (field.name, field.type if is_dictionary(field.type) else pa.string())
+            for field in table.schema
+        ]
+    )
+
+    return table.cast(schema).to_pandas(types_mapper=arrow_dtype)
+
+
+def arrow_dtype(data_type):
+    """Keep the Arrow types other than dictionaries in Pandas, see to_pandas().
+
+    Return a Pandas ArrowDtype, or None for the default conversion.
+    """
+
+    if pa.types.is_dictionary(data_type):
+        return None
+
+    return pd.ArrowDtype(data_type)
+
+
+def to_arrow(df):
+    """Convert a DataFrame to an Arrow table with string columns.
+
+    Columns that went through checks and fixes contain Python strings and
+    missing values (None or NaN), which pyarrow converts to strings and nulls.
+
+    Return an Arrow table.
+    """
+
+    table = pa.Table.from_pandas(df, preserve_index=False)
+
+    schema = pa.schema([(name, pa.string()) for name in table.column_names])
+
+    return table.cast(schema)
+
+
+def write(df, path, file_format=None, block_size=None, spans=None):
+    """Write a DataFrame (or an Arrow table) to a CSV, Parquet, or Feather
+    file, or to standard output if the path is "-"."""
+
+    if not isinstance(df, pa.Table):
+        df = to_arrow(df)
+
+    write_table(df, path, file_format, block_size, spans)
+
+
+def write_table(table, path, file_format=None, block_size=None, spans=None):
+    """Write an Arrow table to a CSV, Parquet, or Feather file.
+
+    The table is written straight to the file without going through Pandas.
+    """
+
+    if file_format is None:
+        file_format = detect_format(path)
+
+    if file_format != "csv" and detect_compression(path, sniff=False) is not None:
+        raise ValueError("Only CSV files can be compressed")
+
+    # The writers of the other formats may need to seek, so we write them to
+    # memory first when writing to standard output.
+    if path == "-" and file_format != "csv":
+        destination = io.BytesIO()
+    else:
+        destination = path
+
+    if file_format == "csv":
+        write_csv(table, path, block_size, spans)
+    elif file_format == "parquet":
+        pq.write_table(table, destination)
+    elif file_format == "feather":
+        feather.write_feather(table, destination)
+    elif file_format == "xlsx":
+        write_xlsx(table, destination)
+    else:
+        raise ValueError(f"Unsupported file format: {file_format}")
+
+    if destination is not path:
+        sys.stdout.buffer.write(destination.getvalue())
+        sys.stdout.buffer.flush()
+
+
+def write_xlsx(table, path):
+    """Write an Arrow table to an Excel (.xlsx) workbook.
+
+    We use openpyxl's write-only mode, which streams rows to the file instead
+    of building the whole workbook in memory. All values are written as text
+    so that Excel doesn't convert them to numbers, dates, or formulas.
+    """
+
+    openpyxl = load_openpyxl()
+
+    workbook = openpyxl.Workbook(write_only=True)
+    sheet = workbook.create_sheet()
+
+    sheet.append(table.column_names)
+
+    for batch in table.to_batches(max_chunksize=XLSX_BATCH_SIZE):
+        for row in zip(*(column.to_pylist() for column in batch.columns)):
+            sheet.append([xlsx_text_cell(sheet, value) for value in row])
+
+    workbook.save(path)
+
+
+def xlsx_text_cell(sheet, value):
+    """Create a cell for a value in a write-only sheet.
+
+    openpyxl would treat strings starting with "=" as formulas, so we tell it
+    explicitly that they are strings.
+
+    Return a cell, or the value itself if it doesn't need special treatment.
+    """
+
+    if value is None or not value.startswith("="):
+        return value
+
+    from openpyxl.cell import WriteOnlyCell
+
+    cell = WriteOnlyCell(sheet, value)
+    cell.data_type = "s"
+
+    return cell
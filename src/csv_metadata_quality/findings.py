@@ -0,0 +1,225 @@
+# SPDX-License-Identifier: GPL-3.0-only
+
+import io
+import sys
+import threading
+from contextlib import contextmanager
+
+# The stream that each thread is currently recording to, see recording()
+_local = threading.local()
+
+
+class BudgetExceeded(Exception):
+    """Raised by a Recorder with a budget as soon as there are more findings
+    than the budget allows, to stop the run."""
+
+    def __init__(self, count, budget, stage, findings):
+        super().__init__(
+            f"Stopped after {count} issues, more than the maximum of {budget} (at {stage})"
+        )
+
+        self.count = count
+        self.budget = budget
+        self.stage = stage
+        self.findings = findings
+
+
+class Recorder:
+    """Collect the findings that checks and fixes print while they run.
+
+    Checks and fixes report problems by printing a line to stdout. While a
+    Recorder is installed with recording() (or contextlib.redirect_stdout())
+    it receives those lines, remembers which row they belong to, and passes
+    them through to the original stream so the user still sees them as before.
+
+    Findings are stored as a list of (row, line) tuples. The row is None for
+    lines that are not about a particular row, for example "Skipping column".
+    The name of the check or fix that printed each line, if the pipeline told
+    us which one was running, is stored in the same order in stages, and the
+    column it was running on in columns.
+
+    Optionally give a budget of the number of findings from the checks and
+    fixes in counted (a set of names, or None for all of them) to allow. The
+    Recorder raises BudgetExceeded as soon as there are more, after passing
+    the line that was one too many through to the stream. Lines that we don't
+    know the check or fix of, like "Skipping column", are not counted.
+    """
+
+    def __init__(self, stream=sys.stdout, budget=None, counted=None):
+        # Pass lines through to the real stream, not back to ourselves
+        if isinstance(stream, StdoutProxy):
+            stream = stream.stream
+
+        self.stream = stream
+        self.findings = []
+        self.stages = []
+        self.columns = []
+        self.row = None
+        self.stage = None
+        self.column = None
+        self.budget = budget
+        self.counted = counted
+        self.count = 0
+        self._buffer = ""
+
+    def write(self, text):
+        if self.stream is not None:
+            self.stream.write(text)
+
+        # print() writes the message and the line ending separately, so we
+        # buffer until we see a complete line.
+        self._buffer += text
+        while "\n" in self._buffer:
+            line, self._buffer = self._buffer.split("\n", 1)
+            self.findings.append((self.row, line))
+            self.stages.append(self.stage)
+            self.columns.append(self.column)
+
+            if self.budget is not None and self.counts(self.stage):
+                self.count += 1
+
+                if self.count > self.budget:
+                    raise BudgetExceeded(
+                        self.count, self.budget, self.stage, self.counted_findings()
+                    )
+
+        return len(text)
+
+    def flush(self):
+        if self.stream is not None:
+            self.stream.flush()
+
+    def counts(self, stage):
+        """Return whether findings of a check or fix count against the budget."""
+
+        return stage is not None and (self.counted is None or stage in self.counted)
+
+    def counted_findings(self):
+        """Return the findings that count against the budget."""
+
+        return [
+            finding
+            for finding, stage in zip(self.findings, self.stages)
+            if self.counts(stage)
+        ]
+
+
+class StdoutProxy:
+    """Stand-in for sys.stdout that sends what each thread prints to the stream
+    that thread is recording to, or to the original stdout otherwise.
+
+    contextlib.redirect_stdout() replaces sys.stdout for the whole process, so
+    when several files are processed at the same time in different threads
+    their findings would get mixed up.
+    """
+
+    def __init__(self, stream):
+        self.stream = stream
+
+    def target(self):
+        return getattr(_local, "stream", None) or self.stream
+
+    def write(self, text):
+        return self.target().write(text)
+
+    def flush(self):
+        self.target().flush()
+
+    def __getattr__(self, name):
+        return getattr(self.stream, name)
+
+
+@contextmanager
+def recording(stream):
+    """Send everything that the current thread prints to a stream, usually a
+    Recorder, without affecting other threads.
+
+    The first time this is used sys.stdout is replaced with a StdoutProxy that
+    passes output from all other threads through unchanged.
+    """
+
+    if not isinstance(sys.stdout, StdoutProxy):
+        sys.stdout = StdoutProxy(sys.stdout)
+
+    previous = getattr(_local, "stream", None)
+    _local.stream = stream
+
+    try:
+        yield stream
+    finally:
+        _local.stream = previous
+
+
+def apply(series, func, recorder, **kwargs):
+    """Apply a check or fix to every value in a Series.
+
+    This behaves like Series.apply(), but tells the recorder which row is
+    being processed so that anything the function prints is attributed to
+    the right row. Pandas calls the function once per value, in order.
+
+    Return the resulting Series.
+    """
+
+    rows = iter(series.index)
+
+    def wrapper(field):
+        recorder.row = next(rows)
+
+        return func(field, **kwargs)
+
+    result = series.apply(wrapper)
+
+    recorder.row = None
+
+    return result
+
+
+def apply_vectorized(series, func, recorder, **kwargs):
+    """Apply a check or fix that works on all values of a Series at once (see
+    pipeline.Stage), and print what it found for each value with the row it
+    belongs to, like apply() would have.
+
+    Return the resulting Series, or None if the function only checks.
+    """
+
+    result, outputs = func(series, **kwargs)
+
+    for row, output in zip(series.index, outputs):
+        if output:
+            recorder.row = row
+            print(output, end="")
+
+    recorder.row = None
+
+    return result
+
+
+def row_outputs(count, rows, lines):
+    """Collect the lines printed for the values of a column that was checked
+    all at once into what would have been printed for each row. The lines of
+    each row stay in the order they are given.
+
+    Return a list of strings.
+    """
+
+    outputs = [""] * count
+
+    for row, line in zip(rows, lines):
+        outputs[row] += f"{line}\n"
+
+    return outputs
+
+
+def capture(func, field, **kwargs):
+    """Run a check or fix on a single value and capture what it prints instead
+    of passing it through to the recorder.
+
+    Return a tuple of the function's result and its output.
+    """
+
+    output = io.StringIO()
+
+    with recording(output):
+        result = func(field, **kwargs)
+
+    return result, output.getvalue()
@@ -2,15 +2,19 @@
 
 import logging
 import re
+from itertools import groupby
+from operator import itemgetter
 from unicodedata import normalize
 from urllib.parse import unquote
 
-import country_converter as coco
+import numpy as np
 import pandas as pd
 from colorama import Fore
 from ftfy import TextFixerConfig, fix_text
 
-from csv_metadata_quality.util import is_mojibake, is_nfc
+import csv_metadata_quality.identifiers as identifiers
+from csv_metadata_quality.findings import row_outputs
+from csv_metadata_quality.util import country_converter, is_mojibake, is_nfc
 
 
 def whitespace(field, field_name):
@@ -310,10 +314,10 @@ def countries_match_regions(row, exclude):
     region_column_name = ""
     title_column_name = ""
 
-    # Instantiate a CountryConverter() object here. According to the docs it is
-    # more performant to do that as opposed to calling coco.convert() directly
-    # because we don't need to re-load the country data with each iteration.
-    cc = coco.CountryConverter()
+    # Use a shared CountryConverter() object. According to the docs it is more
+    # performant to do that as opposed to calling coco.convert() directly be-
+    # cause we don't need to re-load the country data with each iteration.
+    cc = country_converter()
 
     # Set logging to ERROR so country_converter's convert() doesn't print the
     # "not found in regex" warning message to the screen.
@@ -477,3 +481,44 @@ def normalize_dois(field):
     new_field = "||".join(new_values)
 
     return new_field
+
+
+def normalize_dois_column(series):
+    """Normalize the DOIs of a column like normalize_dois(), but for all values
+    at once. The multi-value fields are split once, and each distinct DOI is
+    only normalized once. Fields are only joined again if one of their DOIs
+    changed.
+
+    Return a tuple of the fixed Series and a list of what normalize_dois()
+    would have printed for each value.
+    """
+
+    values, rows = identifiers.explode(series)
+
+    codes, distinct_values = pd.factorize(values)
+    normalized = identifiers.normalize_dois(distinct_values)[codes]
+
+    changed = normalized != values
+
+    fixed = series.to_numpy(dtype=object, copy=True)
+    fixed[pd.isna(fixed)] = None
+
+    # Fields with one DOI are simply replaced, and fields with more than one
+    # are joined again. Values are in the order of the rows.
+    single = np.bincount(rows, minlength=len(series))[rows] == 1
+    fixed[rows[changed & single]] = normalized[changed & single]
+
+    multiple = np.isin(rows, rows[changed & ~single])
+    for row, group in groupby(
+        zip(rows[multiple], normalized[multiple]), key=itemgetter(0)
+    ):
+        fixed[row] = "||".join(value for _, value in group)
+
+    lines = [
+        f"{Fore.GREEN}Normalized DOI: {Fore.RESET}{value}" for value in values[changed]
+    ]
+
+    return (
+        pd.Series(fixed, index=series.index, name=series.name, dtype=object),
+        row_outputs(len(series), rows[changed], lines),
+    )
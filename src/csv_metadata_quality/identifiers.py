@@ -0,0 +1,322 @@
+# SPDX-License-Identifier: GPL-3.0-only
+
+import re
+from urllib.parse import unquote
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+from stdnum import isbn as stdnum_isbn
+from stdnum import issn as stdnum_issn
+
+# Identifiers that only contain ASCII digits, X, spaces, and hyphens can be
+# validated with NumPy. Anything else, for example other kinds of dashes that
+# stdnum knows how to clean up, is passed to stdnum.
+SIMPLE_IDENTIFIER = r"[0-9Xx \-]*"
+
+# Weights of the digits for the ISSN, ISBN-10, and EAN-13 checksums
+ISSN_WEIGHTS = np.arange(8, 1, -1)
+ISBN10_WEIGHTS = np.arange(1, 10)
+EAN13_WEIGHTS = np.tile([1, 3], 6)
+
+# http:// at the beginning of a DOI, which should be https://, and other hosts
+# that should be doi.org. A www.dx.doi.org host is matched as a whole because
+# replacing dx.doi.org and then www.doi.org one after the other makes doi.org.
+DOI_URI = re.compile(r"(?P<http>^http://)|(?:www\.)?dx\.doi\.org|www\.doi\.org")
+
+# DOIs without the https://doi.org/ prefix, with or without "doi: "
+DOI_PREFIX = re.compile(r"^(?:doi: )?10\.")
+
+# RE2 regex for DOIs that normalizing might change: anything that str.lower()
+# or str.strip() might change (non-ASCII characters, upper case letters, and
+# whitespace at either end), a scheme or host to rewrite, percent escapes, or
+# a missing https://doi.org/ prefix. Most DOIs in an export are normalized
+# already, and finding the others with pyarrow is much faster than rewriting
+# all of them in Python.
+DOI_SCREEN = r"[^\x00-\x7f]|[A-Z]|^[\t-\r\x1c-\x1f ]|[\t-\r\x1c-\x1f ]$|^http://|dx\.doi\.org|www\.doi\.org|%|^(?:doi: )?10\."
+
+
+def explode(series):
+    """Split the multi-value fields of a column on the "||" separator, skipping
+    missing values.
+
+    Return a tuple of a NumPy array of the values and a NumPy array of the
+    position of the row each value came from.
+    """
+
+    values = pd.Series(series.to_numpy(dtype=object))
+    values = values[values.notna()]
+
+    exploded = values.str.split("||", regex=False).explode()
+
+    return exploded.to_numpy(dtype=object), exploded.index.to_numpy(dtype=np.int64)
+
+
+def duplicates(rows, keys, seen=None):
+    """Find values that are used by more than one row, for example the same
+    ISBN on several items. The keys of the values are looked up in a hash
+    table, so this takes linear time. Empty keys are ignored, and each key is
+    only counted once per row. The first row with a key is not a duplicate.
+
+    Optionally pass a set of the keys seen in earlier batches of rows, which
+    is updated with the new keys. Keys that were seen before are duplicates
+    even in the first row that has them here.
+
+    Return a NumPy array of the positions of the duplicate values.
+    """
+
+    keys = np.asarray(keys, dtype=object)
+    codes, distinct_keys = pd.factorize(keys)
+
+    items = pd.DataFrame({"row": rows, "code": codes})
+    items = items[keys != ""].drop_duplicates(["row", "code"])
+
+    duplicated = items.duplicated("code").to_numpy(copy=True)
+
+    if seen is not None:
+        earlier = np.array([key in seen for key in distinct_keys], dtype=bool)
+        duplicated |= earlier[items["code"].to_numpy()]
+
+        seen.update(key for key in distinct_keys if key != "")
+
+    return items.index[duplicated].to_numpy()
+
+
+def doi_uri_replacement(match):
+    return "https://" if match.group("http") else "doi.org"
+
+
+def normalize_dois(values):
+    """Normalize DOIs like fix.normalize_dois() does, but for many at once and
+    with one combined rewrite of the scheme and host instead of a regex for
+    each. Only DOIs that match DOI_SCREEN are rewritten, and percent escapes
+    are only decoded in DOIs that contain "%".
+
+    Return a NumPy array of strings.
+    """
+
+    values = np.asarray(values, dtype=object)
+    normalized = values.copy()
+
+    screen = pc.match_substring_regex(pa.array(values, pa.string()), DOI_SCREEN)
+    positions = np.flatnonzero(screen.to_numpy(zero_copy_only=False))
+
+    normalized[positions] = rewrite_dois(values[positions])
+
+    return normalized
+
+
+def rewrite_dois(values):
+    """Normalize DOIs, see normalize_dois().
+
+    Return a NumPy array of strings.
+    """
+
+    normalized = (
+        pd.Series(values, dtype=object)
+        .str.strip()
+        .str.lower()
+        .str.replace(DOI_URI, doi_uri_replacement, regex=True)
+    )
+
+    quoted = normalized.str.contains("%", regex=False).to_numpy(dtype=bool)
+    normalized[quoted] = normalized[quoted].map(unquote)
+
+    return normalized.str.replace(
+        DOI_PREFIX, "https://doi.org/10.", regex=True
+    ).to_numpy(dtype=object)
+
+
+def compact(values):
+    """Remove spaces and hyphens and convert to upper case, like stdnum does,
+    for identifiers that only contain digits, X, spaces, and hyphens.
+
+    Return a NumPy array of strings.
+    """
+
+    return (
+        pd.Series(values, dtype=object)
+        .str.replace(r"[ \-]", "", regex=True)
+        .str.upper()
+        .to_numpy(dtype=object)
+    )
+
+
+def character_codes(numbers, length):
+    """Convert ASCII strings that all have the same length to a matrix of
+    character codes, with one row for each string.
+
+    Return a two-dimensional NumPy array of integers.
+    """
+
+    if len(numbers) == 0:
+        return np.empty((0, length), dtype=np.int64)
+
+    codes = np.frombuffer("".join(numbers).encode("ascii"), dtype=np.uint8)
+
+    return codes.reshape(len(numbers), length).astype(np.int64)
+
+
+def digit_values(codes):
+    """Convert a matrix of character codes to the values of the digits, with X
+    as 10 like in check digits.
+
+    Return a tuple of a matrix of values and a matrix of booleans that is True
+    where the character is a digit.
+    """
+
+    is_digit = (codes >= ord("0")) & (codes <= ord("9"))
+    values = np.where(codes == ord("X"), 10, codes - ord("0"))
+
+    return values, is_digit
+
+
+def issn_checksums(numbers):
+    """Validate compacted ISSNs the same way as stdnum's issn.is_valid(): eight
+    characters, the first seven of them digits, and the mod-11 check digit,
+    which is X for 10.
+
+    Return a NumPy boolean array.
+    """
+
+    valid = np.zeros(len(numbers), dtype=bool)
+
+    lengths = np.fromiter(map(len, numbers), dtype=np.int64, count=len(numbers))
+    positions = np.flatnonzero(lengths == 8)
+
+    values, is_digit = digit_values(character_codes(numbers[positions], 8))
+    check = (11 - values[:, :7] @ ISSN_WEIGHTS) % 11
+
+    valid[positions] = (
+        is_digit[:, :7].all(axis=1)
+        & (is_digit[:, 7] | (values[:, 7] == 10))
+        & (values[:, 7] == check)
+    )
+
+    return valid
+
+
+def isbn_checksums(numbers):
+    """Validate compacted ISBNs the same way as stdnum's isbn.is_valid():
+    ISBN-10s (or nine-digit SBNs) with the mod-11 check digit, which is X for
+    10, and ISBN-13s with the EAN-13 check digit and the 978 or 979 prefix.
+
+    Return a tuple of a NumPy boolean array and a NumPy array of keys to find
+    the same ISBN written in different ways, like in isbn_valid().
+    """
+
+    valid = np.zeros(len(numbers), dtype=bool)
+
+    lengths = np.fromiter(map(len, numbers), dtype=np.int64, count=len(numbers))
+
+    # SBNs are ISBN-10s without the leading zero
+    positions = np.flatnonzero(lengths == 9)
+    numbers = numbers.copy()
+    numbers[positions] = "0" + numbers[positions]
+    lengths[positions] = 10
+
+    keys = numbers.copy()
+
+    positions = np.flatnonzero(lengths == 10)
+    values, is_digit = digit_values(character_codes(numbers[positions], 10))
+    check = (values[:, :9] @ ISBN10_WEIGHTS) % 11
+    isbn10_valid = (
+        is_digit[:, :9].all(axis=1)
+        & (is_digit[:, 9] | (values[:, 9] == 10))
+        & (values[:, 9] == check)
+    )
+    valid[positions] = isbn10_valid
+
+    # The ISBN-13 of an ISBN-10 has the 978 prefix and a new check digit
+    positions = positions[isbn10_valid]
+    values = np.hstack(
+        [np.tile([9, 7, 8], (len(positions), 1)), values[isbn10_valid, :9]]
+    )
+    check = (10 - values @ EAN13_WEIGHTS) % 10
+    keys[positions] = (
+        "978" + np.array([number[:9] for number in numbers[positions]], dtype=object)
+    ) + check.astype(str).astype(object)
+
+    positions = np.flatnonzero(lengths == 13)
+    values, is_digit = digit_values(character_codes(numbers[positions], 13))
+    check = (10 - values[:, :12] @ EAN13_WEIGHTS) % 10
+    prefix = values[:, :3] @ [100, 10, 1]
+    isbn13_valid = (
+        is_digit.all(axis=1)
+        & (values[:, 12] == check)
+        & ((prefix == 978) | (prefix == 979))
+    )
+    valid[positions] = isbn13_valid
+
+    return valid, keys
+
+
+def simple_identifiers(values):
+    """Find the identifiers that can be validated with NumPy.
+
+    Return a NumPy boolean array.
+    """
+
+    return (
+        pd.Series(values, dtype=object)
+        .str.fullmatch(SIMPLE_IDENTIFIER)
+        .to_numpy(dtype=bool)
+    )
+
+
+def issn_valid(values):
+    """Validate ISSNs like stdnum's issn.is_valid(), but for many at once. Each
+    distinct value is only validated once.
+
+    Return a NumPy boolean array.
+    """
+
+    codes, distinct_values = pd.factorize(values)
+    distinct_values = np.asarray(distinct_values, dtype=object)
+
+    valid = np.zeros(len(distinct_values), dtype=bool)
+
+    simple = simple_identifiers(distinct_values)
+    valid[simple] = issn_checksums(compact(distinct_values[simple]))
+    valid[~simple] = [stdnum_issn.is_valid(value) for value in distinct_values[~simple]]
+
+    return valid[codes]
+
+
+def isbn_valid(values):
+    """Validate ISBNs like stdnum's isbn.is_valid(), but for many at once. Each
+    distinct value is only validated once.
+
+    Return a tuple of a NumPy boolean array and a NumPy array of keys to find
+    the same ISBN written in different ways: the ISBN-13 of valid ISBNs and
+    the compacted value of invalid ones.
+    """
+
+    codes, distinct_values = pd.factorize(values)
+    distinct_values = np.asarray(distinct_values, dtype=object)
+
+    valid = np.zeros(len(distinct_values), dtype=bool)
+    keys = np.empty(len(distinct_values), dtype=object)
+
+    simple = simple_identifiers(distinct_values)
+    valid[simple], keys[simple] = isbn_checksums(compact(distinct_values[simple]))
+
+    for position in np.flatnonzero(~simple):
+        value = distinct_values[position]
+
+        valid[position] = stdnum_isbn.is_valid(value)
+        keys[position] = stdnum_isbn.compact(value, convert=valid[position])
+
+    return valid[codes], keys[codes]
+
+
+def isbn_keys(values):
+    """Find the keys that are the same for the same ISBN written in different
+    ways, with or without hyphens, or as an ISBN-10 or ISBN-13, see
+    isbn_valid().
+
+    Return a NumPy array of strings.
+    """
+
+    return isbn_valid(values)[1]
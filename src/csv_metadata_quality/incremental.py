@@ -0,0 +1,402 @@
+# SPDX-License-Identifier: GPL-3.0-only
+
+import hashlib
+import json
+import os
+
+import numpy as np
+import pandas as pd
+from colorama import Fore
+
+import csv_metadata_quality.pipeline as pipeline
+from csv_metadata_quality.check import duplicate_item_columns
+from csv_metadata_quality.version import VERSION
+
+# Version of the layout of the state file. It is part of the fingerprint so
+# that state files in an older layout are not reused.
+STATE_FORMAT = 4
+
+
+def fingerprint(columns, args, exclude):
+    """Summarize everything other than the data itself that influences the
+    findings and fixes for a row: the tool version, the columns in the file,
+    and the options that enable or disable checks.
+
+    If any of these change between runs then none of the stored results can be
+    reused.
+
+    Return a hex digest.
+    """
+
+    options = {
+        "version": VERSION,
+        "state_format": STATE_FORMAT,
+        "columns": list(columns),
+        "agrovoc_fields": args.agrovoc_fields,
+        "drop_invalid_agrovoc": args.drop_invalid_agrovoc,
+        "experimental_checks": args.experimental_checks,
+        "lenient_citations": args.lenient_citations,
+        "unsafe_fixes": args.unsafe_fixes,
+        "exclude": sorted(exclude),
+        "plan": plan_rules(getattr(args, "plan", None)),
+    }
+
+    return hashlib.blake2b(
+        json.dumps(options, sort_keys=True).encode("utf-8"), digest_size=16
+    ).hexdigest()
+
+
+def plan_rules(plan):
+    """Summarize the rules of a plan in a form that can be stored as JSON.
+
+    Return a list of rules, or None if there is no plan.
+    """
+
+    if plan is None:
+        return None
+
+    return [
+        [
+            rule.match.pattern if rule.match is not None else None,
+            sorted(rule.checks) if rule.checks is not None else None,
+            sorted(rule.skip_checks),
+        ]
+        for rule in plan.rules
+    ]
+
+
+def row_keys(df):
+    """Identify rows across runs.
+
+    DSpace exports have an "id" column with the item's UUID, which lets us
+    match rows even if they were reordered or new items were inserted. If it
+    is missing (or not usable as a key) we fall back to the row position.
+
+    Return a list of strings.
+    """
+
+    if "id" in df.columns:
+        ids = df["id"]
+
+        if ids.notna().all() and ids.is_unique:
+            return ids.astype(str).tolist()
+
+    return [str(position) for position in range(len(df))]
+
+
+def row_hashes(df):
+    """Compute a compact content hash for each row.
+
+    Pandas hashes all columns of a row into a single 64-bit integer without
+    iterating over rows in Python.
+
+    Return a list of strings.
+    """
+
+    return pd.util.hash_pandas_object(df, index=False).astype(str).tolist()
+
+
+def duplicate_key(title, item_type, date_issued):
+    """Hash the title, type, and date issued of an item, which is the same key
+    that check.duplicate_items() uses to identify duplicate items. Missing
+    values are written as None, so the keys of items with missing values
+    match each other like in check.duplicate_items().
+
+    Return a hex digest.
+    """
+
+    title, item_type, date_issued = (
+        None if pd.isna(value) else value for value in (title, item_type, date_issued)
+    )
+
+    key = f"{title}{item_type}{date_issued}"
+
+    return hashlib.blake2b(key.encode("utf-8"), digest_size=8).hexdigest()
+
+
+def title_key(title):
+    """Hash the title of an item, so that we can tell whether a title is used by
+    more than one item without keeping all titles, see find_duplicates().
+
+    Return a hex digest, or None if the title is missing.
+    """
+
+    if pd.isna(title):
+        return None
+
+    return hashlib.blake2b(title.encode("utf-8"), digest_size=8).hexdigest()
+
+
+def duplicate_keys(df):
+    """Compute the duplicate key and the title key of each row of a DataFrame,
+    see duplicate_key() and title_key().
+
+    Return a list of [duplicate key, title key] lists, or None if the
+    DataFrame does not have title, type, and date issued columns.
+    """
+
+    try:
+        title_column_name, type_column_name, date_column_name = duplicate_item_columns(
+            df
+        )
+    except IndexError:
+        return None
+
+    return [
+        [duplicate_key(title, item_type, date_issued), title_key(title)]
+        for title, item_type, date_issued in zip(
+            df[title_column_name], df[type_column_name], df[date_column_name]
+        )
+    ]
+
+
+def duplicate_index():
+    """Start an empty index of the items seen so far, see find_duplicates().
+
+    Return a dict.
+    """
+
+    return {"items": {}, "titles": set(), "compared": False, "pending": []}
+
+
+def find_duplicates(entries, index):
+    """Find duplicate items from their precomputed keys in the same way as
+    check.duplicate_items(), but in batches of rows, files, or shards one
+    after the other. Pass the entries as (duplicate key, title key, value)
+    tuples, and an index from duplicate_index() that is updated with them.
+
+    Like check.duplicate_items(), items are only compared if a title is used by
+    more than one item, and then all items are compared, including those
+    without a title. Duplicates that are found before we have seen a title
+    twice are held back in the index until we do, and are never reported if
+    we don't.
+
+    Return a list of (value, first value) tuples for the items that are
+    duplicates, in order, where first value is the value of the first item
+    with the same key.
+    """
+
+    found = []
+
+    for item_key, item_title_key, value in entries:
+        if item_title_key is not None:
+            if item_title_key in index["titles"]:
+                index["compared"] = True
+            else:
+                index["titles"].add(item_title_key)
+
+        if item_key in index["items"]:
+            index["pending"].append((value, index["items"][item_key]))
+        else:
+            index["items"][item_key] = value
+
+        if index["compared"] and index["pending"]:
+            found += index["pending"]
+            index["pending"] = []
+
+    return found
+
+
+def duplicate_items(df, keys, index=None):
+    """Report duplicate items from their precomputed keys (see duplicate_
+    keys()) instead of comparing the title, type, and date issued of every
+    row again.
+
+    Prints the title of every item whose key was already seen in an earlier
+    row, like check.duplicate_items(), see find_duplicates(). Optionally pass
+    an index from duplicate_index() of the items seen in earlier batches of
+    rows, which is updated with the new keys.
+    """
+
+    if keys is None:
+        return
+
+    title_column_name = duplicate_item_columns(df)[0]
+
+    if index is None:
+        index = duplicate_index()
+
+    # Missing titles are printed as None, like in check.duplicate_items()
+    entries = (
+        (item_key, item_title_key, None if pd.isna(title) else title)
+        for (item_key, item_title_key), title in zip(keys, df[title_column_name])
+    )
+
+    for title, _ in find_duplicates(entries, index):
+        print(
+            f"{Fore.YELLOW}Possible duplicate ({title_column_name}): {Fore.RESET}{title}"
+        )
+
+
+def identifier_keys(entries, positions):
+    """Split the keys of the identifiers from pipeline.identifier_entries() by
+    row, so that they can be stored with each row in the state file and the
+    checks for duplicate identifiers don't need to find them again for rows
+    that did not change. The rows of the entries are positions in positions.
+    Values without a key are left out.
+
+    Return a dict of lists of [stage, column, key, value] for the position of
+    each row that has identifiers.
+    """
+
+    rows = {}
+
+    for stage, column, values, value_rows, keys in entries:
+        for value, row, key in zip(values, value_rows, keys):
+            if key != "":
+                rows.setdefault(int(positions[row]), []).append(
+                    [stage.name, column, key, value]
+                )
+
+    return rows
+
+
+def identifier_entries(stored, columns):
+    """Put the keys of the identifiers that were stored for each row (see
+    identifier_keys()) back together into entries like pipeline.identifier_
+    entries() returns, in the order of the columns. Pass the stored keys as
+    (position, list) tuples in the order of the rows.
+
+    Return a list of (stage, column, values, rows, keys) tuples.
+    """
+
+    stage_positions = {
+        stage.name: position
+        for position, stage in enumerate(pipeline.DUPLICATE_IDENTIFIER_STAGES)
+    }
+    column_positions = {column: position for position, column in enumerate(columns)}
+
+    groups = {}
+    for position, row_keys in stored:
+        for name, column, key, value in row_keys:
+            values, rows, keys = groups.setdefault((name, column), ([], [], []))
+            values.append(value)
+            rows.append(position)
+            keys.append(key)
+
+    return [
+        (
+            pipeline.DUPLICATE_IDENTIFIER_STAGES[stage_positions[name]],
+            column,
+            np.array(values, dtype=object),
+            np.array(rows, dtype=np.int64),
+            np.array(keys, dtype=object),
+        )
+        for (name, column), (values, rows, keys) in sorted(
+            groups.items(),
+            key=lambda group: (
+                column_positions[group[0][1]],
+                stage_positions[group[0][0]],
+            ),
+        )
+    ]
+
+
+def finding_order(columns, args):
+    """Work out where each finding goes in the output of a full run, see
+    pipeline.process(): the findings of the checks and fixes on each column,
+    in the order of the columns and then stage by stage and row by row, then
+    duplicate identifiers in the same order, then duplicate items, and then
+    the findings of the checks and fixes on rows, row by row and stage by
+    stage.
+
+    Return a function that takes the position of the row of a finding (or
+    None), its column (or None), and the name of its check or fix (or None),
+    and returns a key to sort the findings by.
+    """
+
+    column_positions = {column: position for position, column in enumerate(columns)}
+    identifier_stage_positions = {
+        stage.name: position
+        for position, stage in enumerate(pipeline.DUPLICATE_IDENTIFIER_STAGES)
+    }
+    row_stage_positions = {
+        stage.name: position for position, stage in enumerate(pipeline.row_stages(args))
+    }
+
+    def key(position, column, stage):
+        row = -1 if position is None else position
+
+        if stage in identifier_stage_positions:
+            return (
+                1,
+                column_positions.get(column, -1),
+                identifier_stage_positions[stage],
+                row,
+            )
+
+        if column in column_positions:
+            names = [stage.name for stage in pipeline.column_stages(column, args)]
+            stage_position = names.index(stage) if stage in names else -1
+
+            return 0, column_positions[column], stage_position, row
+
+        if stage == pipeline.DUPLICATE_ITEMS_STAGE.name:
+            return 2, 0, 0, -1
+
+        if stage in row_stage_positions:
+            return 3, row, row_stage_positions[stage], 0
+
+        return 4, 0, 0, -1
+
+    return key
+
+
+def load_state(path, fingerprint):
+    """Load the results of a previous run.
+
+    Returns an empty state if the file does not exist yet, or if it was
+    written with different options or for a file with different columns.
+
+    Return a dict.
+    """
+
+    state = {"fingerprint": fingerprint, "rows": {}}
+
+    if not os.path.exists(path):
+        return state
+
+    with open(path, encoding="UTF-8") as f:
+        previous_state = json.load(f)
+
+    if previous_state.get("fingerprint") != fingerprint:
+        return state
+
+    return previous_state
+
+
+def save_state(path, state):
+    """Save the results of this run for the next one.
+
+    We write to a temporary file and rename it so that an interrupted run
+    never leaves a truncated state file behind.
+    """
+
+    temporary_path = f"{path}.tmp"
+
+    with open(temporary_path, "w", encoding="UTF-8") as f:
+        json.dump(state, f, separators=(",", ":"))
+
+    os.replace(temporary_path, path)
+
+
+def changed_cells(before, after):
+    """Compare the input and output values of a row.
+
+    Return a dict of the columns whose value was changed by fixes.
+    """
+
+    fixes = {}
+
+    for column, old_value, new_value in zip(before.index, before, after):
+        if pd.isna(old_value) and pd.isna(new_value):
+            continue
+
+        if pd.isna(new_value):
+            new_value = None
+
+        # Fixes can fill in missing values, which can't be compared
+        if pd.isna(old_value) or old_value != new_value:
+            fixes[column] = new_value
+
+    return fixes
@@ -0,0 +1,112 @@
+# SPDX-License-Identifier: GPL-3.0-only
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+
+def column_values(data, column, positions):
+    """Read the values of a column of a DataFrame or an Arrow table at the
+    given positions, with None for missing values.
+
+    Return a list.
+    """
+
+    if isinstance(data, pa.Table):
+        return data.column(column).take(positions).to_pylist()
+
+    values = data[column].iloc[positions]
+
+    return [None if pd.isna(value) else value for value in values]
+
+
+def column_names(data):
+    """Return the column names of a DataFrame or an Arrow table."""
+
+    if isinstance(data, pa.Table):
+        return data.column_names
+
+    return list(data.columns)
+
+
+def changed_cells(before, after, changes):
+    """List the cells that were changed by fixes, ordered by row and then by
+    column. Rows are identified by the value of the id column if there is one,
+    otherwise by their position in the file (starting at 0, not counting the
+    header).
+
+    Return a DataFrame with id (or row), column, old value, and new value.
+    """
+
+    columns = [column for column in column_names(after) if column in changes]
+
+    rows = []
+    column_indices = []
+    for index, column in enumerate(columns):
+        positions = np.flatnonzero(changes[column])
+        rows.append(positions)
+        column_indices.append(np.full(len(positions), index))
+
+    if rows:
+        rows = np.concatenate(rows)
+        column_indices = np.concatenate(column_indices)
+    else:
+        rows = np.array([], dtype=int)
+        column_indices = np.array([], dtype=int)
+
+    # Sort by row first and then by column
+    order = np.lexsort((column_indices, rows))
+    rows = rows[order]
+    column_indices = column_indices[order]
+
+    old = np.empty(len(rows), dtype=object)
+    new = np.empty(len(rows), dtype=object)
+    for index, column in enumerate(columns):
+        selected = column_indices == index
+        old[selected] = column_values(before, column, rows[selected])
+        new[selected] = column_values(after, column, rows[selected])
+
+    if "id" in column_names(after):
+        key_column = "id"
+        keys = column_values(after, "id", rows)
+    else:
+        key_column = "row"
+        keys = rows.tolist()
+
+    return pd.DataFrame(
+        {
+            key_column: keys,
+            "column": [columns[index] for index in column_indices],
+            "old": old,
+            "new": new,
+        }
+    )
+
+
+def dspace_csv(after, changes):
+    """Build a minimal CSV for DSpace batch import with only the rows and the
+    columns that were changed by fixes. DSpace replaces all values of a field
+    when importing, so changed columns contain the complete fixed value for
+    every changed row.
+
+    Raises a ValueError if there is no id column to identify items by.
+
+    Return a DataFrame.
+    """
+
+    if "id" not in column_names(after):
+        raise ValueError("A DSpace CSV needs an id column to identify items")
+
+    columns = [column for column in column_names(after) if column in changes]
+
+    mask = np.zeros(len(after), dtype=bool)
+    for column in columns:
+        mask |= changes[column]
+    rows = np.flatnonzero(mask)
+
+    return pd.DataFrame(
+        {
+            column: column_values(after, column, rows)
+            for column in ["id"] + [column for column in columns if column != "id"]
+        }
+    )
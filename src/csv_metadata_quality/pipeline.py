@@ -0,0 +1,1827 @@
+# SPDX-License-Identifier: GPL-3.0-only
+
+import json
+import re
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+from colorama import Fore
+
+import csv_metadata_quality.check as check
+import csv_metadata_quality.experimental as experimental
+import csv_metadata_quality.fileio as fileio
+import csv_metadata_quality.fix as fix
+import csv_metadata_quality.identifiers as identifiers
+import csv_metadata_quality.scan as scan
+from csv_metadata_quality.findings import apply, apply_vectorized, capture
+
+# A check or fix that runs on each value of a column:
+#
+#   - name: name of the check or fix
+#   - function: function from check.py or fix.py that is applied to each value
+#   - fix: whether the function returns a fixed value (otherwise it only checks)
+#   - match: regex the column name must match (re.match), or None for all
+#   - skip: regex the column name must not match (re.match), or None
+#   - when: option that must be enabled, "!option" for an option that must be
+#     disabled, or None. If the option is a comma-separated list of fields then
+#     the column must be in the list.
+#   - arguments: keyword arguments to pass to the function, ie field_name
+#   - screen: RE2 regex that a value must contain for the function to print or
+#     change anything, or None if we can't tell in advance. Only used when we
+#     process Arrow tables.
+#   - cost: rough estimate of the time the function takes per value (or row)
+#     in microseconds, used to explain the plan
+#   - vectorized: function that does the same as function, but for all values
+#     of a column at once, or None. It is passed a Series and the same keyword
+#     arguments, and returns a tuple of the fixed Series (or None if it only
+#     checks) and a list of what function would have printed for each value.
+Stage = namedtuple(
+    "Stage",
+    [
+        "name",
+        "function",
+        "fix",
+        "match",
+        "skip",
+        "when",
+        "arguments",
+        "screen",
+        "cost",
+        "vectorized",
+    ],
+    defaults=[False, None, None, None, (), None, 1, None],
+)
+
+# Columns with at most this many distinct values per value are checked and
+# fixed once for each distinct value instead of once for each row, see
+# column_strategy().
+MEMOIZE_MAX_RATIO = 0.5
+
+# Python's str.strip() and \s match Unicode whitespace, while \s in RE2 (the
+# regex engine used by pyarrow) only matches ASCII whitespace.
+WHITESPACE = r"[\t\n\x0b\x0c\r\x1c-\x1f \x85\xa0\x{1680}\x{2000}-\x{200a}\x{2028}\x{2029}\x{202f}\x{205f}\x{3000}]"
+
+# Whitespace at the beginning or end of a value, next to a multi-value sep-
+# arator, or more than one whitespace character in a row.
+WHITESPACE_SCREEN = (
+    rf"^{WHITESPACE}|{WHITESPACE}$|{WHITESPACE}\||\|{WHITESPACE}|{WHITESPACE}{{2}}"
+)
+
+# Anything that isn't ASCII, which is a precondition for decomposed Unicode
+# and for mojibake.
+NON_ASCII_SCREEN = r"[^\x00-\x7f]"
+
+COLUMN_STAGES = [
+    # Skip whitespace and newline fixes on abstracts and descriptions because
+    # there are too many with legitimate multi-line metadata.
+    Stage(
+        "whitespace",
+        fix.whitespace,
+        fix=True,
+        skip=r"^.*?(abstract|description).*$",
+        when="unsafe_fixes",
+        arguments=("field_name",),
+        screen=WHITESPACE_SCREEN,
+        cost=3,
+    ),
+    Stage(
+        "newlines",
+        fix.newlines,
+        fix=True,
+        skip=r"^.*?(abstract|description).*$",
+        when="unsafe_fixes",
+        arguments=("field_name",),
+        screen=r"\n",
+        cost=1,
+    ),
+    # Fix: missing space after comma. Only run on author and citation fields
+    # for now, as this problem is mostly an issue in names.
+    Stage(
+        "comma_space",
+        fix.comma_space,
+        fix=True,
+        match=r"^.*?(author|[Cc]itation).*$",
+        when="unsafe_fixes",
+        arguments=("field_name",),
+        screen=r",\S",
+        cost=1,
+    ),
+    # Fix: perform Unicode normalization (NFC) to convert decomposed charac-
+    # ters into their canonical forms.
+    Stage(
+        "normalize_unicode",
+        fix.normalize_unicode,
+        fix=True,
+        when="unsafe_fixes",
+        arguments=("field_name",),
+        screen=NON_ASCII_SCREEN,
+        cost=1,
+    ),
+    Stage(
+        "suspicious_characters",
+        check.suspicious_characters,
+        arguments=("field_name",),
+        screen=r"[\x{00b4}\x{02c6}~`]",
+        cost=1,
+    ),
+    # Fix: mojibake. If unsafe fixes are not enabled then we only check.
+    Stage(
+        "mojibake",
+        fix.mojibake,
+        fix=True,
+        when="unsafe_fixes",
+        arguments=("field_name",),
+        screen=NON_ASCII_SCREEN,
+        cost=16,
+    ),
+    Stage(
+        "mojibake",
+        check.mojibake,
+        when="!unsafe_fixes",
+        arguments=("field_name",),
+        screen=NON_ASCII_SCREEN,
+        cost=15,
+    ),
+    Stage(
+        "unnecessary_unicode",
+        fix.unnecessary_unicode,
+        fix=True,
+        screen=r"[\x{200b}\x{fffd}\x{00a0}\x{00ad}\x{2009}]",
+        cost=8,
+    ),
+    Stage(
+        "normalize_dois",
+        fix.normalize_dois,
+        fix=True,
+        match=r"^.*?identifier\.doi.*$",
+        cost=2,
+        vectorized=fix.normalize_dois_column,
+    ),
+    # Fix: invalid and unnecessary multi-value separators. Skip the title and
+    # abstract fields because "|" is used to indicate something like a sub-
+    # title.
+    Stage(
+        "separators",
+        fix.separators,
+        fix=True,
+        skip=r"^.*?(abstract|[Cc]itation|title).*$",
+        arguments=("field_name",),
+        screen=r"\|",
+        cost=2,
+    ),
+    # Run whitespace fix again after fixing invalid separators
+    Stage(
+        "whitespace",
+        fix.whitespace,
+        fix=True,
+        skip=r"^.*?(abstract|[Cc]itation|title).*$",
+        arguments=("field_name",),
+        screen=WHITESPACE_SCREEN,
+        cost=3,
+    ),
+    # Fix: duplicate metadata values
+    Stage(
+        "duplicates",
+        fix.duplicates,
+        fix=True,
+        arguments=("field_name",),
+        screen=r"\|\|",
+        cost=1,
+    ),
+    # Check: invalid AGROVOC subject and optionally drop them. This makes a
+    # request to the AGROVOC REST API for every value that is not cached yet.
+    Stage(
+        "agrovoc",
+        check.agrovoc,
+        fix=True,
+        when="agrovoc_fields",
+        arguments=("field_name", "drop"),
+        cost=300000,
+    ),
+    Stage("language", check.language, match=r"^.*?language.*$", cost=2),
+    Stage(
+        "issn",
+        check.issn,
+        match=r"^.*?issn.*$",
+        cost=1,
+        vectorized=check.issn_column,
+    ),
+    Stage(
+        "isbn",
+        check.isbn,
+        match=r"^.*?isbn.*$",
+        cost=2,
+        vectorized=check.isbn_column,
+    ),
+    Stage(
+        "date",
+        check.date,
+        match=r"^.*?(date|dcterms\.issued).*$",
+        arguments=("field_name",),
+        cost=13,
+    ),
+    Stage("filename_extension", check.filename_extension, match=r"^filename$", cost=2),
+    Stage(
+        "spdx_license_identifier",
+        check.spdx_license_identifier,
+        match=r"dcterms\.license.*$",
+        cost=1,
+    ),
+]
+
+# Checks for identifiers that are used by more than one item, which consider
+# the whole column like the check for duplicate items. They run after all
+# checks and fixes on columns, on the fixed values, and before duplicate
+# items. Their vectorized functions are passed a NumPy array of the values of
+# a column, split on the "||" separator, and return the keys that are the
+# same for the same identifier written in different ways ("" for values
+# without one). Their functions are passed each value that is a duplicate and
+# print it. See duplicate_identifiers().
+DUPLICATE_IDENTIFIER_STAGES = [
+    Stage(
+        "duplicate_isbns",
+        check.duplicate_isbn,
+        match=r"^.*?isbn.*$",
+        cost=1,
+        vectorized=identifiers.isbn_keys,
+    ),
+    Stage(
+        "duplicate_dois",
+        check.duplicate_doi,
+        match=r"^.*?identifier\.doi.*$",
+        cost=1,
+        vectorized=identifiers.normalize_dois,
+    ),
+]
+
+# Check for duplicate items, which considers the whole file
+DUPLICATE_ITEMS_STAGE = Stage("duplicate_items", check.duplicate_items, cost=2)
+
+# Checks and fixes that run on each row so we can consider items as a whole
+# rather than simply on a field-by-field basis. Their functions are passed the
+# row and the list of excluded columns. Vectorized checks on rows are passed
+# the whole DataFrame, the list of excluded columns, and their keyword argu-
+# ments, and return a tuple of None and a list of what function would have
+# printed for each row. Only checks can be vectorized, because fixes on rows
+# have to run one after the other on each row.
+ROW_STAGES = [
+    Stage(
+        "citation_doi",
+        check.citation_doi,
+        arguments=("lenient",),
+        cost=11,
+        vectorized=check.citation_doi_rows,
+    ),
+    Stage(
+        "title_in_citation",
+        check.title_in_citation,
+        arguments=("lenient",),
+        cost=25,
+        vectorized=check.title_in_citation_rows,
+    ),
+    Stage(
+        "countries_match_regions",
+        fix.countries_match_regions,
+        fix=True,
+        when="unsafe_fixes",
+        cost=800,
+    ),
+    Stage(
+        "countries_match_regions",
+        check.countries_match_regions,
+        when="!unsafe_fixes",
+        cost=750,
+    ),
+    Stage(
+        "correct_language",
+        experimental.correct_language,
+        when="experimental_checks",
+        cost=90,
+    ),
+]
+
+# Which checks and fixes run on which columns, compiled once from the options:
+#
+#   - rules: list of Rules, see below
+#   - columns: the stages for each column, filled in as columns are seen
+Plan = namedtuple("Plan", ["rules", "columns"])
+
+# A rule restricts the checks and fixes that run on matching columns:
+#
+#   - match: compiled regex the column name must match (re.match), or None
+#     for all columns as well as the checks on rows and duplicate items
+#   - checks: set of names of the only checks and fixes to run, or None
+#   - skip_checks: set of names of checks and fixes not to run
+#
+# A check or fix runs on a column if every rule that matches the column lets
+# it run.
+Rule = namedtuple("Rule", ["match", "checks", "skip_checks"])
+
+# Printed for columns that the user excluded, which is not a finding
+SKIPPING = f"{Fore.YELLOW}Skipping {Fore.RESET}"
+
+# Columns that the checks and fixes on rows (as opposed to columns) look at
+ROW_COLUMNS = r"doi|[cC]itation|title|country|region|language|abstract"
+
+# Columns that are used to identify duplicate items
+DUPLICATE_ITEM_COLUMNS = (
+    r"dcterms\.title|dc\.title|dcterms\.type|dc\.type|dcterms\.issued|dc\.date\.issued"
+)
+
+
+def stage_names():
+    """Return the names of all checks and fixes, in the order they run."""
+
+    names = []
+
+    for stage in (
+        COLUMN_STAGES
+        + DUPLICATE_IDENTIFIER_STAGES
+        + [DUPLICATE_ITEMS_STAGE]
+        + ROW_STAGES
+    ):
+        if stage.name not in names:
+            names.append(stage.name)
+
+    return names
+
+
+def split_names(value):
+    """Split a comma-separated list of check names, or pass a list through.
+
+    Return a frozen set of names.
+    """
+
+    if isinstance(value, str):
+        value = value.split(",")
+
+    return frozenset(name.strip() for name in value if name.strip())
+
+
+def compile_plan(args):
+    """Compile the plan from the --checks and --skip-checks options and the
+    rules in the --config file, if any. The config file is JSON, for example:
+
+        {
+            "skip_checks": ["agrovoc"],
+            "columns": [
+                {"match": "^dcterms\\.abstract$", "skip_checks": ["mojibake"]},
+                {"match": "^dcterms\\.subject$", "checks": ["duplicates"]}
+            ]
+        }
+
+    Raises a ValueError for unknown check names, including those in the
+    --fail-on option.
+
+    Return a Plan.
+    """
+
+    rules = []
+
+    config = {}
+    if getattr(args, "config", None):
+        with open(args.config) as f:
+            config = json.load(f)
+
+    for rule in [config] + config.get("columns", []):
+        match = rule.get("match")
+
+        rules.append(
+            Rule(
+                re.compile(match) if match is not None else None,
+                split_names(rule["checks"]) if "checks" in rule else None,
+                split_names(rule.get("skip_checks", [])),
+            )
+        )
+
+    if getattr(args, "checks", None):
+        rules.append(Rule(None, split_names(args.checks), frozenset()))
+
+    if getattr(args, "skip_checks", None):
+        rules.append(Rule(None, None, split_names(args.skip_checks)))
+
+    names = set()
+    for rule in rules:
+        names |= (rule.checks or set()) | rule.skip_checks
+
+    if getattr(args, "fail_on", None):
+        names |= split_names(args.fail_on)
+
+    known_names = stage_names()
+    for name in sorted(names):
+        if name not in known_names:
+            raise ValueError(
+                f"Unknown check: {name} (known checks: {', '.join(known_names)})"
+            )
+
+    return Plan(rules, {})
+
+
+def selected(stage, column, args):
+    """Check whether the plan selects a stage for a column. Pass None as the
+    column for the checks on rows and duplicate items, which are only affected
+    by rules for all columns.
+
+    Return boolean.
+    """
+
+    plan = getattr(args, "plan", None)
+    if plan is None:
+        return True
+
+    for rule in plan.rules:
+        if rule.match is not None:
+            if column is None or rule.match.match(column) is None:
+                continue
+
+        if rule.checks is not None and stage.name not in rule.checks:
+            return False
+
+        if stage.name in rule.skip_checks:
+            return False
+
+    return True
+
+
+def enabled(stage, column, args):
+    """Check whether the options enable a stage for a column.
+
+    Return boolean.
+    """
+
+    if stage.when is None:
+        return True
+
+    if stage.when.startswith("!"):
+        return not getattr(args, stage.when[1:])
+
+    value = getattr(args, stage.when)
+
+    # Options like --agrovoc-fields enable a stage for the listed fields only
+    if isinstance(value, str):
+        return column in value.split(",")
+
+    return bool(value)
+
+
+def column_stages(column, args):
+    """Find the stages that apply to a column. If there is a plan then the
+    stages for each column are only worked out once.
+
+    Return a list of stages.
+    """
+
+    plan = getattr(args, "plan", None)
+    if plan is not None and column in plan.columns:
+        return plan.columns[column]
+
+    stages = matching_stages(COLUMN_STAGES, column, args)
+
+    if plan is not None:
+        plan.columns[column] = stages
+
+    return stages
+
+
+def identifier_stages(column, args):
+    """Find the checks for duplicate identifiers that apply to a column, see
+    DUPLICATE_IDENTIFIER_STAGES.
+
+    Return a list of stages.
+    """
+
+    return matching_stages(DUPLICATE_IDENTIFIER_STAGES, column, args)
+
+
+def matching_stages(stages, column, args):
+    """Find the stages of a list that apply to a column: those that match the
+    column's name and that the options enable and the plan selects.
+
+    Return a list of stages.
+    """
+
+    matching = []
+
+    for stage in stages:
+        if stage.match is not None and re.match(stage.match, column) is None:
+            continue
+
+        if stage.skip is not None and re.match(stage.skip, column) is not None:
+            continue
+
+        if not enabled(stage, column, args):
+            continue
+
+        if not selected(stage, column, args):
+            continue
+
+        matching.append(stage)
+
+    return matching
+
+
+def row_stages(args):
+    """Find the stages that run on rows.
+
+    Return a list of stages.
+    """
+
+    return [
+        stage
+        for stage in ROW_STAGES
+        if enabled(stage, None, args) and selected(stage, None, args)
+    ]
+
+
+def stage_arguments(stage, column, args):
+    """Build the keyword arguments for a stage's function.
+
+    Return a dict.
+    """
+
+    kwargs = {}
+
+    if "field_name" in stage.arguments:
+        kwargs["field_name"] = column
+
+    if "drop" in stage.arguments:
+        kwargs["drop"] = args.drop_invalid_agrovoc
+
+    if "lenient" in stage.arguments:
+        kwargs["lenient"] = args.lenient_citations
+
+    return kwargs
+
+
+def plan_stages(stages, stats):
+    """Leave out the stages that provably can't print or change anything in a
+    column according to its pre-scan: those with a screen that no value
+    matches. A fix that runs might change a value so that it matches the
+    screen of a later stage, so we only leave out stages that come before
+    the first fix that runs.
+
+    Return a list of stages.
+    """
+
+    if stats is None:
+        return stages
+
+    planned = []
+    fixes = False
+
+    for stage in stages:
+        if not fixes and stage.screen is not None and stage.screen not in stats.screens:
+            continue
+
+        planned.append(stage)
+
+        if stage.fix:
+            fixes = True
+
+    return planned
+
+
+def column_strategy(stats):
+    """Choose how to run the checks and fixes on a column of a DataFrame based
+    on its pre-scan: once for each value of the dictionary of a dictionary-
+    encoded column, once for each distinct value if there are few compared to
+    the number of rows (missing values count as one more distinct value), or
+    otherwise once for each row.
+
+    Return "dictionary", "distinct", or "rows".
+    """
+
+    if stats is None:
+        return "rows"
+
+    if stats.dictionary:
+        return "dictionary"
+
+    missing = 1 if stats.values < stats.rows else 0
+    if stats.distinct + missing <= MEMOIZE_MAX_RATIO * stats.rows:
+        return "distinct"
+
+    return "rows"
+
+
+def scan_column(array, stages):
+    """Pre-scan the values of a column (an Arrow array, or None if the values
+    can't be converted to one) for the screens of the stages that run on it.
+
+    Return a ColumnStats, or None.
+    """
+
+    if array is None:
+        return None
+
+    screens = {stage.screen for stage in stages} - {None}
+
+    return scan.scan_column(array, screens)
+
+
+def run_column(series, args, recorder):
+    """Pre-scan a column of a DataFrame, leave out the stages that can't print
+    or change anything, and run the others with the strategy that suits the
+    column, see plan_stages() and column_strategy().
+
+    Return the fixed Series.
+    """
+
+    stages = column_stages(series.name, args)
+    stats = scan_column(scan.column_array(series), stages)
+    stages = plan_stages(stages, stats)
+
+    if column_strategy(stats) == "distinct":
+        return run_stages_memoized(series, stages, args, recorder)
+
+    return run_stages(series, stages, args, recorder)
+
+
+def run_stages_memoized(series, stages, args, recorder):
+    """Run stages on the distinct values of a column, see run_stages_
+    dictionary(), and expand the fixed values back to one for each row.
+
+    Return the fixed Series.
+    """
+
+    if not stages:
+        return series
+
+    # Missing values get the code -1, so we point them at a None after the
+    # distinct values because checks and fixes are called for missing values
+    # too.
+    codes, distinct_values = pd.factorize(series)
+    values = list(distinct_values) + [None]
+    indices = np.where(codes < 0, len(values) - 1, codes)
+
+    fixed_values = run_stages_dictionary(
+        values, indices, series.name, stages, args, recorder, series.index
+    )
+    if fixed_values == values:
+        return series
+
+    fixed = np.empty(len(fixed_values), dtype=object)
+    fixed[:] = fixed_values
+
+    return pd.Series(fixed[indices], index=series.index, name=series.name)
+
+
+def run_stages(series, stages, args, recorder):
+    """Run stages on the values of a column, in order. Categorical columns are
+    checked and fixed once for each category.
+
+    Return the fixed Series.
+    """
+
+    if fileio.is_dictionary(series.dtype):
+        return run_stages_categorical(series, stages, args, recorder)
+
+    for stage in stages:
+        kwargs = stage_arguments(stage, series.name, args)
+        recorder.stage = stage.name
+
+        if stage.vectorized is not None:
+            result = apply_vectorized(series, stage.vectorized, recorder, **kwargs)
+        else:
+            result = apply(series, stage.function, recorder, **kwargs)
+
+        if stage.fix:
+            series = result
+
+    recorder.stage = None
+
+    return series
+
+
+def format_cost(microseconds):
+    """Format an estimated cost in microseconds for humans.
+
+    Return a string.
+    """
+
+    if microseconds < 1000:
+        return f"{microseconds:.0f} µs"
+    if microseconds < 1000000:
+        return f"{microseconds / 1000:.1f} ms"
+    if microseconds < 60000000:
+        return f"{microseconds / 1000000:.1f} s"
+
+    return f"{microseconds / 60000000:.1f} min"
+
+
+def passthrough_columns(columns, args, exclude):
+    """Find the columns of a file that no fix can change, so that they can be
+    copied from the input to the output byte for byte, and those of them whose
+    values no check even looks at, so that they don't need to be parsed.
+
+    Return a tuple of two lists of column names.
+    """
+
+    stages = row_stages(args)
+    row_fixes = any(stage.fix for stage in stages)
+
+    copy_columns = []
+    unread_columns = []
+
+    for column in columns:
+        column_stage_list = [] if column in exclude else column_stages(column, args)
+        if any(stage.fix for stage in column_stage_list):
+            continue
+
+        # The checks and fixes on rows and duplicate items read these columns
+        row_column = re.search(ROW_COLUMNS, column) is not None
+        if row_column and row_fixes:
+            continue
+
+        copy_columns.append(column)
+
+        if column_stage_list or row_column:
+            continue
+
+        if re.search(DUPLICATE_ITEM_COLUMNS, column) is not None:
+            continue
+
+        unread_columns.append(column)
+
+    return copy_columns, unread_columns
+
+
+def explain(data, args, exclude):
+    """Print the plan for a DataFrame or an Arrow table: the statistics of each
+    column from the pre-scan, which checks and fixes run on it and which are
+    left out because they can't print or change anything, and how, with an
+    estimate of how long each stage will take based on the number of values
+    it sees. Stages that run once for each distinct value only see those.
+    """
+
+    table = isinstance(data, pa.Table)
+    rows = data.num_rows if table else len(data)
+
+    total = 0
+
+    print(f"Plan for {rows} rows:")
+
+    for column in data.column_names if table else data.columns:
+        print()
+
+        if column in exclude:
+            print(f"{SKIPPING}{column}")
+
+            continue
+
+        array = data.column(column) if table else scan.column_array(data[column])
+        if table and not (
+            pa.types.is_string(array.type) or fileio.is_dictionary(array.type)
+        ):
+            array = array.cast(pa.string())
+
+        stages = column_stages(column, args)
+        stats = scan_column(array, stages)
+        planned = plan_stages(stages, stats)
+
+        if stats is None:
+            print(f"{column} ({data[column].count()} values)")
+
+            strategy = "rows"
+            count = data[column].count()
+        else:
+            encoded = ", dictionary-encoded" if stats.dictionary else ""
+            print(
+                f"{column} ({stats.values} values, {stats.distinct} distinct{encoded})"
+            )
+            print(
+                f"    {stats.null_ratio:.1%} missing, {stats.multi_value_ratio:.1%} multi-value, {stats.non_ascii_ratio:.1%} non-ASCII, {stats.average_length:.1f} characters on average"
+            )
+
+            # Arrow tables are always checked once for each distinct value
+            if table and not stats.dictionary:
+                strategy = "distinct"
+            else:
+                strategy = column_strategy(stats)
+
+            count = stats.values if strategy == "rows" else stats.distinct
+
+        if not stages:
+            continue
+
+        if strategy == "rows":
+            print("    Runs once for each row")
+        else:
+            print("    Runs once for each distinct value")
+
+        for stage in stages:
+            kind = "fix" if stage.fix else "check"
+
+            if stage not in planned:
+                print(f"    {stage.name:<25} {kind:<6} skipped, nothing to do")
+
+                continue
+
+            cost = stage.cost * count
+            total += cost
+
+            print(f"    {stage.name:<25} {kind:<6} ~{format_cost(cost)}")
+
+    print()
+    print("Items")
+
+    # The checks for duplicate identifiers run once for each column they
+    # apply to, on all rows.
+    stages = []
+    for column in data.column_names if table else data.columns:
+        if column not in exclude:
+            stages += identifier_stages(column, args)
+
+    if selected(DUPLICATE_ITEMS_STAGE, None, args):
+        stages.append(DUPLICATE_ITEMS_STAGE)
+
+    stages += row_stages(args)
+
+    for stage in stages:
+        cost = stage.cost * rows
+        total += cost
+
+        kind = "fix" if stage.fix else "check"
+        print(f"    {stage.name:<25} {kind:<6} ~{format_cost(cost)}")
+
+    print()
+    print(f"Estimated total: ~{format_cost(total)}")
+
+
+def changed_mask(before, after):
+    """Compare the values of a column (a Series or an Arrow array) before and
+    after fixes, where missing values are equal to each other no matter if
+    they are NaN, None, or null.
+
+    Return a NumPy boolean array that is True for the rows that changed.
+    """
+
+    if isinstance(before, (pa.Array, pa.ChunkedArray)):
+        # Dictionary-encoded columns are compared by their values, because the
+        # same values can have different indices in different dictionaries.
+        if fileio.is_dictionary(before.type):
+            before = before.cast(pa.string())
+        if fileio.is_dictionary(after.type):
+            after = after.cast(pa.string())
+
+        values_differ = pc.fill_null(pc.not_equal(before, after), False)
+        missing_differ = pc.not_equal(pc.is_null(before), pc.is_null(after))
+
+        return pc.or_(values_differ, missing_differ).to_numpy(zero_copy_only=False)
+
+    before_missing = pd.isna(before).to_numpy(dtype=bool)
+    after_missing = pd.isna(after).to_numpy(dtype=bool)
+
+    # Replace missing values so that we can compare the rest
+    before = np.where(before_missing, "", before.to_numpy(dtype=object))
+    after = np.where(after_missing, "", after.to_numpy(dtype=object))
+
+    return (before_missing != after_missing) | (before != after)
+
+
+def record_changes(changes, column, mask):
+    """Remember which rows of a column changed, if we were asked to."""
+
+    if changes is None or not mask.any():
+        return
+
+    if column in changes:
+        changes[column] = changes[column] | mask
+    else:
+        changes[column] = mask
+
+
+def process(df, args, exclude, recorder, duplicates=True, changes=None):
+    """Run all checks and fixes on a DataFrame.
+
+    Findings are printed as usual and attributed to rows by the recorder,
+    which must be installed as stdout.
+
+    Columns are only replaced if a fix actually changed one of their values.
+    Optionally pass a dictionary as changes to get a mask of the rows that
+    changed for each column that changed.
+
+    Pass duplicates=False to leave out the checks for duplicate identifiers
+    and duplicate items, for example when the DataFrame is only part of the
+    file and the caller checks for duplicates across the whole file.
+
+    Return the fixed DataFrame.
+    """
+
+    for column in df.columns:
+        recorder.column = column
+
+        if column in exclude:
+            print(f"{SKIPPING}{column}")
+
+            continue
+
+        series = run_column(df[column], args, recorder)
+
+        mask = changed_mask(df[column], series)
+        if mask.any():
+            df[column] = series
+            record_changes(changes, column, mask)
+
+    recorder.column = None
+
+    ### End individual column checks ###
+
+    # Check: duplicate identifiers, like the same ISBN on several items
+    if duplicates:
+        duplicate_identifiers(identifier_entries(df, args, exclude), recorder, df.index)
+
+    # Check: duplicate items
+    # We extract just the title, type, and date issued columns to analyze
+    if duplicates and selected(DUPLICATE_ITEMS_STAGE, None, args):
+        recorder.stage = DUPLICATE_ITEMS_STAGE.name
+
+        try:
+            duplicates_df = df.filter(regex=DUPLICATE_ITEM_COLUMNS)
+            check.duplicate_items(duplicates_df)
+
+            # Delete the temporary duplicates DataFrame
+            del duplicates_df
+        except IndexError:
+            pass
+
+        recorder.stage = None
+
+    # Only countries_match_regions() changes values, so we only need to check
+    # the columns that are passed to the checks and fixes on rows.
+    row_columns = [column for column in df.columns if re.search(ROW_COLUMNS, column)]
+    before = df[row_columns]
+
+    df = process_rows(df, args, exclude, recorder)
+
+    for column in row_columns:
+        record_changes(changes, column, changed_mask(before[column], df[column]))
+
+    return df
+
+
+def process_rows(df, args, exclude, recorder):
+    """Run the checks and fixes that consider items as a whole.
+
+    Return the fixed DataFrame.
+    """
+
+    ##
+    # Perform some checks on rows so we can consider items as a whole rather
+    # than simple on a field-by-field basis. This allows us to check whether
+    # the language used in the title and abstract matches the language indi-
+    # cated in the language field, for example.
+    #
+    # This is slower and apparently frowned upon in the Pandas community be-
+    # cause it requires iterating over rows rather than using apply over a
+    # column. For now it will have to do.
+    ##
+
+    stages = row_stages(args)
+    if not stages:
+        return df
+
+    outputs = vectorized_row_outputs(df, stages, args, exclude)
+
+    # We don't need to go over the rows one by one if all checks on rows are
+    # vectorized, for example without unsafe fixes and with countries_match_
+    # regions skipped.
+    if all(stage_outputs is not None for stage_outputs in outputs):
+        print_row_outputs(df.index, stages, outputs, recorder)
+
+        return df
+
+    # Transpose the DataFrame so we can consider each row as a column. The
+    # checks and fixes on rows expect missing values to be None like after the
+    # fixes on columns, but columns that no fix changed still have NaN or NA.
+    df_transposed = df.astype(object).where(df.notna(), None).T
+
+    # Remember, here a "column" is an item (previously row). Perhaps I
+    # should rename column in this for loop...
+    for position, column in enumerate(df_transposed.columns):
+        recorder.row = column
+
+        for stage, stage_outputs in zip(stages, outputs):
+            recorder.stage = stage.name
+
+            if stage_outputs is not None:
+                print(stage_outputs[position], end="")
+
+                continue
+
+            result = stage.function(df_transposed[column], exclude)
+
+            if stage.fix:
+                df_transposed[column] = result
+
+    recorder.row = None
+    recorder.stage = None
+
+    # Transpose the DataFrame back before writing. This is probably wasteful to
+    # do every time since we technically only need to do it if we've done the
+    # countries/regions fix above, but I can't think of another way for now.
+    return df_transposed.T
+
+
+def vectorized_row_outputs(df, stages, args, exclude):
+    """Run the vectorized checks on rows on all rows of a DataFrame at once.
+    They come before the fixes on rows in ROW_STAGES, so they see the same
+    values as when they run row by row.
+
+    Return a list with the outputs for each row of each stage, or None for the
+    stages that are not vectorized.
+    """
+
+    return [
+        (
+            stage.vectorized(df, exclude, **stage_arguments(stage, None, args))[1]
+            if stage.vectorized is not None
+            else None
+        )
+        for stage in stages
+    ]
+
+
+def print_row_outputs(rows, stages, outputs, recorder):
+    """Print the outputs of vectorized checks on rows, row by row and in the
+    order of the stages, like they would have been printed by the checks one
+    row at a time. Rows without output are skipped.
+    """
+
+    has_output = np.zeros(len(rows), dtype=bool)
+    for stage_outputs in outputs:
+        has_output |= np.array([output != "" for output in stage_outputs], dtype=bool)
+
+    for position in np.flatnonzero(has_output):
+        recorder.row = rows[position]
+
+        for stage, stage_outputs in zip(stages, outputs):
+            recorder.stage = stage.name
+            print(stage_outputs[position], end="")
+
+    recorder.row = None
+    recorder.stage = None
+
+
+def process_table(table, args, exclude, recorder, changes=None):
+    """Run all checks and fixes on an Arrow table, for example one that is
+    memory mapped from an Arrow IPC file.
+
+    This prints the same findings and produces the same output as process(),
+    but avoids converting the whole table to Python strings:
+
+        - Values are only passed to the fixes (and the checks that come before
+          them) if they contain something that one of the fixes could change.
+          Other values are left alone without ever being read into Python.
+        - The remaining checks only read values, so they run once for each
+          distinct value and their findings are repeated for all rows with
+          that value.
+        - Dictionary-encoded columns are checked and fixed once for each value
+          in the dictionary, and fixes only rewrite the dictionary and the
+          indices.
+        - Duplicate items are identified with Arrow compute functions.
+        - Only the columns needed by the checks and fixes on rows are read
+          into Python.
+
+    Columns are only copied if a fix actually changes one of their values.
+    Optionally pass a dictionary as changes to get a mask of the rows that
+    changed for each column that changed.
+
+    Return the fixed table.
+    """
+
+    # Checks and fixes only work on strings, so cast columns of other types.
+    # Dictionary-encoded string columns are kept as they are.
+    for index, field in enumerate(table.schema):
+        if fileio.is_dictionary(field.type):
+            continue
+
+        if not (pa.types.is_string(field.type) or pa.types.is_large_string(field.type)):
+            table = table.set_column(
+                index, field.name, table.column(index).cast(pa.string())
+            )
+
+    for index, column in enumerate(table.column_names):
+        if column in exclude:
+            print(f"{SKIPPING}{column}")
+
+            continue
+
+        array = table.column(index)
+        stages = column_stages(column, args)
+        stages = plan_stages(stages, scan_column(array, stages))
+
+        if fileio.is_dictionary(array.type):
+            new_array = run_stages_dictionary_array(
+                array, column, stages, args, recorder
+            )
+            if new_array is not array:
+                table = table.set_column(index, column, new_array)
+                record_changes(changes, column, changed_mask(array, new_array))
+
+            continue
+
+        # The checks after the last fix only read the values
+        fixes = [position for position, stage in enumerate(stages) if stage.fix]
+        if fixes:
+            fix_stages = stages[: fixes[-1] + 1]
+            check_stages = stages[fixes[-1] + 1 :]
+        else:
+            fix_stages = []
+            check_stages = stages
+
+        new_array = run_stages_screened(array, column, fix_stages, args, recorder)
+        if new_array is not array:
+            table = table.set_column(index, column, new_array)
+            record_changes(changes, column, changed_mask(array, new_array))
+
+        for stage in check_stages:
+            run_stage_distinct(new_array, column, stage, args, recorder)
+
+    duplicate_identifiers(identifier_entries(table, args, exclude), recorder)
+
+    if selected(DUPLICATE_ITEMS_STAGE, None, args):
+        recorder.stage = DUPLICATE_ITEMS_STAGE.name
+        duplicate_items_table(table)
+        recorder.stage = None
+
+    # Read the columns that the checks and fixes on rows need into Python,
+    # with None for missing values like after the fixes in process().
+    row_columns = [
+        column for column in table.column_names if re.search(ROW_COLUMNS, column)
+    ]
+    df = pd.DataFrame(
+        {column: table.column(column).to_pylist() for column in row_columns},
+        columns=row_columns,
+        dtype=object,
+    )
+    df = process_rows(df, args, exclude, recorder)
+
+    # Only countries_match_regions() changes values, so compare before we copy
+    for column in row_columns:
+        new_array = pa.chunked_array(
+            [pa.array(df[column].tolist(), table.column(column).type)]
+        )
+        if not new_array.equals(table.column(column)):
+            record_changes(
+                changes, column, changed_mask(table.column(column), new_array)
+            )
+            table = table.set_column(
+                table.column_names.index(column), column, new_array
+            )
+
+    return table
+
+
+def check_table(table, args, exclude, recorder):
+    """Run all checks and fixes on an Arrow table, but only to print their
+    findings. This prints the same findings as process() without building any
+    fixed columns or transposing the table:
+
+        - Each stage runs once for each distinct value of a column, and fixes
+          are applied to the distinct values only, so the following stages
+          see the fixed values as usual. The findings are repeated for all
+          rows with that value, stage by stage, in the same order as before.
+        - Only the columns needed for duplicate identifiers, duplicate items,
+          and the checks and fixes on rows are expanded back to one fixed
+          value per row, and rows are checked one by one without transposing.
+    """
+
+    needed_columns = [
+        column
+        for column in table.column_names
+        if re.search(ROW_COLUMNS, column)
+        or re.search(DUPLICATE_ITEM_COLUMNS, column)
+        or identifier_stages(column, args)
+    ]
+    fixed_columns = {}
+
+    for column in table.column_names:
+        array = string_array(table.column(column))
+
+        if column in exclude:
+            print(f"{SKIPPING}{column}")
+
+            if column in needed_columns:
+                fixed_columns[column] = array.to_pylist()
+
+            continue
+
+        values, indices = distinct_values(array)
+
+        # Only the screens matter here, so we scan the distinct values
+        stages = column_stages(column, args)
+        stages = plan_stages(stages, scan_column(pa.array(values, pa.string()), stages))
+        values = run_stages_dictionary(values, indices, column, stages, args, recorder)
+
+        if column in needed_columns:
+            fixed_columns[column] = expand_values(values, indices)
+
+    check_items(
+        fixed_columns,
+        needed_columns,
+        fixed_identifier_entries(fixed_columns, args, exclude),
+        selected(DUPLICATE_ITEMS_STAGE, None, args),
+        row_stages(args),
+        args,
+        exclude,
+        recorder,
+    )
+
+
+def check_items(
+    fixed_columns, columns, entries, duplicates, stages, args, exclude, recorder
+):
+    """Check for duplicate identifiers (given their entries, see identifier_
+    entries()) and duplicate items (if duplicates is True) and run the given
+    checks and fixes on rows, but only to print their findings, given the
+    fixed values of the columns they need (a dict of lists), in the order of
+    columns. Rows are checked one by one without transposing, unless all
+    stages are vectorized.
+    """
+
+    duplicate_identifiers(entries, recorder)
+
+    if duplicates:
+        recorder.stage = DUPLICATE_ITEMS_STAGE.name
+        duplicate_items_table(
+            pa.table(
+                {
+                    column: pa.array(fixed_columns[column], pa.string())
+                    for column in columns
+                }
+            )
+        )
+        recorder.stage = None
+
+    if not stages:
+        return
+
+    # Only pass the columns that the checks and fixes on rows look at
+    row_columns = [column for column in columns if re.search(ROW_COLUMNS, column)]
+    df = pd.DataFrame(
+        {column: fixed_columns[column] for column in row_columns},
+        columns=row_columns,
+        dtype=object,
+    )
+
+    outputs = vectorized_row_outputs(df, stages, args, exclude)
+
+    if all(stage_outputs is not None for stage_outputs in outputs):
+        print_row_outputs(df.index, stages, outputs, recorder)
+
+        return
+
+    for position, (row, values) in enumerate(df.iterrows()):
+        recorder.row = row
+
+        for stage, stage_outputs in zip(stages, outputs):
+            recorder.stage = stage.name
+
+            if stage_outputs is not None:
+                print(stage_outputs[position], end="")
+            else:
+                stage.function(values, exclude)
+
+    recorder.row = None
+    recorder.stage = None
+
+
+def gate(table, args, exclude, recorder, names=None):
+    """Run only the checks and fixes whose findings count against the budget
+    of a run (those in names, or all of them), cheapest first, so that a run
+    with more findings than --max-findings allows is stopped as early as
+    possible by the recorder, see findings.BudgetExceeded. Nothing is printed
+    for excluded columns.
+
+    Counted checks see fixed values as usual, so the fixes that come before
+    them on the same column run too, but not the other checks or the fixes
+    after them. Everything runs once for each distinct value, like in
+    check_table(), and the columns are ordered by the estimated cost of their
+    stages. The columns needed by counted checks on rows, duplicate
+    identifiers, and duplicate items are fixed completely, and those checks
+    run last because they are the most expensive.
+    """
+
+    def counted(stage):
+        return names is None or stage.name in names
+
+    stages = [stage for stage in row_stages(args) if counted(stage)]
+    duplicates = selected(DUPLICATE_ITEMS_STAGE, None, args) and counted(
+        DUPLICATE_ITEMS_STAGE
+    )
+
+    needed_columns = [
+        column
+        for column in table.column_names
+        if (stages and re.search(ROW_COLUMNS, column))
+        or (duplicates and re.search(DUPLICATE_ITEM_COLUMNS, column))
+        or any(counted(stage) for stage in identifier_stages(column, args))
+    ]
+    fixed_columns = {}
+
+    units = []
+    for column in table.column_names:
+        array = string_array(table.column(column))
+
+        if column in exclude:
+            if column in needed_columns:
+                fixed_columns[column] = array.to_pylist()
+
+            continue
+
+        column_stage_list = column_stages(column, args)
+
+        # Fixes after the last counted check only matter for the checks on
+        # rows and duplicate items
+        if column not in needed_columns:
+            counted_positions = [
+                position
+                for position, stage in enumerate(column_stage_list)
+                if counted(stage)
+            ]
+            column_stage_list = column_stage_list[
+                : counted_positions[-1] + 1 if counted_positions else 0
+            ]
+
+        column_stage_list = [
+            stage for stage in column_stage_list if stage.fix or counted(stage)
+        ]
+
+        if not column_stage_list:
+            if column in needed_columns:
+                fixed_columns[column] = array.to_pylist()
+
+            continue
+
+        # Only the screens matter here, so we scan the distinct values
+        values, indices = distinct_values(array)
+        column_stage_list = plan_stages(
+            column_stage_list,
+            scan_column(pa.array(values, pa.string()), column_stage_list),
+        )
+        cost = sum(stage.cost for stage in column_stage_list) * len(values)
+
+        units.append((cost, column, column_stage_list, values, indices))
+
+    for cost, column, column_stage_list, values, indices in sorted(
+        units, key=lambda unit: unit[0]
+    ):
+        values = run_stages_dictionary(
+            values, indices, column, column_stage_list, args, recorder
+        )
+
+        if column in needed_columns:
+            fixed_columns[column] = expand_values(values, indices)
+
+    entries = [
+        entry
+        for entry in fixed_identifier_entries(fixed_columns, args, exclude)
+        if counted(entry[0])
+    ]
+
+    check_items(
+        fixed_columns,
+        needed_columns,
+        entries,
+        duplicates,
+        stages,
+        args,
+        exclude,
+        recorder,
+    )
+
+
+def fixed_identifier_entries(fixed_columns, args, exclude):
+    """Find the keys of the identifiers in the fixed values of the columns that
+    check_table() and gate() expand (a dict of lists), like identifier_
+    entries().
+
+    Return a list of (stage, column, values, rows, keys) tuples.
+    """
+
+    columns = [column for column in fixed_columns if identifier_stages(column, args)]
+
+    return identifier_entries(
+        pd.DataFrame(
+            {column: fixed_columns[column] for column in columns},
+            columns=columns,
+            dtype=object,
+        ),
+        args,
+        exclude,
+    )
+
+
+def string_array(array):
+    """Cast an Arrow array to strings, unless it is a string or dictionary-
+    encoded column already.
+
+    Return an Arrow array.
+    """
+
+    if pa.types.is_string(array.type) or fileio.is_dictionary(array.type):
+        return array
+
+    return array.cast(pa.string())
+
+
+def distinct_values(array):
+    """Get the distinct values of an Arrow array and the index of each row's
+    value in them. Dictionary-encoded columns already have their distinct
+    values, see dictionary_values().
+
+    Return a tuple of a list of values and a NumPy array of indices.
+    """
+
+    if fileio.is_dictionary(array.type):
+        return dictionary_values(array)
+
+    values = pc.unique(array)
+    indices = pc.index_in(array, value_set=values, skip_nulls=False)
+
+    return values.to_pylist(), indices.to_numpy(zero_copy_only=False)
+
+
+def expand_values(values, indices):
+    """Expand the (fixed) distinct values of a column back to one value for
+    each row.
+
+    Return a list.
+    """
+
+    expanded = np.empty(len(values), dtype=object)
+    expanded[:] = values
+
+    return expanded[indices].tolist()
+
+
+def replay(outputs, indices, recorder, rows=None):
+    """Print the output of a stage for each distinct value again for every row
+    with that value. Rows are numbered by position unless their index labels
+    are given.
+    """
+
+    has_output = np.array([output != "" for output in outputs], dtype=bool)
+    if not has_output.any():
+        return
+
+    for position in np.flatnonzero(has_output[indices]):
+        recorder.row = position if rows is None else rows[position]
+        print(outputs[indices[position]], end="")
+
+    recorder.row = None
+
+
+def count_findings(findings):
+    """Count the findings, not including notices about skipped columns.
+
+    Return an integer.
+    """
+
+    return sum(1 for _, line in findings if not line.startswith(SKIPPING))
+
+
+def run_stages_screened(array, column, stages, args, recorder):
+    """Run stages on the values of an Arrow array that any of them might print
+    or change something for.
+
+    Return the fixed array, or the original array if nothing changed.
+    """
+
+    if not stages or len(array) == 0:
+        return array
+
+    # Missing values are skipped by all checks and fixes
+    mask = pc.is_valid(array)
+
+    screens = [stage.screen for stage in stages]
+    if None not in screens:
+        mask = pc.and_(mask, pc.match_substring_regex(array, "|".join(screens)))
+
+    positions = np.flatnonzero(mask.to_numpy(zero_copy_only=False))
+    if len(positions) == 0:
+        return array
+
+    series = pd.Series(
+        array.take(positions).to_pylist(), index=positions, name=column, dtype=object
+    )
+    series = run_stages(series, stages, args, recorder)
+
+    # Only copy the column if a fix changed something
+    if series.tolist() == array.take(positions).to_pylist():
+        return array
+
+    replacements = pa.array(series.tolist(), array.type)
+    mask = np.zeros(len(array), dtype=bool)
+    mask[positions] = True
+
+    return pc.replace_with_mask(array.combine_chunks(), mask, replacements)
+
+
+def run_stage_distinct(array, column, stage, args, recorder):
+    """Run a check that only reads values once for each distinct value of an
+    Arrow array, and repeat its findings for every row with that value.
+    """
+
+    distinct_values = pc.unique(array)
+    indices = pc.index_in(array, value_set=distinct_values, skip_nulls=False)
+    indices = indices.to_numpy(zero_copy_only=False)
+
+    recorder.stage = stage.name
+
+    if stage.vectorized is not None:
+        run_vectorized(
+            distinct_values.to_pylist(), indices, column, stage, args, recorder
+        )
+    else:
+        kwargs = stage_arguments(stage, column, args)
+
+        outputs = [
+            capture(stage.function, value, **kwargs)[1]
+            for value in distinct_values.to_pylist()
+        ]
+
+        replay(outputs, indices, recorder)
+
+    recorder.stage = None
+
+
+def run_vectorized(values, indices, column, stage, args, recorder, rows=None):
+    """Run a stage that works on all values of a column at once on the distinct
+    values of a column, expanded back to one value per row because the stage
+    might look at more than one row at a time (for example to find duplicate
+    ISBNs), and print its findings for each row. Rows are numbered by position
+    unless their index labels are given.
+
+    Return a list of the fixed distinct values, or None if the stage only
+    checks.
+    """
+
+    distinct_values = np.empty(len(values), dtype=object)
+    distinct_values[:] = values
+
+    series = pd.Series(distinct_values[indices], index=rows, name=column, dtype=object)
+    result = apply_vectorized(
+        series, stage.vectorized, recorder, **stage_arguments(stage, column, args)
+    )
+
+    if result is None:
+        return None
+
+    # Fixes give the same result for the same value, so we take the result for
+    # the first row with each distinct value. A dictionary can have values that
+    # no row uses, which stay as they are.
+    used, first_rows = np.unique(indices, return_index=True)
+    distinct_values[used] = result.to_numpy(dtype=object)[first_rows]
+
+    return distinct_values.tolist()
+
+
+def run_stages_dictionary(values, indices, column, stages, args, recorder, rows=None):
+    """Run stages on the distinct values of a column, like the dictionary of a
+    dictionary-encoded column, where indices is a NumPy array with the position
+    of each row's value in the list of values. Fixes are applied to the dis-
+    tinct values only, so the following stages see the fixed values as usual,
+    and the findings are repeated for all rows with that value, stage by stage,
+    in the same order as run_stages(). Rows are numbered by position unless
+    their index labels are given.
+
+    Return the list of fixed distinct values.
+    """
+
+    for stage in stages:
+        recorder.stage = stage.name
+
+        if stage.vectorized is not None:
+            result = run_vectorized(
+                values, indices, column, stage, args, recorder, rows
+            )
+
+            if stage.fix:
+                values = result
+
+            continue
+
+        kwargs = stage_arguments(stage, column, args)
+
+        results = [capture(stage.function, value, **kwargs) for value in values]
+        replay([output for _, output in results], indices, recorder, rows)
+
+        if stage.fix:
+            values = [result for result, _ in results]
+
+    recorder.stage = None
+
+    return values
+
+
+def dictionary_values(array):
+    """Get the dictionary of a dictionary-encoded Arrow array and the index of
+    each row's value in it. Missing values point at a None after the values in
+    the dictionary because checks and fixes are called for missing values too.
+
+    Return a tuple of a list of values and a NumPy array of indices.
+    """
+
+    combined = array.combine_chunks()
+
+    values = combined.dictionary.to_pylist() + [None]
+    indices = pc.fill_null(combined.indices, len(values) - 1)
+
+    return values, indices.to_numpy(zero_copy_only=False)
+
+
+def dictionary_indices(fixed_values, indices):
+    """Encode the fixed distinct values of a dictionary-encoded column again.
+    Fixes can make distinct values equal (or missing), so the fixed values are
+    factorized and the indices of the rows are rewritten to point at them.
+
+    Return a tuple of the new distinct values (without missing values) and a
+    NumPy array with the new index of each row, which is -1 for missing
+    values.
+    """
+
+    codes, distinct_values = pd.factorize(pd.Series(fixed_values, dtype=object))
+
+    return distinct_values, codes[indices]
+
+
+def run_stages_categorical(series, stages, args, recorder):
+    """Run stages on a categorical Series (a dictionary-encoded column read by
+    fileio.read()), once for each category, see run_stages_dictionary().
+
+    Return the fixed Series, which is still categorical.
+    """
+
+    # Missing values have the code -1, so we point them at a None after the
+    # categories because checks and fixes are called for missing values too.
+    values = series.cat.categories.tolist() + [None]
+    codes = series.cat.codes.to_numpy()
+    indices = np.where(codes < 0, len(values) - 1, codes)
+
+    fixed_values = run_stages_dictionary(
+        values, indices, series.name, stages, args, recorder, series.index
+    )
+    if fixed_values == values:
+        return series
+
+    categories, codes = dictionary_indices(fixed_values, indices)
+
+    return pd.Series(
+        pd.Categorical.from_codes(codes, categories=categories),
+        index=series.index,
+        name=series.name,
+    )
+
+
+def run_stages_dictionary_array(array, column, stages, args, recorder):
+    """Run stages on a dictionary-encoded Arrow array, once for each value in
+    the dictionary, see run_stages_dictionary(). Only the dictionary and the
+    indices are rewritten.
+
+    Return the fixed array, or the original array if nothing changed.
+    """
+
+    if not stages or len(array) == 0:
+        return array
+
+    values, indices = dictionary_values(array)
+
+    fixed_values = run_stages_dictionary(
+        values, indices, column, stages, args, recorder
+    )
+    if fixed_values == values:
+        return array
+
+    dictionary, indices = dictionary_indices(fixed_values, indices)
+
+    return pa.chunked_array(
+        [
+            pa.DictionaryArray.from_arrays(
+                pa.array(indices, pa.int32(), mask=indices < 0),
+                pa.array(dictionary, pa.string()),
+            )
+        ]
+    )
+
+
+def duplicate_items_table(table):
+    """Check for duplicate items in an Arrow table like check.duplicate_items(),
+    but using Arrow compute functions instead of iterating over rows.
+    """
+
+    duplicate_columns = [
+        column
+        for column in table.column_names
+        if re.search(DUPLICATE_ITEM_COLUMNS, column)
+    ]
+
+    try:
+        title_column_name, type_column_name, date_column_name = (
+            check.duplicate_item_columns(pd.DataFrame(columns=duplicate_columns))
+        )
+    except IndexError:
+        return
+
+    titles = table.column(title_column_name).cast(pa.string())
+
+    items_count_total = pc.count(titles).as_py()
+    items_count_unique = pc.count_distinct(titles).as_py()
+
+    if items_count_unique < items_count_total:
+        # Missing values are None after the fixes in process(), so we do the
+        # same to get the same keys.
+        keys = pc.binary_join_element_wise(
+            titles.cast(pa.string()),
+            table.column(type_column_name).cast(pa.string()),
+            table.column(date_column_name).cast(pa.string()),
+            "",
+            null_handling="replace",
+            null_replacement="None",
+        )
+        indices = pc.index_in(keys, value_set=pc.unique(keys))
+        indices = indices.to_numpy(zero_copy_only=False)
+
+        # The first occurrence of each key is not a duplicate
+        _, first_positions = np.unique(indices, return_index=True)
+        duplicate_positions = np.flatnonzero(
+            np.arange(len(indices)) != first_positions[indices]
+        )
+
+        for title in titles.take(duplicate_positions).to_pylist():
+            print(
+                f"{Fore.YELLOW}Possible duplicate ({title_column_name}): {Fore.RESET}{title}"
+            )
+
+
+def identifier_entries(data, args, exclude):
+    """Find the keys of the identifiers in the fixed values of a DataFrame or an
+    Arrow table for the checks for duplicate identifiers that apply to each
+    column, see DUPLICATE_IDENTIFIER_STAGES. Excluded columns are left out.
+
+    Return a list of (stage, column, values, rows, keys) tuples, column by
+    column and then stage by stage, where values is a NumPy array of the
+    values of the column split on the "||" separator, rows is a NumPy array of
+    the position of the row of each value, and keys is a NumPy array of the
+    key of each value.
+    """
+
+    table = isinstance(data, pa.Table)
+    entries = []
+
+    for column in data.column_names if table else data.columns:
+        if column in exclude:
+            continue
+
+        stages = identifier_stages(column, args)
+        if not stages:
+            continue
+
+        if table:
+            series = pd.Series(
+                string_array(data.column(column)).to_pylist(), dtype=object
+            )
+        else:
+            series = data[column]
+
+        values, rows = identifiers.explode(series)
+
+        for stage in stages:
+            entries.append((stage, column, values, rows, stage.vectorized(values)))
+
+    return entries
+
+
+def duplicate_identifiers(entries, recorder, index=None, seen=None):
+    """Check for identifiers that are used by more than one item, given the
+    keys of the identifiers from identifier_entries(), and print them column
+    by column, stage by stage, and row by row. The findings are attributed to
+    the labels of the index at the position of each row, or to the positions
+    themselves if there is no index.
+
+    Optionally pass a dict of the sets of keys seen in earlier batches of rows
+    for each stage and column, which is updated with the new keys, so that we
+    can find duplicates across batches like with the duplicate keys of items.
+    """
+
+    for stage, column, values, rows, keys in entries:
+        recorder.stage = stage.name
+        recorder.column = column
+
+        stage_seen = None
+        if seen is not None:
+            stage_seen = seen.setdefault((stage.name, column), set())
+
+        for position in identifiers.duplicates(rows, keys, stage_seen):
+            row = int(rows[position])
+            recorder.row = row if index is None else index[row]
+
+            stage.function(values[position])
+
+    recorder.row = None
+    recorder.stage = None
+    recorder.column = None
@@ -0,0 +1,403 @@
+# SPDX-License-Identifier: GPL-3.0-only
+
+import argparse
+import math
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+import csv_metadata_quality.api as api
+import csv_metadata_quality.fileio as fileio
+import csv_metadata_quality.pipeline as pipeline
+import csv_metadata_quality.shard as shard
+from csv_metadata_quality.findings import Recorder, recording
+
+# z-score for a two-sided 95% confidence interval
+Z = 1.959963984540054
+
+# A sample of the rows of a file:
+#
+#   - table: Arrow table of the sampled rows, in the same order as in the file
+#   - rows: NumPy array of the position of each sampled row in the file
+#   - strata: NumPy array of the stratum (the value of the column the sample
+#     was stratified by, or "") of each sampled row
+#   - totals: dict of the number of rows in the file in each stratum
+Sample = namedtuple("Sample", ["table", "rows", "strata", "totals"])
+
+# The share of the rows of a file with findings from a check, estimated from a
+# sample, with the number of sampled rows it was found in and a 95% confidence
+# interval
+Estimate = namedtuple("Estimate", ["name", "found", "rate", "low", "high"])
+
+
+def size(value):
+    """Parse the size of a sample for argparse: a number of rows like 1000, or
+    a fraction of the rows like 0.01.
+
+    Return an integer or a float.
+    """
+
+    try:
+        number = float(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid sample size: {value}")
+
+    if number >= 1 and number.is_integer():
+        return int(number)
+
+    if 0 < number < 1:
+        return number
+
+    raise argparse.ArgumentTypeError(
+        f"invalid sample size: {value} (use a number of rows or a fraction between 0 and 1)"
+    )
+
+
+def stratum_codes(table, column, codes):
+    """Number the stratum of each row of a table: the value of the column to
+    stratify by, with "" for missing values, or "" for all rows if we don't
+    stratify. Values get the next number the first time they are seen, and
+    the dict of codes is updated.
+
+    Raises a ValueError if the table has no such column.
+
+    Return a NumPy array of integers.
+    """
+
+    if column is None:
+        codes.setdefault("", 0)
+
+        return np.zeros(table.num_rows, dtype=np.int64)
+
+    if column not in table.column_names:
+        raise ValueError(f"No column to stratify the sample by: {column}")
+
+    array = table.column(column)
+    if not pa.types.is_string(array.type):
+        array = array.cast(pa.string())
+
+    encoded = pc.dictionary_encode(pc.fill_null(array, "")).combine_chunks()
+    mapping = np.array(
+        [
+            codes.setdefault(value, len(codes))
+            for value in encoded.dictionary.to_pylist()
+        ],
+        dtype=np.int64,
+    )
+
+    return mapping[encoded.indices.to_numpy(zero_copy_only=False)]
+
+
+def ranks(keys, strata):
+    """Rank the random keys of the rows within each stratum, starting at 1.
+
+    Return a NumPy array of integers.
+    """
+
+    return (
+        pd.Series(keys)
+        .groupby(strata, sort=False)
+        .rank(method="first")
+        .to_numpy(dtype=np.int64)
+    )
+
+
+def candidates(keys, strata, size):
+    """Find the rows that could still end up in the sample: those with the
+    size smallest keys in their stratum for a number of rows, or otherwise
+    those with a key smaller than the fraction, and the row with the smallest
+    key in each stratum so that every stratum has at least one row.
+
+    Return a NumPy boolean array.
+    """
+
+    key_ranks = ranks(keys, strata)
+
+    if isinstance(size, float):
+        return (keys < size) | (key_ranks == 1)
+
+    return key_ranks <= size
+
+
+def allocate(size, totals):
+    """Divide a sample of a number of rows between the strata in proportion to
+    the number of rows in each, with at least one row for each stratum.
+
+    Return a dict of the number of rows to sample from each stratum.
+    """
+
+    total = sum(totals.values())
+
+    return {
+        stratum: min(count, max(1, round(size * count / total)))
+        for stratum, count in totals.items()
+    }
+
+
+def select(keys, strata, size, totals):
+    """Choose the sample from the candidates once all rows have been seen, see
+    candidates(). Strata without any key smaller than the fraction get the row
+    with the smallest key.
+
+    Return a NumPy boolean array.
+    """
+
+    key_ranks = ranks(keys, strata)
+
+    if isinstance(size, float):
+        below = keys < size
+        covered = pd.Series(below).groupby(strata).transform("any").to_numpy()
+
+        return below | (~covered & (key_ranks == 1))
+
+    limits = allocate(size, totals)
+
+    return key_ranks <= np.array([limits[stratum] for stratum in strata])
+
+
+def thresholds(keys, strata, size, count):
+    """Find the key below which a new row of each stratum could still end up in
+    the sample, given the candidates so far, see candidates(): the largest key
+    of a full stratum for a number of rows, or otherwise the fraction or the
+    smallest key of the stratum, whichever is larger.
+
+    Return a NumPy array with the threshold of each of the count strata.
+    """
+
+    limits = np.full(count, np.inf)
+    if len(keys) == 0:
+        return limits
+
+    groups = pd.Series(keys).groupby(strata)
+
+    if isinstance(size, float):
+        smallest = groups.min()
+        limits[smallest.index] = np.maximum(smallest.to_numpy(), size)
+    else:
+        largest = groups.agg(["max", "count"])
+        largest = largest[largest["count"] >= size]
+        limits[largest.index] = largest["max"].to_numpy()
+
+    return limits
+
+
+def draw(batches, size, seed=0, column=None):
+    """Draw a random sample of rows from a stream of record batches without
+    keeping more than the sample (and one batch) in memory, so the time it
+    takes only depends on how fast the file can be read.
+
+    Every row gets a random key from a generator seeded with seed, so the
+    same file gives the same sample every time. For a number of rows we keep
+    the rows with the smallest keys (bottom-k reservoir sampling), and for a
+    fraction the rows with a key smaller than the fraction. With a column to
+    stratify by, for example collection, the rows are sampled within each
+    value of the column, and a number of rows is divided between them in
+    proportion to their size once we know it, see allocate().
+
+    Return a Sample.
+    """
+
+    generator = np.random.default_rng(seed)
+
+    codes = {}
+    counts = np.zeros(0, dtype=np.int64)
+    limits = np.zeros(0)
+
+    tables = []
+    keys = np.empty(0)
+    rows = np.empty(0, dtype=np.int64)
+    strata = np.empty(0, dtype=np.int64)
+    offset = 0
+
+    for batch in batches:
+        table = pa.Table.from_batches([batch])
+
+        batch_keys = generator.random(table.num_rows)
+        batch_strata = stratum_codes(table, column, codes)
+
+        counts = np.pad(counts, (0, len(codes) - len(counts)))
+        counts += np.bincount(batch_strata, minlength=len(codes))
+        limits = np.pad(limits, (0, len(codes) - len(limits)), constant_values=np.inf)
+
+        # Only copy the rows of the batch that might be sampled
+        positions = np.flatnonzero(batch_keys < limits[batch_strata])
+        table = table.take(positions)
+
+        # Dictionaries can differ between batches, so we keep plain strings
+        for index, field in enumerate(table.schema):
+            if fileio.is_dictionary(field.type):
+                table = table.set_column(
+                    index, field.name, table.column(index).cast(pa.string())
+                )
+
+        tables.append(table)
+        keys = np.concatenate([keys, batch_keys[positions]])
+        rows = np.concatenate([rows, positions + offset])
+        strata = np.concatenate([strata, batch_strata[positions]])
+        offset += len(batch_keys)
+
+        keep = candidates(keys, strata, size)
+        if not keep.all():
+            tables = [pa.concat_tables(tables).filter(pa.array(keep))]
+            keys, rows, strata = keys[keep], rows[keep], strata[keep]
+
+        limits = thresholds(keys, strata, size, len(codes))
+
+    if offset == 0:
+        raise ValueError("There are no rows to sample")
+
+    keep = select(keys, strata, size, dict(enumerate(counts)))
+    order = np.argsort(rows[keep], kind="stable")
+
+    table = pa.concat_tables(tables).filter(pa.array(keep)).take(order)
+    names = np.array(list(codes), dtype=object)
+
+    return Sample(
+        table,
+        rows[keep][order],
+        names[strata[keep][order]],
+        dict(zip(names, counts.tolist())),
+    )
+
+
+def wilson(rate, variance, sampled, total):
+    """Compute a 95% Wilson score interval for the share of rows with findings,
+    from the estimated share and its variance. The effective sample size comes
+    from the variance, which accounts for the strata and for sampling without
+    replacement. If every row was sampled the share is exact.
+
+    Return a tuple of the lower and upper bound.
+    """
+
+    if sampled >= total:
+        return rate, rate
+
+    if variance > 0:
+        effective = rate * (1 - rate) / variance
+    else:
+        effective = sampled / (1 - sampled / total)
+
+    z2 = Z * Z
+    center = (rate + z2 / (2 * effective)) / (1 + z2 / effective)
+    half = (
+        Z
+        * math.sqrt(rate * (1 - rate) / effective + z2 / (4 * effective**2))
+        / (1 + z2 / effective)
+    )
+
+    return max(0.0, center - half), min(1.0, center + half)
+
+
+def estimate(name, hits, strata, totals):
+    """Estimate the share of the rows in a file with findings from a check,
+    given whether each sampled row had one and its stratum. The shares of the
+    strata are weighted by their number of rows in the file.
+
+    Return an Estimate.
+    """
+
+    total = sum(totals.values())
+    counts = pd.DataFrame({"hit": hits, "stratum": strata}).groupby("stratum")["hit"]
+
+    rate = 0.0
+    variance = 0.0
+
+    for stratum, (found, sampled) in counts.agg(["sum", "count"]).iterrows():
+        weight = totals[stratum] / total
+        share = found / sampled
+
+        rate += weight * share
+        variance += (
+            weight**2 * (1 - sampled / totals[stratum]) * share * (1 - share) / sampled
+        )
+
+    low, high = wilson(rate, variance, len(hits), total)
+
+    return Estimate(name, int(np.sum(hits)), rate, low, high)
+
+
+def check(sample, args):
+    """Run the checks and fixes on a sample like --check-only does, without
+    printing the findings, and estimate how many rows of the whole file have
+    findings from each check and fix that could run, and from any of them.
+
+    Return a list of Estimates.
+    """
+
+    exclude = api.excluded_fields(args)
+
+    recorder = Recorder(stream=None)
+    with recording(recorder):
+        pipeline.check_table(sample.table, args, exclude, recorder)
+
+    rows = {}
+    for (row, line), stage in zip(recorder.findings, recorder.stages):
+        if row is not None and stage is not None:
+            rows.setdefault(stage, set()).add(row)
+
+    names = {stage.name for stage in pipeline.row_stages(args)}
+    for column in sample.table.column_names:
+        if column not in exclude:
+            names.update(stage.name for stage in pipeline.column_stages(column, args))
+
+    estimates = []
+    for name in pipeline.stage_names():
+        if name not in names:
+            continue
+
+        hits = np.zeros(sample.table.num_rows, dtype=bool)
+        hits[list(rows.get(name, ()))] = True
+        estimates.append(estimate(name, hits, sample.strata, sample.totals))
+
+    hits = np.zeros(sample.table.num_rows, dtype=bool)
+    hits[list(set().union(*rows.values()))] = True
+    estimates.append(estimate("any", hits, sample.strata, sample.totals))
+
+    return estimates
+
+
+def report(sample, estimates, args):
+    """Print the estimated share and number of rows with findings from each
+    check and fix in the whole file."""
+
+    total = sum(sample.totals.values())
+    sampled = sample.table.num_rows
+
+    print(
+        f"Sampled {sampled:,} of {total:,} rows ({sampled / total:.2%}) with seed {args.seed}"
+    )
+    if args.sample_by:
+        print(f"Stratified by {args.sample_by} ({len(sample.totals):,} values)")
+
+    print()
+    print(
+        f"    {'Check':<25} {'Sampled':>8} {'Rate':>8}  {'95% CI':<17} Estimated rows"
+    )
+
+    for item in estimates:
+        interval = f"{item.low:.2%}–{item.high:.2%}"
+        print(
+            f"    {item.name:<25} {item.found:>8,} {item.rate:>8.2%}  {interval:<17} ~{item.rate * total:,.0f} ({item.low * total:,.0f}–{item.high * total:,.0f})"
+        )
+
+    print()
+    print("Duplicate ISBNs, DOIs, and items are not checked in a sample.")
+
+
+def run(args):
+    """Draw a sample from the input file while reading it, check it, and print
+    the report."""
+
+    input_format = args.input_format or fileio.detect_format(args.input_file)
+    batches = fileio.read_batches(args.input_file, input_format, args.block_size)
+
+    sample = draw(batches, args.sample, args.seed, args.sample_by)
+
+    # Duplicate identifiers and items in a sample say nothing about duplicates
+    # in the file
+    args.plan = shard.without_duplicate_items(args.plan)
+
+    report(sample, check(sample, args), args)
@@ -0,0 +1,138 @@
+# SPDX-License-Identifier: GPL-3.0-only
+
+from collections import namedtuple
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+
+# Multi-value fields use the standard DSpace "||" separator
+MULTI_VALUE = r"\|\|"
+
+# Anything that isn't ASCII, which is a precondition for decomposed Unicode
+# and for mojibake.
+NON_ASCII = r"[^\x00-\x7f]"
+
+# Statistics of the values of a column, from a cheap pre-scan with Arrow
+# compute functions before any check or fix runs:
+#
+#   - rows: number of rows
+#   - values: number of values that are not missing
+#   - distinct: number of distinct values
+#   - null_ratio: share of rows with a missing value
+#   - distinct_ratio: number of distinct values per value
+#   - multi_value_ratio: share of values with the "||" separator
+#   - non_ascii_ratio: share of values with characters that aren't ASCII
+#   - average_length: average number of characters per value
+#   - dictionary: whether the column is dictionary-encoded
+#   - screens: set of the screens (RE2 regexes, see pipeline.Stage) that at
+#     least one value matches
+ColumnStats = namedtuple(
+    "ColumnStats",
+    [
+        "rows",
+        "values",
+        "distinct",
+        "null_ratio",
+        "distinct_ratio",
+        "multi_value_ratio",
+        "non_ascii_ratio",
+        "average_length",
+        "dictionary",
+        "screens",
+    ],
+)
+
+
+def column_array(series):
+    """Get the values of a Series as an Arrow array. Columns that are backed by
+    pyarrow already (see fileio.to_pandas()) are not copied, and categoricals
+    become dictionary arrays.
+
+    Return an Arrow array, or None if the column has values that aren't
+    strings and can't be converted.
+    """
+
+    try:
+        array = pa.array(series, from_pandas=True)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        return None
+
+    if pa.types.is_dictionary(array.type):
+        if pa.types.is_string(array.type.value_type):
+            return array
+
+        return array.cast(pa.string())
+
+    if pa.types.is_string(array.type) or pa.types.is_large_string(array.type):
+        return array
+
+    # Missing values in an object column are read as a null array
+    try:
+        return array.cast(pa.string())
+    except (pa.ArrowInvalid, pa.ArrowNotImplementedError):
+        return None
+
+
+def scan_column(array, screens=()):
+    """Compute the statistics of the values of a column, and check which of the
+    given screens at least one value matches. Dictionary-encoded columns are
+    scanned through their dictionary, so each distinct value is only matched
+    once and counted as often as the rows use it.
+
+    Return a ColumnStats.
+    """
+
+    rows = len(array)
+    values = rows - array.null_count
+
+    if pa.types.is_dictionary(array.type):
+        combined = (
+            array.combine_chunks() if isinstance(array, pa.ChunkedArray) else array
+        )
+        indices = combined.indices.drop_null().to_numpy()
+
+        # How many rows use each value of the dictionary
+        occurrences = np.bincount(indices, minlength=len(combined.dictionary))
+
+        distinct = int(np.count_nonzero(occurrences))
+        lengths = pc.utf8_length(combined.dictionary).to_numpy(zero_copy_only=False)
+        total_length = int(np.sum(occurrences * np.nan_to_num(lengths)))
+
+        def count_matches(pattern):
+            mask = pc.match_substring_regex(combined.dictionary, pattern)
+            mask = mask.to_numpy(zero_copy_only=False).astype(bool)
+
+            return int(np.sum(occurrences[mask]))
+
+    else:
+        distinct = pc.count_distinct(array).as_py()
+        total_length = pc.sum(pc.utf8_length(array)).as_py() or 0
+
+        def count_matches(pattern):
+            return pc.sum(pc.match_substring_regex(array, pattern)).as_py() or 0
+
+    # Each regex is only matched once, even if it is used for several things
+    counts = {}
+
+    def count(pattern):
+        if pattern not in counts:
+            counts[pattern] = count_matches(pattern)
+
+        return counts[pattern]
+
+    def ratio(number, total):
+        return number / total if total else 0.0
+
+    return ColumnStats(
+        rows=rows,
+        values=values,
+        distinct=distinct,
+        null_ratio=ratio(rows - values, rows),
+        distinct_ratio=ratio(distinct, values),
+        multi_value_ratio=ratio(count(MULTI_VALUE), values),
+        non_ascii_ratio=ratio(count(NON_ASCII), values),
+        average_length=ratio(total_length, values),
+        dictionary=pa.types.is_dictionary(array.type),
+        screens=frozenset(screen for screen in screens if count(screen) > 0),
+    )
@@ -0,0 +1,286 @@
+# SPDX-License-Identifier: GPL-3.0-only
+
+import argparse
+import base64
+import json
+import os
+import signal
+import socketserver
+import sys
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import csv_metadata_quality.api as api
+import csv_metadata_quality.fileio as fileio
+import csv_metadata_quality.util as util
+from csv_metadata_quality.version import VERSION
+
+# Options that are switched on or off, as opposed to the ones that take a value
+BOOLEAN_OPTIONS = {
+    "drop_invalid_agrovoc",
+    "experimental_checks",
+    "lenient_citations",
+    "unsafe_fixes",
+}
+
+# Options that clients can set other than the boolean ones. Only options that
+# choose the checks and fixes are allowed, not the ones that name files on the
+# server, like incremental, checkpoint, and config, or the ones that change
+# what is returned, like check_only.
+STRING_OPTIONS = {
+    "agrovoc_fields",
+    "checks",
+    "exclude_fields",
+    "skip_checks",
+}
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(
+        prog="csv-metadata-quality serve",
+        description="Keep a warm CSV Metadata Quality process running and check files sent to it over HTTP.",
+    )
+    parser.add_argument(
+        "--host",
+        help="Address to listen on for HTTP. Default: 127.0.0.1.",
+        default="127.0.0.1",
+    )
+    parser.add_argument(
+        "--port",
+        "-p",
+        help="Port to listen on for HTTP. Default: 8000.",
+        default=8000,
+        type=int,
+    )
+    parser.add_argument(
+        "--socket",
+        "-s",
+        help="Path to a Unix socket to listen on instead of a TCP port.",
+    )
+    parser.add_argument(
+        "--workers",
+        "-w",
+        help="Number of files to process at the same time. Default: number of CPUs.",
+        default=os.cpu_count(),
+        type=int,
+    )
+
+    return parser.parse_args(argv)
+
+
+def parse_options(query):
+    """Parse the options for the checks and fixes from a query string, using the
+    same names as the command line options, for example:
+
+        unsafe_fixes=1&agrovoc_fields=dcterms.subject
+
+    Other options are ignored, see STRING_OPTIONS.
+
+    Return a dictionary of options.
+    """
+
+    options = {}
+
+    for option, values in parse_qs(query).items():
+        if option in BOOLEAN_OPTIONS:
+            options[option] = values[-1].lower() in ("1", "true", "yes")
+        elif option in STRING_OPTIONS:
+            options[option] = values[-1]
+
+    return options
+
+
+def process_payload(payload, filename, options):
+    """Run all checks and fixes on the contents of a file.
+
+    The format of the file is detected from its name, just like on the command
+    line. The file is written to a temporary directory so that we can read it
+    with the same code as on the command line, including memory mapping Arrow
+    IPC files.
+
+    Return a tuple of the fixed file's contents and the findings.
+    """
+
+    file_format = fileio.detect_format(filename)
+
+    with tempfile.TemporaryDirectory() as directory:
+        # Keep the file's name so that compressed files are written compressed
+        # again.
+        name = os.path.basename(filename)
+        input_path = os.path.join(directory, f"input-{name}")
+        output_path = os.path.join(directory, f"output-{name}")
+
+        with open(input_path, "wb") as f:
+            f.write(payload)
+
+        if file_format == "feather":
+            df = fileio.read_table(input_path)
+        else:
+            df = fileio.read(input_path, file_format)
+
+        df, findings = api.process(df, options)
+
+        fileio.write(df, output_path, file_format)
+
+        with open(output_path, "rb") as f:
+            data = f.read()
+
+    # Row labels are NumPy integers when they come from a DataFrame
+    findings = [(None if row is None else int(row), line) for row, line in findings]
+
+    return data, findings
+
+
+class RequestHandler(BaseHTTPRequestHandler):
+    """Handle requests to check files.
+
+    POST /process with the contents of a file as the body and its name and the
+    options as query parameters, for example:
+
+        POST /process?filename=export.csv&unsafe_fixes=1
+
+    The response is a JSON object with the findings as a list of [row, line]
+    pairs and the fixed file. Text files are returned as is and binary files
+    (Parquet, Feather, Excel, and compressed CSV) are base64 encoded.
+
+    GET /health returns the version, which is useful to check that the server
+    is up.
+    """
+
+    server_version = f"csv-metadata-quality/{VERSION}"
+
+    def do_GET(self):
+        if urlsplit(self.path).path != "/health":
+            return self.send_json(404, {"error": "Not found"})
+
+        self.send_json(200, {"status": "ok", "version": VERSION})
+
+    def do_POST(self):
+        url = urlsplit(self.path)
+        if url.path != "/process":
+            return self.send_json(404, {"error": "Not found"})
+
+        query = parse_qs(url.query)
+        filename = query.get("filename", ["input.csv"])[-1]
+        options = parse_options(url.query)
+
+        length = int(self.headers.get("Content-Length", 0))
+        payload = self.rfile.read(length)
+
+        # Hand the work to the worker pool so that the number of files being
+        # processed at the same time is limited, no matter how many clients
+        # are connected.
+        future = self.server.executor.submit(
+            process_payload, payload, filename, options
+        )
+
+        try:
+            data, findings = future.result()
+        except Exception as e:
+            return self.send_json(400, {"error": f"{type(e).__name__}: {e}"})
+
+        if (
+            fileio.detect_format(filename) == "csv"
+            and fileio.detect_compression(filename, sniff=False) is None
+        ):
+            encoding = "utf-8"
+            data = data.decode("utf-8")
+        else:
+            encoding = "base64"
+            data = base64.b64encode(data).decode("ascii")
+
+        self.send_json(200, {"findings": findings, "data": data, "encoding": encoding})
+
+    def send_json(self, status, body):
+        body = json.dumps(body).encode("utf-8")
+
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def address_string(self):
+        # Clients connecting over a Unix socket don't have an address
+        if isinstance(self.client_address, tuple):
+            return super().address_string()
+
+        return "unix"
+
+    def log_message(self, format, *args):
+        sys.stderr.write(f"{self.address_string()} - {format % args}\n")
+
+
+class UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """HTTP server listening on a Unix socket.
+
+    HTTPServer.server_bind() looks up the host name of the address, which does
+    not make sense for a socket path, so we use the plain socketserver one.
+    """
+
+    daemon_threads = True
+
+
+def signal_handler(signal, frame):
+    sys.exit(0)
+
+
+def warm_up():
+    """Load everything that is expensive to set up before the first request
+    arrives instead of while a client is waiting."""
+
+    util.spdx_licenses()
+    util.country_converter()
+    util.language_identifier()
+    util.agrovoc_session()
+    util.agrovoc_cache()
+
+
+def create_server(args):
+    """Create an HTTP server listening on a TCP port or a Unix socket, with a
+    pool of workers for processing files.
+
+    Return the server.
+    """
+
+    if args.socket:
+        # Remove a stale socket from a previous run
+        if os.path.exists(args.socket):
+            os.unlink(args.socket)
+
+        server = UnixHTTPServer(args.socket, RequestHandler)
+    else:
+        server = ThreadingHTTPServer((args.host, args.port), RequestHandler)
+
+    server.executor = ThreadPoolExecutor(max_workers=args.workers)
+
+    return server
+
+
+def run(argv):
+    args = parse_args(argv)
+
+    # Shut down cleanly on SIGTERM so that the Unix socket is removed
+    signal.signal(signal.SIGTERM, signal_handler)
+
+    warm_up()
+
+    server = create_server(args)
+
+    if args.socket:
+        print(f"Listening on {args.socket}", file=sys.stderr)
+    else:
+        print(f"Listening on http://{args.host}:{args.port}", file=sys.stderr)
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        server.executor.shutdown()
+
+        if args.socket and os.path.exists(args.socket):
+            os.unlink(args.socket)
@@ -0,0 +1,290 @@
+# SPDX-License-Identifier: GPL-3.0-only
+
+import argparse
+import json
+import os
+import sys
+
+import pyarrow as pa
+from colorama import Fore
+
+import csv_metadata_quality.batch as batch
+import csv_metadata_quality.fileio as fileio
+import csv_metadata_quality.incremental as incremental
+import csv_metadata_quality.pipeline as pipeline
+from csv_metadata_quality.findings import Recorder, recording
+from csv_metadata_quality.version import VERSION
+
+# File extensions of the shards for each format
+EXTENSIONS = {
+    "csv": ".csv",
+    "parquet": ".parquet",
+    "feather": ".arrow",
+    "xlsx": ".xlsx",
+}
+
+
+def parse_shard_args(argv):
+    parser = argparse.ArgumentParser(
+        prog="csv-metadata-quality shard",
+        description="Split a file into shards of rows that can be checked on different machines and put back together with csv-metadata-quality merge.",
+    )
+    parser.add_argument(
+        "--input-file",
+        "-i",
+        help="Path to input file.",
+        required=True,
+    )
+    parser.add_argument(
+        "--output-directory",
+        "-o",
+        help="Path to the directory to write the shards and the manifest to.",
+        required=True,
+    )
+    parser.add_argument(
+        "--shards",
+        "-n",
+        help="Number of shards.",
+        required=True,
+        type=int,
+    )
+
+    return parser.parse_args(argv)
+
+
+def parse_merge_args(argv):
+    parser = argparse.ArgumentParser(
+        prog="csv-metadata-quality merge",
+        description="Put the fixed shards of a file back together in the original order and check for duplicate items across all shards.",
+    )
+    parser.add_argument(
+        "--manifest",
+        "-m",
+        help="Path to the manifest.json written by csv-metadata-quality shard.",
+        required=True,
+    )
+    parser.add_argument(
+        "--output-file",
+        "-o",
+        help="Path to output file.",
+        required=True,
+    )
+
+    return parser.parse_args(argv)
+
+
+def shard(path, output_directory, count):
+    """Split a file into contiguous shards of rows and write a manifest with
+    the position of each shard's first row in the original file, which is how
+    rows keep the same ids across shards.
+
+    Each shard has an input file, and the names of the fixed output file and
+    the state file that csv-metadata-quality should write for it, for example:
+
+        csv-metadata-quality -i shard-0.csv -o shard-0-fixed.csv --shard-state shard-0-state.json
+
+    Return the manifest.
+    """
+
+    file_format = fileio.detect_format(path)
+    table = fileio.read_arrow(path, file_format)
+
+    os.makedirs(output_directory, exist_ok=True)
+
+    extension = EXTENSIONS[file_format]
+    rows_per_shard = -(-table.num_rows // count) if table.num_rows else 0
+
+    shards = []
+    for number in range(count):
+        offset = min(number * rows_per_shard, table.num_rows)
+        rows = min(rows_per_shard, table.num_rows - offset)
+
+        entry = {
+            "input": f"shard-{number}{extension}",
+            "output": f"shard-{number}-fixed{extension}",
+            "state": f"shard-{number}-state.json",
+            "offset": offset,
+            "rows": rows,
+        }
+
+        fileio.write_table(
+            table.slice(offset, rows),
+            os.path.join(output_directory, entry["input"]),
+            file_format,
+        )
+
+        shards.append(entry)
+
+    manifest = {
+        "version": VERSION,
+        "columns": table.column_names,
+        "rows": table.num_rows,
+        "shards": shards,
+    }
+
+    with open(os.path.join(output_directory, "manifest.json"), "w") as f:
+        json.dump(manifest, f, indent=2)
+
+    return manifest
+
+
+def without_duplicate_items(plan):
+    """Add a rule to a plan so that duplicate identifiers and duplicate items
+    are not checked, because in a shard we only see some of the items. The
+    merge subcommand checks them across all shards instead.
+
+    Return a Plan.
+    """
+
+    names = {stage.name for stage in pipeline.DUPLICATE_IDENTIFIER_STAGES}
+    names.add(pipeline.DUPLICATE_ITEMS_STAGE.name)
+
+    return pipeline.Plan(plan.rules + [pipeline.Rule(None, None, names)], {})
+
+
+def save_state(path, df, findings, check_duplicates, identifier_entries=()):
+    """Save what the merge subcommand needs to know about a shard: the number
+    of rows, the findings, the keys of the identifiers from pipeline.
+    identifier_entries() for the checks for duplicate identifiers, and the
+    duplicate keys of the items if duplicate items should be checked."""
+
+    entries = batch.duplicate_entries(df) if check_duplicates else None
+    rows = len(df) if not isinstance(df, pa.Table) else df.num_rows
+
+    state = {
+        "version": VERSION,
+        "rows": rows,
+        "findings": [
+            [None if row is None else int(row), line] for row, line in findings
+        ],
+        "identifiers": sorted(
+            incremental.identifier_keys(identifier_entries, range(rows)).items()
+        ),
+        "duplicates": None,
+    }
+
+    if entries is not None:
+        title_column_name, items = entries
+        state["duplicates"] = {
+            "title_column": title_column_name,
+            "items": [list(item) for item in items],
+        }
+
+    with open(path, "w", encoding="UTF-8") as f:
+        json.dump(state, f)
+
+
+def merge(manifest_path, output_path):
+    """Put the fixed shards back together in the original order, print the
+    findings of all shards with the rows of the original file, and check for
+    duplicate identifiers and duplicate items across all shards.
+
+    Raises a ValueError if a shard doesn't have the number of rows that the
+    manifest says it should have.
+
+    Return a list of (row, line) tuples of the findings, where row is the
+    position of the row in the original file, or None if the line is not
+    about a particular row.
+    """
+
+    directory = os.path.dirname(manifest_path)
+
+    with open(manifest_path) as f:
+        manifest = json.load(f)
+
+    tables = []
+    findings = []
+    general_findings = set()
+    duplicates_index = incremental.duplicate_index()
+    identifiers = []
+    duplicates = []
+
+    for entry in manifest["shards"]:
+        with open(os.path.join(directory, entry["state"]), encoding="UTF-8") as f:
+            state = json.load(f)
+
+        table = fileio.read_arrow(os.path.join(directory, entry["output"]))
+
+        if table.num_rows != entry["rows"] or state["rows"] != entry["rows"]:
+            raise ValueError(
+                f"{entry['output']} has {table.num_rows} rows, expected {entry['rows']}"
+            )
+
+        # Shards can be in formats that don't only have string columns
+        tables.append(
+            table.cast(pa.schema([(name, pa.string()) for name in table.column_names]))
+        )
+
+        for row, line in state["findings"]:
+            # Findings that are not about a row, like skipped columns, are the
+            # same in every shard.
+            if row is None:
+                if line in general_findings:
+                    continue
+
+                general_findings.add(line)
+            else:
+                # Rows are numbered from the start of each shard
+                row += entry["offset"]
+
+            print(line)
+            findings.append((row, line))
+
+        # Identifiers are stored with the rows of the shard
+        for row, row_keys in state.get("identifiers", []):
+            identifiers.append((row + entry["offset"], row_keys))
+
+        if state["duplicates"] is not None:
+            title_column_name = state["duplicates"]["title_column"]
+
+            for title, _ in incremental.find_duplicates(
+                state["duplicates"]["items"], duplicates_index
+            ):
+                duplicates.append(
+                    f"{Fore.YELLOW}Possible duplicate ({title_column_name}): {Fore.RESET}{title}"
+                )
+
+    recorder = Recorder(stream=None)
+    with recording(recorder):
+        pipeline.duplicate_identifiers(
+            incremental.identifier_entries(identifiers, manifest["columns"]),
+            recorder,
+        )
+
+    for row, line in recorder.findings:
+        print(line)
+        findings.append((row, line))
+
+    for line in duplicates:
+        print(line)
+        findings.append((None, line))
+
+    fileio.write_table(pa.concat_tables(tables), output_path)
+
+    return findings
+
+
+def run_shard(argv):
+    args = parse_shard_args(argv)
+
+    if args.shards < 1:
+        sys.exit("Error: the number of shards must be at least 1")
+
+    manifest = shard(args.input_file, args.output_directory, args.shards)
+
+    print(
+        f"Wrote {len(manifest['shards'])} shards of {manifest['rows']} rows to {args.output_directory}"
+    )
+
+    sys.exit(0)
+
+
+def run_merge(argv):
+    args = parse_merge_args(argv)
+
+    try:
+        merge(args.manifest, args.output_file)
+    except (OSError, ValueError) as e:
+        sys.exit(f"Error: {e}")
+
+    sys.exit(0)
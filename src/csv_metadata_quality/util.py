@@ -3,8 +3,20 @@
 
 import json
 import os
+from datetime import timedelta
+from functools import lru_cache
 
+import country_converter as coco
 from ftfy.badness import is_bad
+from py3langid.langid import MODEL_FILE, LanguageIdentifier
+
+from csv_metadata_quality.agrovoc import (
+    CACHE_TTL_DAYS,
+    RETRIES,
+    TermCache,
+    cache_path,
+    session,
+)
 
 
 def is_nfc(field):
@@ -23,6 +35,25 @@ def is_nfc(field):
     return field == normalize("NFC", field)
 
 
+def comparison_form(field):
+    """Utility function to bring a string into a form where differences in
+    accents, case, and whitespace don't matter, for comparing titles with
+    citations: the accents are removed after compatibility decomposition
+    (NFKD), the string is case folded, and runs of whitespace are collapsed
+    into a single space.
+
+    Return string.
+    """
+
+    from unicodedata import combining, normalize
+
+    field = "".join(
+        character for character in normalize("NFKD", field) if not combining(character)
+    )
+
+    return " ".join(field.casefold().split())
+
+
 def is_mojibake(field):
     """Determines whether a string contains mojibake.
 
@@ -63,3 +94,70 @@ def load_spdx_licenses():
 
     # List comprehension to extract the license ID for each license
     return [license["licenseId"] for license in licenses["licenses"]]
+
+
+# The functions below load data or models that are expensive to set up and are
+# only ever read afterwards, so we load them once per process and keep them
+# warm for the next file when we are used as a library in a long-running
+# service.
+
+
+@lru_cache(maxsize=None)
+def spdx_licenses():
+    """Returns a frozen set of SPDX short license identifiers."""
+
+    return frozenset(load_spdx_licenses())
+
+
+@lru_cache(maxsize=None)
+def country_converter():
+    """Returns a shared CountryConverter() object, which loads the country data
+    when it is instantiated."""
+
+    return coco.CountryConverter()
+
+
+@lru_cache(maxsize=None)
+def language_identifier():
+    """Returns a shared langid language identifier.
+
+    We use our own identifier rather than the module-level one in py3langid so
+    that restricting the languages does not affect anyone else in the process.
+    The detection space is restricted to reduce false positives.
+    """
+
+    identifier = LanguageIdentifier.from_model_file(MODEL_FILE, norm_probs=False)
+    identifier.set_languages(
+        ["ar", "de", "en", "es", "fr", "hi", "it", "ja", "ko", "pt", "ru", "vi", "zh"]
+    )
+
+    return identifier
+
+
+@lru_cache(maxsize=None)
+def agrovoc_session():
+    """Returns a requests session for the AGROVOC REST API, which keeps the
+    connections open between requests. Responses are not cached, whether a
+    term is valid is remembered by the term cache instead. Failed requests are
+    retried the number of times set by the AGROVOC_RETRIES environment
+    variable, or three times by default.
+    """
+
+    return session(retries=int(os.environ.get("AGROVOC_RETRIES", RETRIES)))
+
+
+@lru_cache(maxsize=None)
+def agrovoc_cache(cache_dir=None):
+    """Returns the cache of whether terms are valid AGROVOC terms.
+
+    The cache is stored in the directory set by the REQUESTS_CACHE_DIR environ-
+    ment variable, or the current working directory by default, just in case
+    we are running in an environment where we can't write to the current
+    working directory (for example from csv-metadata-quality-web). Entries
+    expire after the number of days set by the AGROVOC_CACHE_TTL environment
+    variable, or thirty days by default.
+    """
+
+    ttl = timedelta(days=float(os.environ.get("AGROVOC_CACHE_TTL", CACHE_TTL_DAYS)))
+
+    return TermCache(cache_path(cache_dir), ttl.total_seconds())
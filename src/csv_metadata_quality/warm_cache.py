@@ -0,0 +1,102 @@
+# SPDX-License-Identifier: GPL-3.0-only
+
+import argparse
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+import csv_metadata_quality.fileio as fileio
+import csv_metadata_quality.util as util
+from csv_metadata_quality.agrovoc import validate
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(
+        prog="csv-metadata-quality warm-agrovoc-cache",
+        description="Look up AGROVOC terms ahead of time so that checks with --agrovoc-fields only use the cache.",
+    )
+    parser.add_argument(
+        "files",
+        help="Text files with one term per line, or CSV, Parquet, Feather, or Excel files to read the --agrovoc-fields from.",
+        nargs="*",
+    )
+    parser.add_argument(
+        "--agrovoc-fields",
+        "-a",
+        help="Comma-separated list of fields to read terms from in CSV, Parquet, Feather, or Excel files, for example: dcterms.subject,cg.coverage.country",
+    )
+    parser.add_argument(
+        "--prune",
+        help="Remove cache entries that are older than the TTL.",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--workers",
+        "-w",
+        help="Number of terms to look up at the same time. Default: 4.",
+        default=4,
+        type=int,
+    )
+
+    return parser.parse_args(argv)
+
+
+def read_terms(path, fields):
+    """Read the terms to look up from a text file with one term per line, or
+    from the values of the given fields in a file of metadata.
+
+    Return a set of terms.
+    """
+
+    if path.lower().endswith(".txt"):
+        with open(path, encoding="utf-8") as f:
+            return {line.strip() for line in f if line.strip()}
+
+    # Only read the header or schema to find the columns
+    columns = [column for column in fileio.column_names(path) if column in fields]
+
+    terms = set()
+    if not columns:
+        return terms
+
+    for column in fileio.read_arrow(path, columns=columns).itercolumns():
+        for field in column.drop_null().unique().to_pylist():
+            terms.update(value for value in field.split("||") if value)
+
+    return terms
+
+
+def run(argv):
+    args = parse_args(argv)
+
+    cache = util.agrovoc_cache()
+
+    if args.prune:
+        print(f"Removed {cache.prune()} expired terms from the AGROVOC cache")
+
+    fields = args.agrovoc_fields.split(",") if args.agrovoc_fields else []
+
+    terms = set()
+    for path in args.files:
+        try:
+            terms |= read_terms(path, fields)
+        except (OSError, ValueError) as e:
+            sys.exit(f"Error: {e}")
+
+    missing = sorted(term for term in terms if cache.get(term) is None)
+
+    def lookup(term):
+        try:
+            return validate(term, cache, util.agrovoc_session())
+        except requests.RequestException:
+            return None
+
+    with ThreadPoolExecutor(max_workers=args.workers) as executor:
+        results = list(executor.map(lookup, missing))
+
+    print(
+        f"Looked up {len(missing)} of {len(terms)} terms: {results.count(True)} valid, {results.count(False)} invalid, {results.count(None)} failed"
+    )
+
+    sys.exit(0)
@@ -0,0 +1,32 @@
+# SPDX-License-Identifier: GPL-3.0-only
+
+import threading
+
+import pytest
+
+import csv_metadata_quality.util as util
+from csv_metadata_quality.agrovoc_server import AGROVOCServer
+
+
+@pytest.fixture
+def agrovoc_server(request, monkeypatch, tmp_path):
+    """Run a local stand-in for the AGROVOC REST API for the duration of a test
+    and point AGROVOC_URL and the term cache at it. Tests can pass options for
+    the server with @pytest.mark.parametrize("agrovoc_server", [{...}],
+    indirect=True).
+    """
+
+    httpd = AGROVOCServer(("127.0.0.1", 0), **getattr(request, "param", {}))
+    thread = threading.Thread(target=httpd.serve_forever, args=(0.05,))
+    thread.start()
+
+    monkeypatch.setenv("AGROVOC_URL", httpd.url)
+    monkeypatch.setenv("REQUESTS_CACHE_DIR", str(tmp_path))
+    util.agrovoc_cache.cache_clear()
+
+    yield httpd
+
+    util.agrovoc_cache.cache_clear()
+    httpd.shutdown()
+    httpd.server_close()
+    thread.join()
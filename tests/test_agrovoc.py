@@ -0,0 +1,136 @@
+# SPDX-License-Identifier: GPL-3.0-only
+
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from colorama import Fore
+
+import csv_metadata_quality.agrovoc as agrovoc
+import csv_metadata_quality.check as check
+
+
+def test_agrovoc_term_cache(tmp_path):
+    """Test remembering whether terms are valid, with entries expiring after
+    the TTL."""
+
+    path = str(tmp_path / "agrovoc-term-cache.sqlite")
+
+    cache = agrovoc.TermCache(path, ttl=60)
+
+    assert cache.get("FOREST") is None
+
+    cache.set("FOREST", False)
+    cache.set("FORESTS", True)
+
+    assert cache.get("FOREST") is False
+    assert cache.get("FORESTS") is True
+
+    # Entries are ignored and can be removed once they are older than the TTL
+    expired_cache = agrovoc.TermCache(path, ttl=0)
+
+    assert expired_cache.get("FORESTS") is None
+    assert expired_cache.prune() == 2
+    assert cache.get("FORESTS") is None
+
+
+def test_agrovoc_term_cache_concurrent(tmp_path):
+    """Test writing to the same cache from several threads and connections at
+    the same time."""
+
+    path = str(tmp_path / "agrovoc-term-cache.sqlite")
+
+    caches = [agrovoc.TermCache(path, ttl=60) for _ in range(2)]
+
+    def write(number):
+        caches[number % 2].set(f"term {number}", number % 3 == 0)
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        list(executor.map(write, range(200)))
+
+    assert [caches[0].get(f"term {number}") for number in range(200)] == [
+        number % 3 == 0 for number in range(200)
+    ]
+
+
+def test_agrovoc_check_local_server(agrovoc_server, capsys):
+    """Test checking AGROVOC terms against the local stand-in, with terms that
+    were checked before coming from the cache."""
+
+    value = "LIVESTOCK||FOREST"
+    field_name = "dcterms.subject"
+
+    for _ in range(2):
+        assert check.agrovoc(value, field_name, False) == value
+
+        captured = capsys.readouterr()
+        assert (
+            captured.out
+            == f"{Fore.RED}Invalid AGROVOC ({field_name}): {Fore.RESET}FOREST\n"
+        )
+
+    assert agrovoc_server.requests == {"LIVESTOCK": 1, "FOREST": 1}
+
+
+@pytest.mark.parametrize(
+    "agrovoc_server", [{"error_rate": 0.5, "latency": 0.01}], indirect=True
+)
+def test_agrovoc_retries(agrovoc_server, tmp_path):
+    """Test that failed requests are retried, and that requests that still
+    fail are not cached."""
+
+    cache = agrovoc.TermCache(str(tmp_path / "terms.sqlite"), ttl=60)
+    session = agrovoc.session(retries=10, backoff=0)
+
+    terms = [f"TERM {number}" for number in range(20)] + ["LIVESTOCK"]
+
+    assert [agrovoc.validate(term, cache, session) for term in terms] == [
+        False
+    ] * 20 + [True]
+    assert agrovoc_server.statuses[503] > 0
+
+    # Every request fails if there are no retries left
+    agrovoc_server.error_rate = 1
+    session = agrovoc.session(retries=0)
+
+    assert agrovoc.validate("FORESTS", cache, session) is None
+    assert cache.get("FORESTS") is None
+    assert agrovoc_server.requests["FORESTS"] == 1
+
+
+@pytest.mark.parametrize("agrovoc_server", [{"rate_limit": 5}], indirect=True)
+def test_agrovoc_rate_limit(agrovoc_server, tmp_path):
+    """Test that rate limited requests are retried after the time the server
+    asks for."""
+
+    cache = agrovoc.TermCache(str(tmp_path / "terms.sqlite"), ttl=60)
+    session = agrovoc.session(retries=3, backoff=0)
+
+    terms = [f"TERM {number}" for number in range(8)]
+
+    start = time.monotonic()
+    results = [agrovoc.validate(term, cache, session) for term in terms]
+
+    assert results == [False] * 8
+    assert agrovoc_server.statuses[429] > 0
+    assert time.monotonic() - start >= 1
+
+
+@pytest.mark.parametrize("agrovoc_server", [{"latency": 0.05}], indirect=True)
+def test_agrovoc_concurrent_lookups(agrovoc_server, tmp_path):
+    """Test looking up terms from several threads with one session and one
+    cache, with every term looked up only once."""
+
+    cache = agrovoc.TermCache(str(tmp_path / "terms.sqlite"), ttl=60)
+    session = agrovoc.session(backoff=0)
+
+    terms = [f"TERM {number}" for number in range(40)] + ["FORESTS", "KENYA"]
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        results = list(
+            executor.map(lambda term: agrovoc.validate(term, cache, session), terms)
+        )
+
+    assert results == [False] * 40 + [True, True]
+    assert sum(agrovoc_server.requests.values()) == len(terms)
+    assert agrovoc_server.statuses == {200: len(terms)}
@@ -0,0 +1,221 @@
+# SPDX-License-Identifier: GPL-3.0-only
+
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+import pyarrow as pa
+import pytest
+from colorama import Fore
+
+import csv_metadata_quality.api as api
+from csv_metadata_quality.findings import BudgetExceeded
+
+
+def test_api_process():
+    """Test processing a DataFrame and getting the findings for each row."""
+
+    d = {
+        "dc.title": ["Title", "Title  with spaces"],
+        "dcterms.issued": ["2019", "2019-13"],
+    }
+    df = pd.DataFrame(data=d)
+
+    fixed_df, findings = api.process(df, {"unsafe_fixes": True})
+
+    assert fixed_df.loc[1, "dc.title"] == "Title with spaces"
+    assert (
+        1,
+        f"{Fore.RED}Invalid date (dcterms.issued): {Fore.RESET}2019-13",
+    ) in findings
+
+    # The input DataFrame is not modified
+    assert df.loc[1, "dc.title"] == "Title  with spaces"
+
+
+def test_api_process_threads():
+    """Test that findings from files processed in different threads are kept
+    separate."""
+
+    def process(date):
+        df = pd.DataFrame(data={"dcterms.issued": [date] * 100})
+
+        return api.process(df, api.options(exclude_fields="dc.title"))[1]
+
+    dates = [f"2019-{month}" for month in range(13, 21)]
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        results = list(executor.map(process, dates))
+
+    for date, findings in zip(dates, results):
+        assert findings == [
+            (row, f"{Fore.RED}Invalid date (dcterms.issued): {Fore.RESET}{date}")
+            for row in range(100)
+        ]
+
+
+def test_api_process_batches():
+    """Test processing batches of rows, with rows numbered and duplicate items
+    found across batches."""
+
+    d = {
+        "dc.title": ["Title", "Other title", "Title"],
+        "dcterms.type": ["Report", "Report", "Report"],
+        "dcterms.issued": ["2019", "2019-13", "2019"],
+        "dc.description": ["One", "Two", "Three"],
+    }
+    table = pa.Table.from_pandas(pd.DataFrame(data=d), preserve_index=False)
+
+    results = list(
+        api.process_batches(
+            table.to_batches(max_chunksize=2),
+            api.options(exclude_fields="dc.description"),
+        )
+    )
+
+    assert [len(df) for df, findings in results] == [2, 1]
+    assert results[1][0].index.tolist() == [2]
+
+    # Skipped columns are only reported once
+    assert results[0][1] == [
+        (1, f"{Fore.RED}Invalid date (dcterms.issued): {Fore.RESET}2019-13"),
+        (None, f"{Fore.YELLOW}Skipping {Fore.RESET}dc.description"),
+    ]
+    assert results[1][1] == [
+        (None, f"{Fore.YELLOW}Possible duplicate (dc.title): {Fore.RESET}Title"),
+    ]
+
+
+def test_api_process_batches_order():
+    """Test that the findings of a batch are in the same order as in a full
+    run, with duplicate items before the checks on rows."""
+
+    d = {
+        "dc.title": ["Title", "Other title", "Title"],
+        "dcterms.type": ["Report", "Report", "Report"],
+        "dcterms.issued": ["2019", "2019-13", "2019"],
+        "dcterms.bibliographicCitation": ["Citation", None, "Citation"],
+    }
+    df = pd.DataFrame(data=d)
+    table = pa.Table.from_pandas(df, preserve_index=False)
+
+    results = list(api.process_batches(table.to_batches()))
+
+    assert results[0][1] == api.process(df)[1]
+    assert "Possible duplicate" in results[0][1][1][1]
+
+
+def test_api_process_incremental(tmp_path):
+    """Test that findings replayed from the state file of an incremental run
+    keep their rows and come in the same order as in a full run."""
+
+    d = {
+        "dc.title": ["Title  one", "Title two", "Title three "],
+        "dcterms.issued": ["2019-13", "2019", "2020"],
+    }
+    df = pd.DataFrame(data=d, index=[10, 11, 12])
+    options = api.options(incremental=str(tmp_path / "state.json"))
+
+    api.process(df, options)
+
+    # Change the last row so that its findings are new and those of the other
+    # rows are replayed.
+    df.loc[12, "dcterms.issued"] = "2020-13"
+
+    findings = api.process(df, options)[1]
+
+    assert findings == api.process(df)[1]
+    assert findings[-1] == (
+        12,
+        f"{Fore.RED}Invalid date (dcterms.issued): {Fore.RESET}2020-13",
+    )
+
+
+def test_api_process_duplicate_dois(tmp_path):
+    """Test that DOIs used by more than one item are found across batches of
+    rows and across the unchanged and changed rows of an incremental run."""
+
+    d = {
+        "dc.title": ["One", "Two", "Three"],
+        "cg.identifier.doi": [
+            "https://doi.org/10.1016/j.envc.2023.100794",
+            "https://doi.org/10.11648/j.jps.20140201.14",
+            "http://dx.doi.org/10.1016/j.envc.2023.100794",
+        ],
+    }
+    df = pd.DataFrame(data=d)
+    duplicate = (
+        2,
+        f"{Fore.YELLOW}Possible duplicate DOI: {Fore.RESET}https://doi.org/10.1016/j.envc.2023.100794",
+    )
+
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    results = list(api.process_batches(table.to_batches(max_chunksize=2)))
+
+    assert duplicate in results[1][1]
+
+    options = api.options(incremental=str(tmp_path / "state.json"))
+
+    api.process(df, options)
+
+    # Only the second row changes, so the first and last rows are replayed
+    # and their DOIs come from the state file.
+    df.loc[1, "cg.identifier.doi"] = "10.1016/j.envc.2023.100794"
+
+    findings = api.process(df, options)[1]
+
+    assert findings == api.process(df)[1]
+    assert (
+        1,
+        f"{Fore.YELLOW}Possible duplicate DOI: {Fore.RESET}https://doi.org/10.1016/j.envc.2023.100794",
+    ) in findings
+    assert duplicate in findings
+
+
+def test_api_gate():
+    """Test stopping as soon as there are more findings than the budget."""
+
+    df = pd.DataFrame(
+        data={
+            "dc.title": ["Title  with spaces", "Title"],
+            "dcterms.issued": ["2019 ", "2019-13"],
+        }
+    )
+
+    # The whitespace is fixed before the date is checked, so only the invalid
+    # date counts, and the title isn't checked at all.
+    findings = api.gate(df, {"fail_on": "date", "max_findings": 1})
+
+    assert findings == [
+        (1, f"{Fore.RED}Invalid date (dcterms.issued): {Fore.RESET}2019-13")
+    ]
+
+    with pytest.raises(BudgetExceeded) as excinfo:
+        api.gate(df, {"fail_on": "date"})
+
+    assert excinfo.value.count == 1
+    assert excinfo.value.stage == "date"
+    assert excinfo.value.findings == findings
+
+
+def test_api_process_budget():
+    """Test that process stops as soon as there are more findings than the
+    budget, and carries on as usual within it."""
+
+    df = pd.DataFrame(
+        data={
+            "dc.title": ["Title  with spaces", "Title"],
+            "dcterms.issued": ["2019 ", "2019-13"],
+        }
+    )
+
+    fixed_df, findings = api.process(df, {"fail_on": "date", "max_findings": 1})
+
+    assert fixed_df["dcterms.issued"].tolist() == ["2019", "2019-13"]
+    assert findings == api.process(df)[1]
+
+    for check_only in [False, True]:
+        with pytest.raises(BudgetExceeded) as excinfo:
+            api.process(df, {"fail_on": "date", "check_only": check_only})
+
+        assert excinfo.value.count == 1
+        assert excinfo.value.stage == "date"
@@ -0,0 +1,95 @@
+# SPDX-License-Identifier: GPL-3.0-only
+
+import csv
+
+import pytest
+from colorama import Fore
+
+import csv_metadata_quality.app as app
+import csv_metadata_quality.batch as batch
+
+
+def test_batch_input_paths(tmp_path):
+    """Test finding the files to process in a directory, including compressed
+    ones, and with a glob pattern."""
+
+    for name in ["b.csv", "a.parquet", "c.csv.gz", "notes.txt"]:
+        (tmp_path / name).write_text("")
+
+    assert batch.input_paths(str(tmp_path)) == [
+        str(tmp_path / "a.parquet"),
+        str(tmp_path / "b.csv"),
+        str(tmp_path / "c.csv.gz"),
+    ]
+    assert batch.input_paths(str(tmp_path / "*.csv")) == [str(tmp_path / "b.csv")]
+
+
+def test_batch_duplicates_across_files(tmp_path, capsys):
+    """Test processing a directory of files, where an item in one file is a
+    duplicate of an item in another file."""
+
+    input_directory = tmp_path / "input"
+    input_directory.mkdir()
+
+    header = "dc.title,dcterms.type,dcterms.issued\n"
+    (input_directory / "a.csv").write_text(f"{header}Title,Report,2019\n")
+    (input_directory / "b.csv").write_text(
+        f"{header}Other title,Report,2019\nTitle,Report,2019\n"
+    )
+
+    args = app.parse_args(
+        [
+            "csv-metadata-quality",
+            "-i",
+            str(input_directory),
+            "-o",
+            str(tmp_path / "output"),
+            "--report",
+            str(tmp_path / "report.csv"),
+        ]
+    )
+
+    assert batch.run(args) == 1
+    assert (tmp_path / "output" / "b.csv").read_text() == (
+        f"{header}Other title,Report,2019\nTitle,Report,2019\n"
+    )
+
+    finding = f"{Fore.YELLOW}Possible duplicate (dc.title) of an item in {input_directory / 'a.csv'}: {Fore.RESET}Title"
+    assert finding in capsys.readouterr().out.splitlines()
+
+    with open(tmp_path / "report.csv") as f:
+        rows = list(csv.reader(f))
+
+    assert rows == [
+        ["file", "row", "finding"],
+        [
+            str(input_directory / "b.csv"),
+            "",
+            f"Possible duplicate (dc.title) of an item in {input_directory / 'a.csv'}: Title",
+        ],
+    ]
+
+
+def test_batch_duplicate_names(tmp_path):
+    """Test that files with the same name in different directories are not
+    written to the same file in the output directory."""
+
+    header = "dc.title,dcterms.type,dcterms.issued\n"
+    for directory in ["a", "b"]:
+        (tmp_path / directory).mkdir()
+        (tmp_path / directory / "export.csv").write_text(f"{header}Title,Report,2019\n")
+
+    args = app.parse_args(
+        [
+            "csv-metadata-quality",
+            "-i",
+            str(tmp_path / "*" / "export.csv"),
+            "-o",
+            str(tmp_path / "output"),
+        ]
+    )
+
+    with pytest.raises(SystemExit, match="export.csv"):
+        batch.run(args)
+
+    assert not (tmp_path / "output").exists()
@@ -49,6 +49,59 @@ def test_check_valid_isbn():
     assert result is None
 
 
+def test_check_issn_column():
+    """Test checking all ISSNs of a column at once, including ones in formats
+    that are passed to stdnum."""
+
+    series = pd.Series(
+        [
+            "0024-9319",
+            None,
+            "2321-2302",
+            "0378-5955||0024-931X",
+            "0378\u20135955",
+            "0378-5955||",
+        ]
+    )
+
+    result, outputs = check.issn_column(series)
+
+    assert result is None
+    assert outputs == [
+        "",
+        "",
+        f"{Fore.RED}Invalid ISSN: {Fore.RESET}2321-2302\n",
+        f"{Fore.RED}Invalid ISSN: {Fore.RESET}0024-931X\n",
+        "",
+        f"{Fore.RED}Invalid ISSN: {Fore.RESET}\n",
+    ]
+
+
+def test_check_isbn_column():
+    """Test checking all ISBNs of a column at once."""
+
+    series = pd.Series(
+        [
+            "0-306-40615-2",
+            "978-0-306-40615-6",
+            "9780306406157||9780306406157",
+            None,
+            "99921-58-10-7||978-0-306-40615-6",
+        ]
+    )
+
+    result, outputs = check.isbn_column(series)
+
+    assert result is None
+    assert outputs == [
+        "",
+        f"{Fore.RED}Invalid ISBN: {Fore.RESET}978-0-306-40615-6\n",
+        "",
+        "",
+        f"{Fore.RED}Invalid ISBN: {Fore.RESET}978-0-306-40615-6\n",
+    ]
+
+
 def test_check_missing_date(capsys):
     """Test checking missing date."""
 
@@ -178,7 +231,7 @@ def test_check_invalid_language(capsys):
     assert captured.out == f"{Fore.RED}Invalid language: {Fore.RESET}{value}\n"
 
 
-def test_check_invalid_agrovoc(capsys):
+def test_check_invalid_agrovoc(agrovoc_server, capsys):
     """Test invalid AGROVOC subject. Invalid values *will not* be dropped."""
 
     valid_agrovoc = "LIVESTOCK"
@@ -197,7 +250,7 @@ def test_check_invalid_agrovoc(capsys):
     assert new_value == value
 
 
-def test_check_invalid_agrovoc_dropped(capsys):
+def test_check_invalid_agrovoc_dropped(agrovoc_server, capsys):
     """Test invalid AGROVOC subjects. Invalid values *will* be dropped."""
 
     valid_agrovoc = "LIVESTOCK"
@@ -216,7 +269,7 @@ def test_check_invalid_agrovoc_dropped(capsys):
     assert new_value == valid_agrovoc
 
 
-def test_check_valid_agrovoc():
+def test_check_valid_agrovoc(agrovoc_server):
     """Test valid AGROVOC subject."""
 
     value = "FORESTS"
@@ -472,6 +525,74 @@ def test_title_not_in_citation(capsys):
     )
 
 
+def test_citation_doi_rows():
+    """Test checking all rows for DOIs in citations at once, with and without
+    lenient matching."""
+
+    citations = [
+        "Orth, A. 2021. Testing all the things. doi: 10.1186/1743-422X-9-218",
+        "Orth, A. 2021. Testing all the things. DOI:\n10.1186/1743-422X-9-218",
+        "Orth, A. 2021. Testing all the things. doi: 10.1186/1743-422X-9-218",
+        "Orth, A. 2021. Testing all the things.",
+    ]
+    df = pd.DataFrame(
+        {
+            "cg.identifier.doi": [None, None, "10.1186/1743-422X-9-218", None],
+            "dcterms.bibliographicCitation": citations,
+        }
+    )
+
+    result, outputs = check.citation_doi_rows(df, [])
+
+    assert result is None
+    assert outputs == [
+        f"{Fore.YELLOW}DOI in citation, but missing a DOI field: {Fore.RESET}{citations[0]}\n",
+        "",
+        "",
+        "",
+    ]
+
+    _, outputs = check.citation_doi_rows(df, [], lenient=True)
+
+    assert outputs[1] == (
+        f"{Fore.YELLOW}DOI in citation, but missing a DOI field: {Fore.RESET}{citations[1]}\n"
+    )
+
+
+def test_title_in_citation_rows():
+    """Test checking all rows for titles in citations at once, with and without
+    lenient matching."""
+
+    titles = ["Testing all the things", "Testing  Ñandú things", None]
+    df = pd.DataFrame(
+        {
+            "dc.title": titles,
+            "dcterms.bibliographicCitation": [
+                "Orth, A. 2021. Testing all teh things.",
+                "Orth, A. 2021. Testing nandu\nthings.",
+                "Orth, A. 2021. Testing all the things.",
+            ],
+        }
+    )
+
+    result, outputs = check.title_in_citation_rows(df, [])
+
+    assert result is None
+    assert outputs == [
+        f"{Fore.YELLOW}Title is not present in citation: {Fore.RESET}{titles[0]}\n",
+        f"{Fore.YELLOW}Title is not present in citation: {Fore.RESET}{titles[1]}\n",
+        "",
+    ]
+
+    _, outputs = check.title_in_citation_rows(df, [], lenient=True)
+
+    assert outputs == [
+        f"{Fore.YELLOW}Title is not present in citation: {Fore.RESET}{titles[0]}\n",
+        "",
+        "",
+    ]
+
+
 def test_country_matches_region():
     """Test an item with regions matching its country list."""
 
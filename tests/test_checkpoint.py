@@ -0,0 +1,68 @@
+# SPDX-License-Identifier: GPL-3.0-only
+
+import pandas as pd
+import pytest
+from colorama import Fore
+
+import csv_metadata_quality.api as api
+import csv_metadata_quality.checkpoint as checkpoint
+import csv_metadata_quality.fileio as fileio
+
+
+def test_checkpoint_resume(tmp_path):
+    """Test that resuming loads completed columns and their findings from the
+    checkpoint instead of running the checks and fixes again."""
+
+    d = {
+        "dc.title": ["Title  with spaces", "Title"],
+        "dcterms.issued": ["2019", "2019-13"],
+    }
+    df = pd.DataFrame(data=d)
+    options = api.options(unsafe_fixes=True, checkpoint=str(tmp_path))
+
+    assert not checkpoint.saved(str(tmp_path))
+
+    fixed_df, findings = api.process(df, options)
+
+    assert (tmp_path / "column-0.arrow").exists()
+    assert (tmp_path / "rows-0.json").exists()
+    assert checkpoint.saved(str(tmp_path))
+
+    # Pretend that the date column was fixed differently before
+    fileio.write(
+        pd.DataFrame({"dcterms.issued": ["Checkpoint", "2019-13"]}),
+        str(tmp_path / "column-1.arrow"),
+        "feather",
+    )
+
+    resumed_df, resumed_findings = api.process(df, {**vars(options), "resume": True})
+
+    assert resumed_df["dcterms.issued"].tolist() == ["Checkpoint", "2019-13"]
+    assert resumed_findings == findings
+    assert (
+        1,
+        f"{Fore.RED}Invalid date (dcterms.issued): {Fore.RESET}2019-13",
+    ) in resumed_findings
+
+    # A checkpoint of different data is not used
+    df.loc[1, "dcterms.issued"] = "2020"
+    resumed_df, resumed_findings = api.process(df, {**vars(options), "resume": True})
+
+    assert resumed_df["dcterms.issued"].tolist() == ["2019", "2020"]
+
+    checkpoint.clear(str(tmp_path))
+
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_checkpoint_options(tmp_path):
+    """Test that a checkpoint can't be combined with options that don't save
+    one."""
+
+    df = pd.DataFrame(data={"dc.title": ["Title"]})
+
+    for option in ["check_only", "incremental"]:
+        options = api.options(checkpoint=str(tmp_path), **{option: True})
+
+        with pytest.raises(ValueError):
+            api.process(df, options)
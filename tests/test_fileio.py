@@ -0,0 +1,255 @@
+# SPDX-License-Identifier: GPL-3.0-only
+
+import io
+
+import pandas as pd
+import pytest
+
+import csv_metadata_quality.fileio as fileio
+
+
+def test_fileio_detect_format():
+    """Test detecting file formats from extensions."""
+
+    assert fileio.detect_format("export.csv") == "csv"
+    assert fileio.detect_format("export.parquet") == "parquet"
+    assert fileio.detect_format("export.ARROW") == "feather"
+    assert fileio.detect_format("export.txt") == "csv"
+    assert fileio.detect_format("export.csv.gz") == "csv"
+
+
+def test_fileio_parquet_roundtrip(tmp_path):
+    """Test writing and reading Parquet files."""
+
+    path = str(tmp_path / "test.parquet")
+
+    d = {
+        "dc.title": ["Title", None],
+        "dcterms.issued": ["1998", "2019-07-29"],
+    }
+    df = pd.DataFrame(data=d)
+
+    fileio.write(df, path)
+
+    df = fileio.read(path)
+
+    assert df["dcterms.issued"].tolist() == ["1998", "2019-07-29"]
+    assert pd.isna(df.loc[1, "dc.title"])
+    assert str(df["dc.title"].dtype) == "string[pyarrow]"
+
+
+def test_fileio_feather_columns(tmp_path):
+    """Test reading a subset of columns from a Feather file, where numbers are
+    read as strings."""
+
+    path = str(tmp_path / "test.feather")
+
+    d = {
+        "dc.title": ["Title"],
+        "dcterms.issued": [1998],
+    }
+    pd.DataFrame(data=d).to_feather(path)
+
+    df = fileio.read(path, columns=["dcterms.issued"])
+
+    assert df.columns.tolist() == ["dcterms.issued"]
+    assert df.loc[0, "dcterms.issued"] == "1998"
+
+
+def test_fileio_column_names(tmp_path):
+    """Test reading the column names of files without reading their rows."""
+
+    df = pd.DataFrame(data={"dc.title": ["Title"], "dcterms.subject": ["Soil"]})
+
+    for name in ["test.csv.gz", "test.parquet", "test.arrow"]:
+        path = str(tmp_path / name)
+        fileio.write(df, path)
+
+        assert fileio.column_names(path) == ["dc.title", "dcterms.subject"]
+
+
+def test_fileio_dictionary_encode(tmp_path):
+    """Test dictionary-encoding columns with few distinct values when reading
+    a file into a DataFrame."""
+
+    path = str(tmp_path / "test.csv")
+
+    d = {
+        "dc.title": [f"Title {number}" for number in range(10)],
+        "dcterms.type": ["Report"] * 9 + [None],
+    }
+    pd.DataFrame(data=d).to_csv(path, index=False)
+
+    df = fileio.read(path)
+
+    assert str(df["dc.title"].dtype) == "string[pyarrow]"
+    assert isinstance(df["dcterms.type"].dtype, pd.CategoricalDtype)
+    assert df["dcterms.type"].cat.categories.tolist() == ["Report"]
+    assert pd.isna(df.loc[9, "dcterms.type"])
+
+    assert fileio.to_arrow(df).to_pydict() == d
+
+
+def test_fileio_read_xlsx():
+    """Test reading an Excel file, where numbers and dates are read as strings."""
+
+    pytest.importorskip("openpyxl")
+
+    df = fileio.read("data/test.xlsx")
+
+    assert df.loc[0, "birthdate"] == "1984"
+    assert df.loc[1, "birthdate"] == "1984-11-27"
+    assert df.loc[3, "birthdate"] == "2019-06-150"
+    assert pd.isna(df.loc[2, "dc.identifier.issn"])
+
+
+def test_fileio_xlsx_roundtrip(tmp_path):
+    """Test writing and reading Excel files, where values that look like
+    formulas are kept as strings."""
+
+    pytest.importorskip("openpyxl")
+
+    path = str(tmp_path / "test.xlsx")
+
+    d = {
+        "dc.title": ["=Title", "Title"],
+        "dcterms.issued": ["1998", None],
+    }
+    fileio.write(pd.DataFrame(data=d), path)
+
+    df = fileio.read(path)
+
+    assert df["dc.title"].tolist() == ["=Title", "Title"]
+    assert df.loc[0, "dcterms.issued"] == "1998"
+
+
+def test_fileio_csv_missing_values(tmp_path):
+    """Test that the CSV reader treats the same values as missing as Pandas."""
+
+    path = tmp_path / "test.csv"
+    path.write_text('dc.title,dcterms.issued\nNA,1998\n"",n/a\nTitle,"2019\n07"\n')
+
+    df = fileio.read(str(path))
+
+    assert pd.isna(df.loc[0, "dc.title"])
+    assert pd.isna(df.loc[1, "dc.title"])
+    assert pd.isna(df.loc[1, "dcterms.issued"])
+    assert df.loc[2, "dcterms.issued"] == "2019\n07"
+    assert df.loc[0, "dcterms.issued"] == "1998"
+
+
+def test_fileio_csv_duplicate_columns(tmp_path):
+    """Test that duplicate column names are renamed like Pandas does."""
+
+    path = tmp_path / "test.csv"
+    path.write_text("dc.title,dc.title,dc.title.1,dc.title\nA,B,C,D\n")
+
+    df = fileio.read(str(path))
+
+    assert df.columns.tolist() == [
+        "dc.title",
+        "dc.title.2",
+        "dc.title.1",
+        "dc.title.3",
+    ]
+    assert df.loc[0].tolist() == ["A", "B", "C", "D"]
+
+
+def test_fileio_csv_quoting(tmp_path):
+    """Test that the CSV writer quotes fields the same way as Pandas."""
+
+    d = {
+        "dc.title": ['Title, with "quotes"', "Title", None, "Line\nbreak"],
+        "dcterms.issued": ["1998", "", "2019", None],
+    }
+    df = pd.DataFrame(data=d)
+
+    path = tmp_path / "test.csv"
+    fileio.write(df, str(path), block_size=16)
+
+    assert path.read_text() == df.to_csv(index=False)
+
+    # Python's csv module quotes empty fields when they are alone in a row
+    path = tmp_path / "single.csv"
+    fileio.write(df[["dcterms.issued"]], str(path))
+
+    assert path.read_text() == df[["dcterms.issued"]].to_csv(index=False)
+
+
+def test_fileio_csv_passthrough(tmp_path):
+    """Test copying columns from the input CSV to the output CSV byte for byte,
+    including quoted fields with line breaks and values that would otherwise be
+    read as missing."""
+
+    path = tmp_path / "test.csv"
+    path.write_bytes(
+        b'dc.title,dcterms.issued,dc.description\r\n"Title, ""one""",1998,NA\r\n'
+        b'Title,"2019\n07",""\r\n'
+    )
+
+    df, spans = fileio.read_passthrough(
+        str(path), ["dcterms.issued", "dc.description"], ["dc.description"]
+    )
+
+    assert df["dc.title"].tolist() == ['Title, "one"', "Title"]
+    assert df["dcterms.issued"].tolist() == ["1998", "2019\n07"]
+    assert df["dc.description"].isna().all()
+
+    df["dc.title"] = ["Fixed", "Title"]
+
+    output = tmp_path / "output.csv"
+    fileio.write(df, str(output), spans=spans)
+
+    assert output.read_bytes() == (
+        b'dc.title,dcterms.issued,dc.description\nFixed,1998,NA\nTitle,"2019\n07",""\n'
+    )
+
+
+def test_fileio_csv_passthrough_ragged(tmp_path):
+    """Test that files with a different number of fields in some lines are read
+    as usual, without copying any columns."""
+
+    path = tmp_path / "test.csv"
+    path.write_text("dc.title,dcterms.issued\nTitle,1998,extra\n")
+
+    assert fileio.csv_field_spans(str(path), ["dcterms.issued"]) is None
+
+
+def test_fileio_csv_compressed(tmp_path):
+    """Test writing and reading compressed CSV files, detecting the compression
+    from the extension or from the first bytes of the file."""
+
+    d = {
+        "dc.title": ["Title", None],
+        "dcterms.issued": ["1998", "2019-07-29"],
+    }
+    df = pd.DataFrame(data=d)
+
+    for extension in [".gz", ".bz2", ".xz", ".zst"]:
+        path = tmp_path / f"test.csv{extension}"
+        fileio.write(df, str(path))
+
+        assert fileio.detect_compression(str(path)) is not None
+        assert path.read_bytes() != df.to_csv(index=False).encode("utf-8")
+
+        # Rename the file so that only the first bytes give the compression away
+        renamed = path.rename(tmp_path / "test.txt")
+
+        assert fileio.csv_header(str(renamed)) == ["dc.title", "dcterms.issued"]
+
+        result = fileio.read(str(renamed))
+
+        assert result["dcterms.issued"].tolist() == ["1998", "2019-07-29"]
+        assert pd.isna(result.loc[1, "dc.title"])
+
+
+def test_fileio_read_csv_header():
+    """Test reading the header from a stream that can only be read once, where
+    a column name contains a line break."""
+
+    stream = io.BytesIO(
+        b'\xef\xbb\xbfdc.title,"dc.description\nabstract"\nTitle,Text\n'
+    )
+
+    assert fileio.read_csv_header(stream) == ["dc.title", "dc.description\nabstract"]
+    assert stream.read() == b"Title,Text\n"
@@ -1,6 +1,7 @@
 # SPDX-License-Identifier: GPL-3.0-only
 
 import pandas as pd
+from colorama import Fore
 
 import csv_metadata_quality.fix as fix
 
@@ -160,3 +161,39 @@ def test_fix_normalize_dois():
     value = "doi: 10.11648/j.jps.20140201.14"
 
     assert fix.normalize_dois(value) == "https://doi.org/10.11648/j.jps.20140201.14"
+
+
+def test_fix_normalize_dois_column():
+    """Test normalizing all DOIs of a column at once."""
+
+    series = pd.Series(
+        [
+            "http://dx.doi.org/10.1016/j.envc.2023.100794",
+            None,
+            "https://doi.org/10.19103/as.2018.0043.16||doi: 10.11648/J.JPS.20140201.14",
+            "https://doi.org/10.1016%2fj.envc.2023.100794",
+        ],
+        name="cg.identifier.doi",
+    )
+
+    result, outputs = fix.normalize_dois_column(series)
+
+    pd.testing.assert_series_equal(
+        result,
+        pd.Series(
+            [
+                "https://doi.org/10.1016/j.envc.2023.100794",
+                None,
+                "https://doi.org/10.19103/as.2018.0043.16||https://doi.org/10.11648/j.jps.20140201.14",
+                "https://doi.org/10.1016/j.envc.2023.100794",
+            ],
+            name="cg.identifier.doi",
+            dtype=object,
+        ),
+    )
+    assert outputs == [
+        f"{Fore.GREEN}Normalized DOI: {Fore.RESET}http://dx.doi.org/10.1016/j.envc.2023.100794\n",
+        "",
+        f"{Fore.GREEN}Normalized DOI: {Fore.RESET}doi: 10.11648/J.JPS.20140201.14\n",
+        f"{Fore.GREEN}Normalized DOI: {Fore.RESET}https://doi.org/10.1016%2fj.envc.2023.100794\n",
+    ]
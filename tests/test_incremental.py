@@ -0,0 +1,134 @@
+# SPDX-License-Identifier: GPL-3.0-only
+
+import pandas as pd
+from colorama import Fore
+
+import csv_metadata_quality.check as check
+import csv_metadata_quality.incremental as incremental
+
+
+def test_incremental_row_keys_id():
+    """Test identifying rows by their id."""
+
+    d = {
+        "id": ["a0b1c2", "d3e4f5"],
+        "dc.title": ["Title 1", "Title 2"],
+    }
+    df = pd.DataFrame(data=d)
+
+    assert incremental.row_keys(df) == ["a0b1c2", "d3e4f5"]
+
+
+def test_incremental_row_keys_position():
+    """Test identifying rows by their position when there is no usable id."""
+
+    d = {
+        "id": ["a0b1c2", "a0b1c2"],
+        "dc.title": ["Title 1", "Title 2"],
+    }
+    df = pd.DataFrame(data=d)
+
+    assert incremental.row_keys(df) == ["0", "1"]
+
+
+def test_incremental_row_hashes():
+    """Test that row hashes only change for rows that changed."""
+
+    d = {
+        "dc.title": ["Title 1", "Title 2"],
+        "dcterms.issued": ["2019", None],
+    }
+    df = pd.DataFrame(data=d)
+
+    hashes = incremental.row_hashes(df)
+
+    df.loc[1, "dcterms.issued"] = "2020"
+
+    new_hashes = incremental.row_hashes(df)
+
+    assert hashes[0] == new_hashes[0]
+    assert hashes[1] != new_hashes[1]
+
+
+def test_incremental_duplicate_items(capsys):
+    """Test checking for duplicate items using precomputed keys."""
+
+    item_title = "Title"
+    item_type = "Report"
+    item_date = "2021-03-17"
+
+    d = {
+        "dc.title": [item_title, item_title],
+        "dcterms.type": [item_type, item_type],
+        "dcterms.issued": [item_date, item_date],
+    }
+    df = pd.DataFrame(data=d)
+
+    keys = incremental.duplicate_keys(df)
+
+    incremental.duplicate_items(df, keys)
+
+    captured = capsys.readouterr()
+    assert (
+        captured.out
+        == f"{Fore.YELLOW}Possible duplicate (dc.title): {Fore.RESET}{item_title}\n"
+    )
+
+
+def test_incremental_state_fingerprint(tmp_path):
+    """Test that state from a run with different options is not reused."""
+
+    path = str(tmp_path / "state.json")
+    state = {"fingerprint": "a", "rows": {"0": {"hash": "1"}}}
+
+    incremental.save_state(path, state)
+
+    assert incremental.load_state(path, "a") == state
+    assert incremental.load_state(path, "b") == {"fingerprint": "b", "rows": {}}
+
+
+def test_incremental_changed_cells():
+    """Test extracting the fixes that were applied to a row."""
+
+    before = pd.Series({"dc.title": " Title", "dcterms.issued": None})
+    after = pd.Series({"dc.title": "Title", "dcterms.issued": None})
+
+    assert incremental.changed_cells(before, after) == {"dc.title": "Title"}
+
+
+def test_incremental_duplicate_items_missing_title(capsys):
+    """Test that items without a title are compared like in check.duplicate_
+    items(), but only once a title is used by more than one item, also across
+    batches of rows."""
+
+    d = {
+        "dc.title": [None, "Title", None, "Title"],
+        "dcterms.type": ["Report", "Report", "Report", "Book"],
+        "dcterms.issued": ["2019", "2019", "2019", "2020"],
+    }
+    df = pd.DataFrame(data=d)
+
+    check.duplicate_items(df)
+    expected = capsys.readouterr().out
+
+    assert expected == f"{Fore.YELLOW}Possible duplicate (dc.title): {Fore.RESET}None\n"
+
+    incremental.duplicate_items(df, incremental.duplicate_keys(df))
+
+    assert capsys.readouterr().out == expected
+
+    # The duplicate without a title is in the first batch, but it is only
+    # reported with the second, where a title is used twice.
+    index = incremental.duplicate_index()
+    for batch in [df.iloc[:3], df.iloc[3:]]:
+        incremental.duplicate_items(batch, incremental.duplicate_keys(batch), index)
+
+        assert capsys.readouterr().out == ("" if len(batch) == 3 else expected)
+
+    # Without a title that is used twice nothing is reported
+    df = df.iloc[:3]
+
+    check.duplicate_items(df)
+    incremental.duplicate_items(df, incremental.duplicate_keys(df))
+
+    assert capsys.readouterr().out == ""
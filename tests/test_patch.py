@@ -0,0 +1,54 @@
+# SPDX-License-Identifier: GPL-3.0-only
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import csv_metadata_quality.patch as patch
+
+
+def test_patch_changed_cells():
+    """Test listing changed cells by row and then by column."""
+
+    before = pd.DataFrame(
+        data={
+            "dc.title": [" Title", "Title", None],
+            "dcterms.subject": ["A||A", "B", "C"],
+        }
+    )
+    after = pd.DataFrame(
+        data={"dc.title": ["Title", "Title", None], "dcterms.subject": ["A", "B", "C"]}
+    )
+    changes = {
+        "dcterms.subject": np.array([True, False, False]),
+        "dc.title": np.array([True, False, False]),
+    }
+
+    df = patch.changed_cells(before, after, changes)
+
+    assert df.to_dict(orient="list") == {
+        "row": [0, 0],
+        "column": ["dc.title", "dcterms.subject"],
+        "old": [" Title", "A||A"],
+        "new": ["Title", "A"],
+    }
+
+
+def test_patch_dspace_csv():
+    """Test building a minimal DSpace CSV with only changed rows and columns."""
+
+    after = pd.DataFrame(
+        data={
+            "id": ["a", "b", "c"],
+            "dc.title": ["Title", "Title", "Title"],
+            "dcterms.subject": ["A", "B", "C"],
+        }
+    )
+    changes = {"dcterms.subject": np.array([False, True, False])}
+
+    df = patch.dspace_csv(after, changes)
+
+    assert df.to_dict(orient="list") == {"id": ["b"], "dcterms.subject": ["B"]}
+
+    with pytest.raises(ValueError):
+        patch.dspace_csv(after.drop(columns="id"), changes)
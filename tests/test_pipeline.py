@@ -0,0 +1,351 @@
+# SPDX-License-Identifier: GPL-3.0-only
+
+import json
+from argparse import Namespace
+from contextlib import redirect_stdout
+
+import pandas as pd
+import pyarrow as pa
+import pytest
+
+import csv_metadata_quality.fileio as fileio
+import csv_metadata_quality.pipeline as pipeline
+from csv_metadata_quality.findings import BudgetExceeded, Recorder
+
+
+def options(**kwargs):
+    """Build the options that the pipeline expects from the command line."""
+
+    args = Namespace(
+        agrovoc_fields=None,
+        drop_invalid_agrovoc=False,
+        experimental_checks=False,
+        lenient_citations=False,
+        unsafe_fixes=False,
+    )
+
+    for option, value in kwargs.items():
+        setattr(args, option, value)
+
+    return args
+
+
+def run(data, args):
+    """Run a DataFrame and an Arrow table with the same data through the pipe-
+    line and return the results and findings of both."""
+
+    recorder = Recorder(stream=None)
+    with redirect_stdout(recorder):
+        df = pipeline.process(pd.DataFrame(data=data), args, [], recorder)
+
+    table_recorder = Recorder(stream=None)
+    with redirect_stdout(table_recorder):
+        table = pipeline.process_table(pa.table(data), args, [], table_recorder)
+
+    return df, recorder.findings, table, table_recorder.findings
+
+
+def test_pipeline_process_table():
+    """Test that processing an Arrow table gives the same results as processing
+    a DataFrame."""
+
+    data = {
+        "dc.title": ["Title", "Title", "Title  with spaces"],
+        "dcterms.type": ["Report", "Report", "Report"],
+        "dcterms.issued": ["2019", "2019", "2019-13"],
+        "dcterms.language": ["en", "jp", "en"],
+        "dcterms.subject": ["LIVESTOCK|FORESTS", "CROPS||CROPS", None],
+        "cg.coverage.country": ["Kenya", None, "Uganda"],
+        "cg.coverage.region": [None, None, "Eastern Africa"],
+    }
+
+    df, findings, table, table_findings = run(data, options(unsafe_fixes=True))
+
+    assert table_findings == findings
+    assert table.to_pydict() == df.to_dict(orient="list")
+
+
+def test_pipeline_dictionary_encoded():
+    """Test that dictionary-encoded columns give the same results as plain
+    columns, in a DataFrame and in an Arrow table."""
+
+    data = {
+        "dc.title": ["Title", "Title", "Title  with spaces", None],
+        "dcterms.issued": ["2019", "2019", "2019-13", "2019-13"],
+        "dcterms.subject": ["CROPS||CROPS", "LIVESTOCK|FORESTS", None, "CROPS||CROPS"],
+        "cg.coverage.country": ["Kenya", None, "Kenya", "Kenya"],
+    }
+    args = options(unsafe_fixes=True)
+
+    df, findings, table, table_findings = run(data, args)
+
+    encoded_table = fileio.dictionary_encode(pa.table(data), max_ratio=1)
+
+    recorder = Recorder(stream=None)
+    with redirect_stdout(recorder):
+        encoded_df = pipeline.process(
+            fileio.to_pandas(encoded_table), args, [], recorder
+        )
+
+    assert recorder.findings == findings
+    assert fileio.to_arrow(encoded_df).to_pydict() == fileio.to_arrow(df).to_pydict()
+
+    recorder = Recorder(stream=None)
+    with redirect_stdout(recorder):
+        encoded_table = pipeline.process_table(encoded_table, args, [], recorder)
+
+    assert recorder.findings == table_findings
+    assert pa.types.is_dictionary(encoded_table.schema.field("dcterms.subject").type)
+
+    schema = pa.schema([(name, pa.string()) for name in encoded_table.column_names])
+    assert encoded_table.cast(schema).to_pydict() == table.to_pydict()
+
+
+def test_pipeline_process_table_unchanged_columns():
+    """Test that columns without anything to fix are not copied."""
+
+    data = {
+        "dc.title": ["Title 1", "Title 2"],
+        "dcterms.subject": ["LIVESTOCK", "CROPS||CROPS"],
+    }
+
+    table = pa.table(data)
+
+    recorder = Recorder(stream=None)
+    with redirect_stdout(recorder):
+        new_table = pipeline.process_table(table, options(), [], recorder)
+
+    # The title column still points to the same data buffer
+    title_buffer = table.column("dc.title").chunk(0).buffers()[2]
+    new_title_buffer = new_table.column("dc.title").chunk(0).buffers()[2]
+
+    assert new_title_buffer.address == title_buffer.address
+    assert new_table.column("dcterms.subject").to_pylist() == ["LIVESTOCK", "CROPS"]
+
+
+def test_pipeline_plan_skip_checks(tmp_path):
+    """Test skipping a check on some columns with a config file."""
+
+    config = tmp_path / "config.json"
+    config.write_text(
+        json.dumps(
+            {
+                "columns": [
+                    {"match": "^dcterms\\.subject$", "skip_checks": ["duplicates"]}
+                ]
+            }
+        )
+    )
+
+    args = options(config=str(config))
+    args.plan = pipeline.compile_plan(args)
+
+    stage_names = [
+        stage.name for stage in pipeline.column_stages("dcterms.subject", args)
+    ]
+    assert "duplicates" not in stage_names
+
+    stage_names = [stage.name for stage in pipeline.column_stages("dc.subject", args)]
+    assert "duplicates" in stage_names
+
+
+def test_pipeline_plan_checks():
+    """Test running only some checks."""
+
+    args = options(unsafe_fixes=True, checks="date,countries_match_regions")
+    args.plan = pipeline.compile_plan(args)
+
+    assert [stage.name for stage in pipeline.column_stages("dcterms.issued", args)] == [
+        "date"
+    ]
+    assert [stage.name for stage in pipeline.row_stages(args)] == [
+        "countries_match_regions"
+    ]
+
+
+def test_pipeline_plan_unknown_check():
+    """Test that unknown check names are rejected."""
+
+    with pytest.raises(ValueError):
+        pipeline.compile_plan(options(skip_checks="mojibake,foo"))
+
+
+def test_pipeline_check_table():
+    """Test that checking an Arrow table prints the same findings as processing
+    a DataFrame, without changing the table."""
+
+    data = {
+        "dc.title": ["Title", "Title", "Title  with spaces"],
+        "dcterms.type": ["Report", "Report", "Report"],
+        "dcterms.issued": ["2019", "2019", "2019-13"],
+        "dcterms.subject": ["LIVESTOCK|FORESTS", "CROPS||CROPS", None],
+        "cg.coverage.country": ["Kenya", None, "Uganda"],
+        "cg.coverage.region": [None, None, "Eastern Africa"],
+    }
+    args = options(unsafe_fixes=True)
+
+    df, findings, _, _ = run(data, args)
+
+    table = pa.table(data)
+
+    recorder = Recorder(stream=None)
+    with redirect_stdout(recorder):
+        pipeline.check_table(table, args, [], recorder)
+
+    assert recorder.findings == findings
+    assert pipeline.count_findings(recorder.findings) == len(findings)
+
+
+def test_pipeline_changes():
+    """Test that processing a DataFrame and an Arrow table report the same
+    changed rows."""
+
+    data = {
+        "dc.title": ["Title", "Title  with spaces"],
+        "dcterms.subject": ["CROPS||CROPS", "LIVESTOCK"],
+        "cg.coverage.country": ["Kenya", None],
+        "cg.coverage.region": [None, None],
+    }
+    args = options(unsafe_fixes=True)
+
+    changes = {}
+    with redirect_stdout(Recorder(stream=None)) as recorder:
+        pipeline.process(pd.DataFrame(data=data), args, [], recorder, changes=changes)
+
+    table_changes = {}
+    with redirect_stdout(Recorder(stream=None)) as recorder:
+        pipeline.process_table(
+            pa.table(data), args, [], recorder, changes=table_changes
+        )
+
+    assert {column: mask.tolist() for column, mask in changes.items()} == {
+        "dc.title": [False, True],
+        "dcterms.subject": [True, False],
+        "cg.coverage.region": [True, False],
+    }
+    assert {column: mask.tolist() for column, mask in table_changes.items()} == {
+        column: mask.tolist() for column, mask in changes.items()
+    }
+
+
+def test_pipeline_plan_stages():
+    """Test that stages are only left out if they can't print or change
+    anything, and not after a fix that runs."""
+
+    stages = pipeline.column_stages("dcterms.issued", options())
+    series = pd.Series(["2019", "2019||2020", "2019 "], name="dcterms.issued")
+
+    stats = pipeline.scan_column(pipeline.scan.column_array(series), stages)
+    planned = pipeline.plan_stages(stages, stats)
+    names = [stage.name for stage in planned]
+
+    assert "unnecessary_unicode" not in names
+    assert names[0] == "separators"
+    assert [stage.name for stage in stages][-len(names) :] == names
+    assert pipeline.plan_stages(stages, None) == stages
+
+
+def test_pipeline_memoized():
+    """Test that running stages once for each distinct value gives the same
+    results as running them for each row."""
+
+    data = {
+        "dcterms.issued": ["2019", "2019 ", "2019-13", None] * 5,
+        "dcterms.subject": ["CROPS||CROPS", "LIVESTOCK", None, "LIVESTOCK"] * 5,
+    }
+    args = options(unsafe_fixes=True)
+
+    results = []
+    for ratio in [0, 1]:
+        pipeline.MEMOIZE_MAX_RATIO, original = ratio, pipeline.MEMOIZE_MAX_RATIO
+
+        recorder = Recorder(stream=None)
+        with redirect_stdout(recorder):
+            df = pipeline.process(pd.DataFrame(data=data), args, [], recorder)
+
+        pipeline.MEMOIZE_MAX_RATIO = original
+        results.append((df.fillna("").to_dict(orient="list"), recorder.findings))
+
+    assert results[0] == results[1]
+
+
+def test_pipeline_recorder_budget():
+    """Test that a Recorder only counts findings from the checks and fixes it
+    was given against its budget."""
+
+    recorder = Recorder(stream=None, budget=1, counted={"date"})
+
+    recorder.stage = "whitespace"
+    recorder.write("Removing excessive whitespace\n")
+    recorder.stage = "date"
+    recorder.write("Invalid date\n")
+
+    assert recorder.count == 1
+
+    with pytest.raises(BudgetExceeded) as excinfo:
+        recorder.write("Invalid date\n")
+
+    assert excinfo.value.count == 2
+    assert excinfo.value.findings == [(None, "Invalid date")] * 2
+
+
+def test_pipeline_duplicate_isbns():
+    """Test that ISBNs that are used by more than one item are found after the
+    checks and fixes on columns, even if they are written in different ways,
+    in a DataFrame, an Arrow table, and when checking a table."""
+
+    data = {
+        "dc.identifier.isbn": [
+            "0-306-40615-2",
+            "978-0-306-40615-6",
+            "9780306406157",
+            None,
+            "99921-58-10-7||978-0-306-40615-6",
+        ],
+        "dc.title": ["One", "Two", "Three", "Four", "Five"],
+    }
+    args = options()
+
+    df, findings, _, table_findings = run(data, args)
+
+    assert findings == [
+        (1, "\x1b[31mInvalid ISBN: \x1b[39m978-0-306-40615-6"),
+        (4, "\x1b[31mInvalid ISBN: \x1b[39m978-0-306-40615-6"),
+        (2, "\x1b[33mPossible duplicate ISBN: \x1b[39m9780306406157"),
+        (4, "\x1b[33mPossible duplicate ISBN: \x1b[39m978-0-306-40615-6"),
+    ]
+    assert table_findings == findings
+
+    recorder = Recorder(stream=None)
+    with redirect_stdout(recorder):
+        pipeline.check_table(pa.table(data), args, [], recorder)
+
+    assert recorder.findings == findings
+
+
+def test_pipeline_duplicate_identifiers_seen():
+    """Test that duplicate identifiers are found across batches of rows with
+    the keys seen in earlier batches."""
+
+    args = options()
+    seen = {}
+
+    batches = [
+        pd.DataFrame({"dc.identifier.isbn": ["0-306-40615-2", None]}),
+        pd.DataFrame(
+            {"dc.identifier.isbn": ["9780306406157", "99921-58-10-7"]},
+            index=[2, 3],
+        ),
+    ]
+
+    recorder = Recorder(stream=None)
+    with redirect_stdout(recorder):
+        for df in batches:
+            pipeline.duplicate_identifiers(
+                pipeline.identifier_entries(df, args, []), recorder, df.index, seen
+            )
+
+    assert recorder.findings == [
+        (2, "\x1b[33mPossible duplicate ISBN: \x1b[39m9780306406157")
+    ]
+    assert recorder.stages == ["duplicate_isbns"]
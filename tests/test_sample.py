@@ -0,0 +1,150 @@
+# SPDX-License-Identifier: GPL-3.0-only
+
+import numpy as np
+import pyarrow as pa
+import pytest
+
+import csv_metadata_quality.api as api
+import csv_metadata_quality.pipeline as pipeline
+import csv_metadata_quality.sample as sample
+
+
+def batches(table, size):
+    """Split a table into record batches of size rows."""
+
+    return table.to_batches(max_chunksize=size)
+
+
+def test_sample_draw():
+    """Test that drawing a sample while streaming gives the rows with the
+    smallest random keys, no matter how the file is split into batches."""
+
+    table = pa.table({"row": [str(row) for row in range(1000)]})
+
+    keys = np.random.default_rng(1).random(1000)
+    expected = np.sort(np.argsort(keys)[:50])
+
+    for size in [7, 100, 1000]:
+        drawn = sample.draw(batches(table, size), 50, seed=1)
+
+        assert drawn.rows.tolist() == expected.tolist()
+        assert drawn.table.column("row").to_pylist() == [str(row) for row in expected]
+        assert drawn.totals == {"": 1000}
+
+    drawn = sample.draw(batches(table, 64), 0.1, seed=1)
+
+    assert drawn.rows.tolist() == np.flatnonzero(keys < 0.1).tolist()
+
+
+def test_sample_draw_stratified():
+    """Test that a stratified sample is divided between the strata in
+    proportion to their number of rows, with at least one row from each."""
+
+    collections = ["A"] * 900 + ["B"] * 95 + ["C"] * 5
+    table = pa.table({"collection": collections})
+
+    drawn = sample.draw(batches(table, 100), 100, column="collection")
+
+    assert drawn.totals == {"A": 900, "B": 95, "C": 5}
+    assert sorted(drawn.strata.tolist()) == ["A"] * 90 + ["B"] * 10 + ["C"]
+    assert drawn.strata.tolist() == [collections[row] for row in drawn.rows]
+
+    drawn = sample.draw(batches(table, 100), 0.001, column="collection")
+
+    assert set(drawn.strata) == {"A", "B", "C"}
+
+    with pytest.raises(ValueError):
+        sample.draw(batches(table, 100), 10, column="dc.title")
+
+
+def test_sample_size():
+    """Test parsing sample sizes."""
+
+    assert sample.size("1000") == 1000
+    assert sample.size("0.05") == 0.05
+
+    for value in ["0", "1.5", "-3", "all"]:
+        with pytest.raises(Exception):
+            sample.size(value)
+
+
+def test_sample_estimate():
+    """Test the estimated share of rows with findings and its confidence
+    interval."""
+
+    hits = np.array([True] * 10 + [False] * 90)
+    strata = np.array([""] * 100, dtype=object)
+
+    estimate = sample.estimate("date", hits, strata, {"": 100000})
+
+    assert estimate.found == 10
+    assert estimate.rate == pytest.approx(0.1)
+    assert estimate.low == pytest.approx(0.0552, abs=0.0001)
+    assert estimate.high == pytest.approx(0.1744, abs=0.0001)
+
+    # Everything was sampled, so the share is exact
+    estimate = sample.estimate("date", hits, strata, {"": 100})
+
+    assert (estimate.low, estimate.high) == (0.1, 0.1)
+
+    # Strata are weighted by their number of rows in the file
+    strata = np.array(["A"] * 50 + ["B"] * 50, dtype=object)
+    estimate = sample.estimate("date", hits, strata, {"A": 1000, "B": 9000})
+
+    assert estimate.rate == pytest.approx(0.1 * 0.2)
+
+
+def test_sample_check():
+    """Test that the findings of the checks on a sample are counted once for
+    each row and check."""
+
+    table = pa.table(
+        {
+            "dcterms.issued": ["2019", "2019-13", "2019-13", None],
+            "dcterms.type": ["Report", "Report", "Report", "Report"],
+        }
+    )
+    drawn = sample.Sample(table, np.arange(4), np.array([""] * 4), {"": 4})
+
+    args = api.options()
+    args.plan = pipeline.compile_plan(args)
+
+    estimates = {item.name: item for item in sample.check(drawn, args)}
+
+    assert estimates["date"].found == 3
+    assert estimates["any"].found == 3
+    assert "duplicate_items" not in estimates
+
+
+def test_sample_run_duplicates(tmp_path, capsys):
+    """Test that duplicate ISBNs, DOIs, and items are not checked in a sample,
+    because they say nothing about duplicates in the whole file."""
+
+    path = tmp_path / "input.csv"
+    path.write_text(
+        "dc.title,dcterms.type,dcterms.issued,dc.identifier.isbn,cg.identifier.doi\n"
+        + "Title,Report,2019,0-306-40615-2,10.1016/j.envc.2023.100794\n"
+        + "Title,Report,2019,978-0-306-40615-7,https://doi.org/10.1016/j.envc.2023.100794\n"
+    )
+
+    args = api.options(
+        input_file=str(path),
+        input_format=None,
+        block_size=None,
+        sample=2,
+        seed=0,
+        sample_by=None,
+    )
+    args.plan = pipeline.compile_plan(args)
+
+    sample.run(args)
+
+    lines = capsys.readouterr().out.splitlines()
+
+    # Only the DOI of the first row that is normalized is a finding, not the
+    # duplicate ISBN and DOI of the second row
+    assert [line.split()[:2] for line in lines if line.startswith("    any")] == [
+        ["any", "1"]
+    ]
+    assert not any("duplicate_" in line for line in lines)
+    assert lines[-1] == "Duplicate ISBNs, DOIs, and items are not checked in a sample."
@@ -0,0 +1,35 @@
+# SPDX-License-Identifier: GPL-3.0-only
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+import csv_metadata_quality.scan as scan
+
+
+def test_scan_column():
+    """Test the statistics of a column, plain and dictionary-encoded."""
+
+    series = pd.Series(["Kenya", "Kenya||Uganda", None, "Côte d'Ivoire"])
+
+    for array in [scan.column_array(series), pc.dictionary_encode(pa.array(series))]:
+        stats = scan.scan_column(array, screens=[r"\|\|", r"\s$"])
+
+        assert stats.rows == 4
+        assert stats.values == 3
+        assert stats.distinct == 3
+        assert stats.null_ratio == 0.25
+        assert stats.distinct_ratio == 1
+        assert stats.multi_value_ratio == 1 / 3
+        assert stats.non_ascii_ratio == 1 / 3
+        assert stats.average_length == 31 / 3
+        assert stats.dictionary == pa.types.is_dictionary(array.type)
+        assert stats.screens == {r"\|\|"}
+
+
+def test_scan_column_array():
+    """Test converting columns that aren't strings."""
+
+    assert scan.column_array(pd.Series([None, None])).type == pa.string()
+    assert scan.column_array(pd.Series([1, 2])).to_pylist() == ["1", "2"]
+    assert scan.column_array(pd.Series(["a", 1])) is None
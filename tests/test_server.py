@@ -0,0 +1,97 @@
+# SPDX-License-Identifier: GPL-3.0-only
+
+import threading
+from argparse import Namespace
+
+import pandas as pd
+import pytest
+
+import csv_metadata_quality.api as api
+import csv_metadata_quality.client as client
+import csv_metadata_quality.fileio as fileio
+import csv_metadata_quality.server as server
+
+
+@pytest.fixture
+def socket_path(tmp_path):
+    """Run a server on a Unix socket for the duration of a test."""
+
+    path = str(tmp_path / "server.sock")
+
+    httpd = server.create_server(Namespace(socket=path, workers=2))
+    thread = threading.Thread(target=httpd.serve_forever)
+    thread.start()
+
+    yield path
+
+    httpd.shutdown()
+    httpd.server_close()
+    httpd.executor.shutdown()
+    thread.join()
+
+
+def test_server_parse_options():
+    """Test parsing options from a query string."""
+
+    options = server.parse_options(
+        "filename=test.csv&unsafe_fixes=1&experimental_checks=false&exclude_fields=dc.title"
+    )
+
+    assert options == {
+        "unsafe_fixes": True,
+        "experimental_checks": False,
+        "exclude_fields": "dc.title",
+    }
+
+    # Options that name files on the server or change what is returned are
+    # ignored
+    options = server.parse_options(
+        "incremental=/tmp/state.json&checkpoint=/tmp&resume=1&config=/etc/passwd&check_only=0"
+    )
+
+    assert options == {}
+
+
+def test_server_process_csv(socket_path, tmp_path):
+    """Test that checking a CSV on the server gives the same results as checking
+    it locally."""
+
+    with open("data/test.csv", "rb") as f:
+        payload = f.read()
+
+    connection = client.connect(socket_path=socket_path)
+    data, findings = client.request(
+        connection, payload, "data/test.csv", {"unsafe_fixes": True}
+    )
+    connection.close()
+
+    df, local_findings = api.process(
+        fileio.read("data/test.csv"), {"unsafe_fixes": True}
+    )
+    path = str(tmp_path / "test.csv")
+    fileio.write(df, path)
+
+    with open(path, "rb") as f:
+        assert data == f.read()
+
+    assert [line for row, line in findings] == [line for row, line in local_findings]
+
+
+def test_server_process_parquet(socket_path, tmp_path):
+    """Test checking a binary file on the server."""
+
+    path = str(tmp_path / "test.parquet")
+    fileio.write(pd.DataFrame(data={"dcterms.subject": ["CROPS||CROPS"]}), path)
+
+    with open(path, "rb") as f:
+        payload = f.read()
+
+    connection = client.connect(socket_path=socket_path)
+    data, findings = client.request(connection, payload, path, {})
+    connection.close()
+
+    with open(path, "wb") as f:
+        f.write(data)
+
+    assert fileio.read(path).loc[0, "dcterms.subject"] == "CROPS"
+    assert findings[0][0] == 0
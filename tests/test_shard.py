@@ -0,0 +1,83 @@
+# SPDX-License-Identifier: GPL-3.0-only
+
+import json
+import subprocess
+import sys
+
+from colorama import Fore
+
+import csv_metadata_quality.fileio as fileio
+import csv_metadata_quality.shard as shard
+
+
+def test_shard_merge(tmp_path, capsys):
+    """Test splitting a file into shards, checking each shard in a separate
+    process, and merging them back together, with a duplicate item across
+    shards and a DOI that is used by items in different shards."""
+
+    header = "dc.title,dcterms.type,dcterms.issued,cg.identifier.doi\n"
+    rows = [
+        "Title,Report,2019,https://doi.org/10.1016/j.envc.2023.100794\n",
+        "Other title,Report,2019-13,\n",
+        "Third title,Report,2020-13,\n",
+        "Title,Report,2019,10.1016/j.envc.2023.100794\n",
+    ]
+    path = tmp_path / "input.csv"
+    path.write_text(header + "".join(rows))
+
+    manifest = shard.shard(str(path), str(tmp_path / "shards"), 3)
+
+    assert [entry["offset"] for entry in manifest["shards"]] == [0, 2, 4]
+    assert [entry["rows"] for entry in manifest["shards"]] == [2, 2, 0]
+
+    processes = [
+        subprocess.Popen(
+            [
+                sys.executable,
+                "-m",
+                "csv_metadata_quality",
+                "-i",
+                str(tmp_path / "shards" / entry["input"]),
+                "-o",
+                str(tmp_path / "shards" / entry["output"]),
+                "--shard-state",
+                str(tmp_path / "shards" / entry["state"]),
+            ],
+            stdout=subprocess.DEVNULL,
+        )
+        for entry in manifest["shards"]
+    ]
+    assert [process.wait() for process in processes] == [0, 0, 0]
+
+    # Each shard only sees some of the items, so duplicates are left to merge
+    with open(tmp_path / "shards" / "shard-1-state.json") as f:
+        state = json.load(f)
+
+    assert state["rows"] == 2
+    assert all("Possible duplicate" not in line for row, line in state["findings"])
+
+    findings = shard.merge(
+        str(tmp_path / "shards" / "manifest.json"), str(tmp_path / "out.csv")
+    )
+
+    lines = capsys.readouterr().out.splitlines()
+    assert lines[-1] == f"{Fore.YELLOW}Possible duplicate (dc.title): {Fore.RESET}Title"
+    assert any(line.endswith("2019-13") for line in lines)
+
+    # Rows are numbered like in the original file, not from the start of the
+    # shard
+    assert (
+        2,
+        f"{Fore.RED}Invalid date (dcterms.issued): {Fore.RESET}2020-13",
+    ) in findings
+    assert (
+        3,
+        f"{Fore.YELLOW}Possible duplicate DOI: {Fore.RESET}https://doi.org/10.1016/j.envc.2023.100794",
+    ) in findings
+
+    assert fileio.read(str(tmp_path / "out.csv"))["dc.title"].tolist() == [
+        "Title",
+        "Other title",
+        "Third title",
+        "Title",
+    ]